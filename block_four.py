@@ -1,12 +1,20 @@
+from argparse import ArgumentParser
 from collections import namedtuple
-from logging import basicConfig, getLogger, WARN
+from logging import basicConfig, getLogger, INFO, WARN
+from math import ceil, floor
+import os
 from queue import Queue, Empty
 from threading import Thread
 
-import mittmcts
 import pygame
 
+from block_four_alphabeta import AlphaBetaSearch
+from block_four_book import OpeningBook, DEFAULT_BOOK_PATH
 from block_four_game import BlockFourGame, BlockFourMove
+from block_four_instrument import InstrumentedSearchTree, SearchProfiler
+from block_four_parallel import ParallelSearch
+from block_four_search import SearchTree
+from block_four_table import TranspositionTable
 
 basicConfig(format='%(asctime)s %(message)s', level=WARN)
 logger = getLogger(__name__)
@@ -15,6 +23,7 @@ BLACK = 100, 100, 100
 RED = 200, 0, 0
 GREEN = 0, 200, 0
 WHITE = 255, 255, 255
+OPPONENT_EVENT = pygame.event.custom_type()  # opponent sent a result
 DIRECTIONS = {pygame.K_w: [0, -1],
               pygame.K_s: [0, 1],
               pygame.K_a: [-1, 0],
@@ -25,9 +34,19 @@ WindowSize = namedtuple('WindowSize', 'grid_size line_width grid_x grid_y')
 
 
 class Game:
-    def __init__(self, surface=None, opponent_iterations=10):
+    def __init__(self,
+                 surface=None,
+                 opponent_iterations=10,
+                 opponent_workers=1,
+                 opponent_seconds=None,
+                 opening_book_path=None,
+                 opponent_engine='mcts',
+                 opponent_instrumented=False,
+                 opponent_profile_path=None,
+                 opponent_table=False):
         pygame.init()
         pygame.mixer.quit()  # Avoids high CPU.
+        self.font = pygame.font.SysFont('monospace', 22)
 
         self.speed = [2, 2]
         self.row_length = 9
@@ -48,6 +67,8 @@ class Game:
                                                    pygame.RESIZABLE)
 
         self.size = self.rescale()
+        self.static_surface = None
+        self.static_key = None  # what static_surface was drawn for
         self.piece_shapes = (('**',
                               '**'),
                              ('**',
@@ -61,13 +82,21 @@ class Game:
         self.game = BlockFourGame()
         self.state = self.game.initial_state()
         self.winner = self.game.get_winner(self.state)
+        self.opponent_hint = None  # best move so far while opponent thinks
         self.state_queue = Queue()
-        self.opponent_result_queue = Queue()
+        self.opponent_result_queue = EventQueue()
         opponent_thread = Thread(target=run_opponent,
                                  args=(self.game,
                                        self.state_queue,
                                        self.opponent_result_queue,
-                                       opponent_iterations),
+                                       opponent_iterations,
+                                       opponent_workers,
+                                       opponent_seconds,
+                                       opening_book_path,
+                                       opponent_engine,
+                                       opponent_instrumented,
+                                       opponent_profile_path,
+                                       opponent_table),
                                  daemon=True)
         opponent_thread.start()
 
@@ -78,15 +107,29 @@ class Game:
                           grid_x=(self.width - grid_size) * .5,
                           grid_y=(self.height - grid_size) * .5)
 
-    def draw_grid_line(self, x1, y1, x2, y2):
+    def draw_grid_line(self, surface, x1, y1, x2, y2):
         colour = (self.player_colour if self.winner == 1
                   else self.opponent_colour if self.winner == -1
                   else self.grid_colour)
-        self.surface.fill(colour,
-                          (x1, y1, x2-x1, y2-y1))
+        surface.fill(colour,
+                     (x1, y1, x2-x1, y2-y1))
 
     def draw(self, markers='  '):
-        self.surface.fill(self.background)
+        self.surface.blit(self.get_static_surface(markers), (0, 0))
+        self.draw_spaces()
+
+    def get_static_surface(self, markers='  '):
+        """ Draw the grid and pieces, unless they're already drawn.
+
+        They only change when the window is resized or the game ends.
+        """
+        static_key = (self.size, self.winner, markers)
+        if static_key == self.static_key:
+            return self.static_surface
+        surface = pygame.Surface((self.width, self.height))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(self.background)
         outer_x1 = self.size.grid_x - self.size.line_width
         inner_x1 = outer_x1 + 2*self.size.line_width
         inner_x2 = outer_x1 + self.size.grid_size
@@ -100,7 +143,7 @@ class Game:
             line_width = (self.size.line_width*2
                           if (i % 3) == 2
                           else self.size.line_width)
-            pygame.draw.line(self.surface,
+            pygame.draw.line(surface,
                              self.grid_colour,
                              (self.size.grid_x,
                               y),
@@ -108,31 +151,35 @@ class Game:
                               y),
                              line_width)
             x = self.size.grid_x + (i + 1) * self.size.grid_size / self.row_length
-            pygame.draw.line(self.surface,
+            pygame.draw.line(surface,
                              self.grid_colour,
                              (x,
                               self.size.grid_y),
                              (x,
                               (self.height + self.size.grid_size) * .5),
                              line_width)
-        self.draw_grid_line(outer_x1, outer_y1, outer_x2, inner_y1)
-        self.draw_grid_line(outer_x1, inner_y2, outer_x2, outer_y2)
-        self.draw_grid_line(outer_x1, inner_y1, inner_x1, outer_y2)
-        self.draw_grid_line(inner_x2, inner_y1, outer_x2, outer_y2)
+        self.draw_grid_line(surface, outer_x1, outer_y1, outer_x2, inner_y1)
+        self.draw_grid_line(surface, outer_x1, inner_y2, outer_x2, outer_y2)
+        self.draw_grid_line(surface, outer_x1, inner_y1, inner_x1, outer_y2)
+        self.draw_grid_line(surface, inner_x2, inner_y1, outer_x2, outer_y2)
 
-        self.draw_pieces(outer_x2,
+        self.draw_pieces(surface,
+                         outer_x2,
                          outer_y1,
                          self.opponent_colour,
                          dir=-1,
                          marker=markers[0])
-        self.draw_pieces(outer_x1,
+        self.draw_pieces(surface,
+                         outer_x1,
                          outer_y2,
                          self.player_colour,
                          dir=1,
                          marker=markers[1])
-        self.draw_spaces()
+        self.static_surface = surface
+        self.static_key = static_key
+        return surface
 
-    def draw_pieces(self, start_x, start_y, colour, dir, marker=''):
+    def draw_pieces(self, surface, start_x, start_y, colour, dir, marker=''):
         step_size = self.size.grid_size / self.row_length
         x = start_x + dir * (self.size.line_width - 5*step_size)
         y = start_y
@@ -145,32 +192,57 @@ class Game:
             for j, row in enumerate(shape):
                 for i, cell in enumerate(row):
                     if cell != ' ':
-                        self.surface.fill(colour,
-                                          (x + dir*i*step_size,
-                                           y + j*step_size,
-                                           step_size+1,
-                                           step_size+1))
+                        surface.fill(colour,
+                                     (x + dir*i*step_size,
+                                      y + j*step_size,
+                                      step_size+1,
+                                      step_size+1))
             x += dir * step_size * (1 + max(len(row) for row in shape))
-        font = pygame.font.SysFont('monospace', 22)
-        label = font.render(marker, 1, colour)
-        self.surface.blit(label, (x, y))
+        label = self.font.render(marker, 1, colour)
+        surface.blit(label, (x, y))
 
     def draw_spaces(self):
+        """ Draw the filled cells and the opponent's hint. """
+        cell_moves = self.game.geometry.cell_moves
+        cells = self.state.pos_cells | self.state.neg_cells
+        while cells:
+            bit = cells & -cells
+            cells ^= bit
+            move = cell_moves[bit.bit_length() - 1]
+            self.draw_cell(move.row, move.column)
+        hint = self.opponent_hint
+        if hint is not None:
+            self.draw_cell(hint.row, hint.column)
+
+    def get_cell_rect(self, row, column):
+        step_size = self.size.grid_size / self.row_length
+        x1 = floor(self.size.grid_x + column*step_size)
+        y1 = floor(self.size.grid_y + row*step_size)
+        x2 = ceil(self.size.grid_x + (column + 1)*step_size)
+        y2 = ceil(self.size.grid_y + (row + 1)*step_size)
+        return pygame.Rect(x1, y1, x2 - x1, y2 - y1)
+
+    def draw_cell(self, row, column):
+        """ Draw one cell's piece, or the opponent's hint, on the grid. """
         step_size = self.size.grid_size / self.row_length
         radius = round(self.size.grid_size / 22)
-        for row in range(self.row_length):
-            for column in range(self.row_length):
-                player = self.game.get_cell(self.state, row, column)
-                if player:
-                    x = round(self.size.grid_x + (column + 0.5)*step_size)
-                    y = round(self.size.grid_y + (row + 0.5)*step_size)
-                    colour = (self.player_colour
-                              if player == 1
-                              else self.opponent_colour)
-                    pygame.draw.circle(self.surface,
-                                       colour,
-                                       (x, y),
-                                       radius)
+        x = round(self.size.grid_x + (column + 0.5)*step_size)
+        y = round(self.size.grid_y + (row + 0.5)*step_size)
+        player = self.game.get_cell(self.state, row, column)
+        if player:
+            colour = (self.player_colour
+                      if player == 1
+                      else self.opponent_colour)
+            pygame.draw.circle(self.surface,
+                               colour,
+                               (x, y),
+                               radius)
+        elif self.opponent_hint == (row, column):
+            pygame.draw.circle(self.surface,
+                               self.opponent_colour,
+                               (x, y),
+                               radius,
+                               max(1, self.size.line_width))
 
     def draw_polygon(self, colour, start_pos, step_size, *steps):
         pos = start_pos
@@ -199,15 +271,58 @@ class Game:
             return
         self.state_queue.put(self.state)
 
+    def receive_results(self):
+        """ Handle all the results that the opponent has sent so far. """
+        while True:
+            try:
+                result = self.opponent_result_queue.get_nowait()
+            except Empty:
+                return
+            if result.is_final:
+                self.opponent_hint = None
+                self.state = self.game.apply_move(self.state, result.move)
+                self.winner = self.game.get_winner(self.state)
+            else:
+                self.opponent_hint = result.move
+
+    def update_display(self, old_state, old_hint, old_winner):
+        """ Redraw only the cells that changed since the old values. """
+        if self.winner != old_winner:
+            self.draw()
+            pygame.display.flip()
+            return
+        state = self.state
+        changed_cells = ((old_state.pos_cells ^ state.pos_cells) |
+                         (old_state.neg_cells ^ state.neg_cells))
+        cell_moves = self.game.geometry.cell_moves
+        moves = set()
+        while changed_cells:
+            bit = changed_cells & -changed_cells
+            changed_cells ^= bit
+            moves.add(cell_moves[bit.bit_length() - 1])
+        if self.opponent_hint != old_hint:
+            moves.update(hint
+                         for hint in (old_hint, self.opponent_hint)
+                         if hint is not None)
+        rects = []
+        for row, column in moves:
+            rect = self.get_cell_rect(row, column)
+            self.surface.blit(self.static_surface, rect, rect)
+            self.draw_cell(row, column)
+            rects.append(rect)
+        if rects:
+            pygame.display.update(rects)
+
     def main_loop(self):
         self.draw()
         pygame.display.flip()
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
         if self.state.player == -1:
             self.state_queue.put(self.state)
         while True:
-            event = pygame.event.poll()
-            if event.type != pygame.NOEVENT:
-                logger.debug('received event %s', event)
+            event = pygame.event.wait()
+            logger.debug('received event %s', event)
+            old_values = (self.state, self.opponent_hint, self.winner)
             if event.type == pygame.QUIT:
                 return
             elif event.type == pygame.VIDEORESIZE:
@@ -215,31 +330,85 @@ class Game:
                 self.surface = pygame.display.set_mode((self.width, self.height),
                                                        pygame.RESIZABLE)
                 self.size = self.rescale()
+                self.draw()
+                pygame.display.flip()
+            elif event.type == pygame.VIDEOEXPOSE:
+                pygame.display.flip()
             elif event.type == pygame.MOUSEBUTTONUP:
                 self.click(event.pos)
-            elif event.type == pygame.NOEVENT:
-                try:
-                    result = self.opponent_result_queue.get(timeout=0.1)
-                except Empty:
-                    continue
-                self.state = self.game.apply_move(self.state, result.move)
-                self.winner = self.game.get_winner(self.state)
-            else:
-                continue
-            self.draw()
-            pygame.display.flip()
+                self.update_display(*old_values)
+            elif event.type == OPPONENT_EVENT:
+                self.receive_results()
+                self.update_display(*old_values)
+
+
+class EventQueue(Queue):
+    """ A queue that posts OPPONENT_EVENT to wake up the main loop. """
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        pygame.event.post(pygame.event.Event(OPPONENT_EVENT))
 
 
 def run_opponent(game: BlockFourGame,
                  state_queue: Queue,
                  result_queue: Queue,
-                 opponent_iterations: int):
+                 opponent_iterations: int,
+                 opponent_workers: int = 1,
+                 opponent_seconds: float = None,
+                 opening_book_path: str = None,
+                 opponent_engine: str = 'mcts',
+                 opponent_instrumented: bool = False,
+                 opponent_profile_path: str = None,
+                 opponent_table: bool = False):
+    """ Search for the opponent's moves in the background.
+
+    Progress reports and final results both go on result_queue, and the
+    final result has is_final set. Positions in the opening book are
+    answered from the book without searching.
+    :param opponent_engine: 'mcts' for Monte Carlo tree search, or
+        'alphabeta' for AlphaBetaSearch, where opponent_iterations limits
+        the nodes searched
+    :param opponent_instrumented: True to search with an
+        InstrumentedSearchTree, so each result has metrics, and they get
+        logged. Only used by a single Monte Carlo tree search worker.
+    :param opponent_profile_path: a file to save a cProfile profile of all
+        the searches to, or None
+    :param opponent_table: True to share statistics between symmetric
+        positions through a TranspositionTable. Only used by a single Monte
+        Carlo tree search worker, because AlphaBetaSearch always has one.
+    """
     logger.info('Starting opponent.')
+    table = TranspositionTable(game) if opponent_table else None
+    if opponent_engine == 'alphabeta':
+        searcher = AlphaBetaSearch(game)
+    elif opponent_workers > 1:
+        searcher = ParallelSearch(game, opponent_workers)
+    elif opponent_instrumented:
+        searcher = InstrumentedSearchTree(game, table=table)
+    else:
+        searcher = SearchTree(game, table=table)
+    search = searcher.search
+    if opponent_profile_path is not None:
+        profiler = SearchProfiler(opponent_profile_path)
+
+        def search(*args, **kwargs):
+            return profiler.run(searcher.search, *args, **kwargs)
+    opening_book = None
+    if opening_book_path is not None:
+        opening_book = OpeningBook(game, opening_book_path)
     while True:
         state = state_queue.get()
         logger.debug('received state')
-        searcher = mittmcts.MCTS(game, state)
-        result = searcher.get_simulation_result(opponent_iterations)
+        if opening_book is not None:
+            entry = opening_book.get_entry(state)
+            if entry is not None:
+                logger.debug('sending book move')
+                result_queue.put(entry)
+                continue
+        result = search(state,
+                        opponent_iterations,
+                        opponent_seconds,
+                        report=result_queue.put)
         logger.debug('sending result')
         result_queue.put(result)
 
@@ -286,8 +455,34 @@ def live_main():
     pygame.image.save(surface, 'live.png')
 
 
+def parse_args():
+    parser = ArgumentParser(description='Play Block Four.')
+    parser.add_argument('--instrument',
+                        action='store_true',
+                        help="log counts and times for the opponent's "
+                             "searches")
+    parser.add_argument('--profile',
+                        help="file to save a profile of the opponent's "
+                             "searches to")
+    parser.add_argument('--table',
+                        action='store_true',
+                        help="share the opponent's search statistics "
+                             "between symmetric positions")
+    return parser.parse_args()
+
+
 def main():
-    game = Game(opponent_iterations=1000)
+    args = parse_args()
+    if args.instrument:
+        getLogger('block_four_instrument').setLevel(INFO)
+    opening_book_path = None
+    if os.path.exists(DEFAULT_BOOK_PATH):
+        opening_book_path = DEFAULT_BOOK_PATH
+    game = Game(opponent_iterations=1000,
+                opening_book_path=opening_book_path,
+                opponent_instrumented=args.instrument,
+                opponent_profile_path=args.profile,
+                opponent_table=args.table)
     game.main_loop()
 
 
@@ -0,0 +1,328 @@
+""" Alpha-beta search with iterative deepening, as an opponent engine.
+
+A move always fills the first empty cell of a field, so the search works on
+the field states from PositionIndex: a move is a field number, and a
+position is a tuple of field states. The order of the fields doesn't change
+the value, so table entries are keyed by the sorted field states, and are
+shared by all positions with the same field states in any order. An
+EndgameSolver uses the same keys, so it can share the table and end the
+search early with exact values.
+
+Run this module to play it against Monte Carlo tree search.
+"""
+
+from argparse import ArgumentParser
+from collections import namedtuple
+from functools import lru_cache
+from logging import getLogger
+from time import perf_counter
+
+from block_four_game import BlockFourGame, BlockFourState, bit_count
+from block_four_search import SearchTree
+from block_four_table import TranspositionTable
+from block_four_tablebase import (PositionIndex, POS_WIN, NEG_WIN,
+                                  DRAW as DRAW_VALUE, check_scoring)
+
+logger = getLogger(__name__)
+
+AlphaBetaResult = namedtuple('AlphaBetaResult',
+                             'move score depth node_count is_final',
+                             defaults=(True,))
+
+WIN_SCORE = 10_000
+FIELD_SCORE = 100
+EXACT, LOWER_BOUND, UPPER_BOUND = range(3)
+
+
+class SearchAborted(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_field_value(pos_count, neg_count, capture_count, cell_count):
+    """ Find a field's expected value if each empty cell goes to either
+    player with even odds.
+
+    :return: 1 if the positive player is sure to capture it, -1 if the
+        negative player is, or somewhere in between
+    """
+    if pos_count >= capture_count:
+        return 1.0
+    if neg_count >= capture_count:
+        return -1.0
+    if pos_count + neg_count == cell_count:
+        return 0.0
+    return (get_field_value(pos_count + 1,
+                            neg_count,
+                            capture_count,
+                            cell_count) +
+            get_field_value(pos_count,
+                            neg_count + 1,
+                            capture_count,
+                            cell_count)) / 2
+
+
+class AlphaBetaSearch:
+    """ Principal variation search with a transposition table.
+
+    Moves are tried in this order: the best move from the table, the killer
+    moves that caused cutoffs at the same ply, then the rest by their
+    history scores.
+    """
+    def __init__(self,
+                 game: BlockFourGame,
+                 table_capacity=1_000_000,
+                 table: TranspositionTable = None):
+        """ Initialize.
+
+        :param table: a table to share with other searches or an
+            EndgameSolver for the same game, or None to make one with
+            table_capacity entries
+        """
+        check_scoring(game)
+        self.game = game
+        self.index = index = PositionIndex(game)
+        if table is None:
+            table = TranspositionTable(game, table_capacity)
+        self.table = table
+        self.node_count = 0
+        self.max_nodes = self.deadline = None
+        self.killers = []
+        self.history = {1: [0] * len(index.empty_fields),
+                        -1: [0] * len(index.empty_fields)}
+
+        # Score of each field state for the positive player, from
+        # FIELD_SCORE when the positive player controls it to -FIELD_SCORE.
+        geometry = game.geometry
+        self.state_scores = [
+            round(FIELD_SCORE * get_field_value(pos_count,
+                                                neg_count,
+                                                geometry.capture_count,
+                                                geometry.field_size ** 2))
+            for pos_count, neg_count in index.open_states]
+        self.state_scores.extend([FIELD_SCORE, -FIELD_SCORE, 0])
+        self.terminal_scores = {POS_WIN: WIN_SCORE,
+                                NEG_WIN: -WIN_SCORE,
+                                DRAW_VALUE: 0}
+
+    def search(self,
+               state: BlockFourState,
+               iterations=None,
+               max_seconds=None,
+               report=None):
+        """ Search one ply deeper at a time, until a limit runs out.
+
+        :param state: the position to search from
+        :param iterations: the most nodes to visit, or None
+        :param max_seconds: the time to search for, or None
+        :param report: a function to call with an AlphaBetaResult after each
+            depth is finished
+        """
+        if iterations is None and max_seconds is None:
+            raise ValueError('Search needs iterations or max_seconds.')
+        game = self.game
+        if state.open_fields is None:
+            state = game.add_fields(state)
+        if game.get_winner(state) is not None:
+            raise ValueError('The game is over.')
+        fields = self.index.get_fields(state)
+        player = state.player
+        self.node_count = 0
+        self.max_nodes = iterations
+        self.deadline = (None if max_seconds is None
+                         else perf_counter() + max_seconds)
+        empty_count = game.geometry.cell_count - sum(
+            bit_count(cells) for cells in (state.pos_cells, state.neg_cells))
+        result = None
+        best_field = None
+        for depth in range(1, empty_count + 1):
+            self.killers = [[None, None] for _ in range(depth)]
+            try:
+                score, best_field = self.search_root(fields,
+                                                     player,
+                                                     depth,
+                                                     best_field)
+            except SearchAborted:
+                break
+            result = AlphaBetaResult(self.get_move(state, best_field),
+                                     score,
+                                     depth,
+                                     self.node_count,
+                                     is_final=False)
+            if report is not None:
+                report(result)
+            if abs(score) >= WIN_SCORE:
+                break
+        if result is None:
+            # Not even one ply finished, so take the first move.
+            _, moves = game.get_moves(state)
+            result = AlphaBetaResult(moves[0], 0, 0, self.node_count)
+        logger.info('Searched %d nodes to depth %d.',
+                    self.node_count,
+                    result.depth)
+        return result._replace(is_final=True)
+
+    def get_move(self, state: BlockFourState, field):
+        row_field, column_field = divmod(field, self.game.field_count)
+        return next(self.game.get_field_moves(state, row_field, column_field))
+
+    def search_root(self, fields, player, depth, first_field):
+        alpha = -WIN_SCORE - 1
+        beta = WIN_SCORE + 1
+        best_field = None
+        for field in self.order_moves(fields, player, first_field, 0):
+            child = self.make_move(fields, player, field)
+            if best_field is None:
+                score = -self.search_node(child, -player, depth - 1,
+                                          -beta, -alpha, 1)
+            else:
+                score = -self.search_node(child, -player, depth - 1,
+                                          -alpha - 1, -alpha, 1)
+                if score > alpha:
+                    score = -self.search_node(child, -player, depth - 1,
+                                              -beta, -alpha, 1)
+            if best_field is None or score > alpha:
+                alpha = score
+                best_field = field
+        return alpha, best_field
+
+    def search_node(self, fields, player, depth, alpha, beta, ply):
+        """ Find the score for player, from alpha to beta. """
+        self.node_count += 1
+        if self.max_nodes is not None and self.node_count > self.max_nodes:
+            raise SearchAborted()
+        if (self.deadline is not None and
+                self.node_count & 0xff == 0 and
+                perf_counter() > self.deadline):
+            raise SearchAborted()
+        index = self.index
+        value = index.get_value(fields)
+        if value:
+            return self.terminal_scores[value] * player
+        if depth == 0:
+            return self.evaluate(fields) * player
+
+        key = index.get_index(tuple(sorted(fields)), player)
+        entry = self.table.get(key)
+        table_field = None
+        if isinstance(entry, int):  # solved by an EndgameSolver
+            return self.terminal_scores[entry] * player
+        if entry is not None:
+            entry_depth, entry_score, bound, field_state = entry
+            # Any field in the same state is an equally good move.
+            table_field = fields.index(field_state)
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return entry_score
+                if bound == LOWER_BOUND:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        original_alpha = alpha
+        best_score = best_field = None
+        for field in self.order_moves(fields, player, table_field, ply):
+            child = self.make_move(fields, player, field)
+            if best_field is None:
+                score = -self.search_node(child, -player, depth - 1,
+                                          -beta, -alpha, ply + 1)
+            else:
+                score = -self.search_node(child, -player, depth - 1,
+                                          -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.search_node(child, -player, depth - 1,
+                                              -beta, -score, ply + 1)
+            if best_score is None or score > best_score:
+                best_score = score
+                best_field = field
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                killers = self.killers[ply]
+                if killers[0] != field:
+                    killers[1] = killers[0]
+                    killers[0] = field
+                self.history[player][field] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.put(key, (depth, best_score, bound, fields[best_field]))
+        return best_score
+
+    def order_moves(self, fields, player, first_field, ply):
+        next_states = self.index.next_states[player]
+        moves = [field
+                 for field, field_state in enumerate(fields)
+                 if next_states[field_state] is not None]
+        history = self.history[player]
+        moves.sort(key=lambda field: history[field], reverse=True)
+        for field in reversed(self.killers[ply] + [first_field]):
+            if field is not None and field in moves:
+                moves.remove(field)
+                moves.insert(0, field)
+        return moves
+
+    def make_move(self, fields, player, field):
+        next_state = self.index.next_states[player][fields[field]]
+        return fields[:field] + (next_state,) + fields[field+1:]
+
+    def evaluate(self, fields):
+        """ Score field control for the positive player. """
+        state_scores = self.state_scores
+        return sum(state_scores[field_state] for field_state in fields)
+
+
+def play_match(game: BlockFourGame, seconds, game_count):
+    """ Play alpha-beta against Monte Carlo tree search.
+
+    Both engines get the same time for each move, and they take turns
+    starting.
+    :return: wins, draws, and losses for alpha-beta
+    """
+    wins = draws = losses = 0
+    for i in range(game_count):
+        alpha_beta_player = 1 if i % 2 == 0 else -1
+        engines = {alpha_beta_player: AlphaBetaSearch(game),
+                   -alpha_beta_player: SearchTree(game)}
+        state = game.initial_state(player=1)
+        winner = game.get_winner(state)
+        while winner is None:
+            result = engines[state.player].search(state,
+                                                  max_seconds=seconds)
+            state = game.apply_move(state, result.move)
+            winner = game.get_winner(state)
+        if winner == alpha_beta_player:
+            wins += 1
+        elif winner == -alpha_beta_player:
+            losses += 1
+        else:
+            draws += 1
+        print(f'Game {i+1}: {wins} wins, {draws} draws, {losses} losses.')
+    return wins, draws, losses
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Play alpha-beta against Monte Carlo tree search.')
+    parser.add_argument('--seconds',
+                        type=float,
+                        default=0.5,
+                        help='time for each move')
+    parser.add_argument('--games', type=int, default=20)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    play_match(BlockFourGame(), args.seconds, args.games)
+
+
+if __name__ == '__main__':
+    main()
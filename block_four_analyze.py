@@ -0,0 +1,216 @@
+""" Find best moves for positions from standard input, without a window.
+
+Each position is either an int from BlockFourGame.pack() on its own line,
+or the rows of cells in the initial_state() text format, optionally after
+a line with + or - for the player to move. Blank lines between text
+positions are ignored. Each position gets one JSON line on standard output,
+in the same order:
+
+    {"index": 0, "player": 1, "move": [4, 4], "value": 0.12, "visits": 1000}
+
+The value is from -1 to 1 for the positive player. Finished positions only
+get the winner: 1, -1, or 0 for a draw. Example:
+
+    python block_four_analyze.py --iterations 2000 <positions.txt
+
+Only the game module is imported before reading the input, and each engine
+imports its search code when it's needed, so one position gets an answer
+quickly.
+"""
+
+from argparse import ArgumentParser
+import json
+import sys
+
+from block_four_game import BlockFourGame
+
+ENGINES = ('mcts', 'puct', 'eval')
+
+
+def read_positions(lines, game: BlockFourGame, player=1):
+    """ Parse positions from lines of text.
+
+    :param player: the player to move in text positions that don't start
+        with + or -
+    :return: a generator of states
+    :raises ValueError: for a bad position, with the line number where it
+        starts
+    """
+    grid_size = game.geometry.grid_size
+    rows = []
+    block_player = player
+    start = None  # line number where the current text position starts
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if not rows:
+            if line.lstrip('-').isdigit():
+                packed = int(line)
+                try:
+                    game.check_packed(packed)
+                except ValueError as ex:
+                    raise ValueError(f'Line {line_number}: {ex}') from ex
+                yield game.unpack(packed)
+                continue
+            if line in ('+', '-'):
+                block_player = 1 if line == '+' else -1
+                start = line_number
+                continue
+            if start is None:
+                start = line_number
+        rows.append(line)
+        if len(rows) == grid_size:
+            cells = '\n'.join(rows)
+            try:
+                game.check_cells(cells)
+            except ValueError as ex:
+                raise ValueError(f'Line {start}: {ex}') from ex
+            yield game.initial_state(block_player, cells)
+            rows = []
+            block_player = player
+            start = None
+    if rows:
+        raise ValueError(f'Line {start}: position has {len(rows)} rows, '
+                         f'not {grid_size}.')
+
+
+class Analyzer:
+    """ Chooses a move and a value for each position with one engine.
+
+    :param engine: mcts for SearchTree, puct for PuctSearch, or eval to
+        score each move with the Evaluator, without searching
+    """
+    def __init__(self, game: BlockFourGame, engine='mcts', iterations=1000,
+                 seconds=None):
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine {engine!r}, expected one of '
+                             f'{", ".join(ENGINES)}.')
+        self.game = game
+        self.engine = engine
+        self.iterations = iterations
+        self.seconds = seconds
+        if engine == 'mcts':
+            from block_four_search import SearchTree
+            self.search_class = SearchTree
+        else:
+            from block_four_evaluation import Evaluator
+            from block_four_puct import PuctSearch
+            self.evaluator = Evaluator(game)
+            self.search_class = PuctSearch
+
+    def analyze(self, state):
+        """ Analyze one position.
+
+        :return: a dict for the JSON output, without the index
+        """
+        game = self.game
+        winner = game.get_winner(state)
+        if winner is not None:
+            return dict(player=state.player,
+                        winner=winner if winner in (1, -1) else 0)
+        if self.engine == 'eval':
+            _, moves = game.get_moves(state)
+            values = self.evaluator.evaluate([game.apply_move(state, move)
+                                              for move in moves])
+            i = max(range(len(moves)),
+                    key=lambda i: values[i] * state.player)
+            return dict(player=state.player,
+                        move=list(moves[i]),
+                        value=round(float(values[i]), 4))
+        if self.engine == 'mcts':
+            searcher = self.search_class(game)
+        else:
+            searcher = self.search_class(game, self.evaluator)
+        result = searcher.search(state, self.iterations, self.seconds)
+        root = result.root
+        child = max(root.children, key=lambda child: child.visits)
+        score = child.score / child.visits  # for the player to move
+        return dict(player=state.player,
+                    move=list(result.move),
+                    value=round((2*score - 1) * state.player, 4),
+                    visits=root.visits)
+
+
+analyzer = None  # each worker process's Analyzer
+
+
+def start_worker(field_size, field_count, engine, iterations, seconds):
+    global analyzer
+    game = BlockFourGame(field_size, field_count)
+    analyzer = Analyzer(game, engine, iterations, seconds)
+
+
+def analyze_packed(packed):
+    return analyzer.analyze(analyzer.game.unpack(packed))
+
+
+def analyze_all(states, analyzer_args, process_count=1, chunk_size=16):
+    """ Analyze states in order, in worker processes if process_count > 1.
+
+    :param analyzer_args: field_size, field_count, engine, iterations,
+        seconds
+    :return: a generator of result dicts
+    """
+    start_worker(*analyzer_args)
+    if process_count == 1:
+        for state in states:
+            yield analyzer.analyze(state)
+        return
+    from multiprocessing import Pool
+    game = analyzer.game
+    with Pool(process_count, start_worker, analyzer_args) as pool:
+        yield from pool.imap(analyze_packed,
+                             (game.pack(state) for state in states),
+                             chunk_size)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Find best moves for positions from standard input.')
+    parser.add_argument('--engine', choices=ENGINES, default='mcts')
+    parser.add_argument('--iterations',
+                        type=int,
+                        help='search iterations for each position, 1000 '
+                             'by default if seconds is not set')
+    parser.add_argument('--seconds',
+                        type=float,
+                        help='search time for each position')
+    parser.add_argument('--player',
+                        type=int,
+                        choices=(1, -1),
+                        default=1,
+                        help='player to move in text positions without + '
+                             'or -')
+    parser.add_argument('--processes',
+                        type=int,
+                        default=1,
+                        help='worker processes to share the positions')
+    parser.add_argument('--field-size', type=int, default=3)
+    parser.add_argument('--field-count', type=int, default=3)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    iterations = args.iterations
+    if iterations is None and args.seconds is None:
+        iterations = 1000
+    game = BlockFourGame(args.field_size, args.field_count)
+    states = read_positions(sys.stdin, game, args.player)
+    results = analyze_all(states,
+                          (args.field_size,
+                           args.field_count,
+                           args.engine,
+                           iterations,
+                           args.seconds),
+                          args.processes)
+    try:
+        for index, result in enumerate(results):
+            print(json.dumps(dict(index=index, **result)), flush=True)
+    except ValueError as ex:
+        sys.exit(f'Bad position: {ex}')
+
+
+if __name__ == '__main__':
+    main()
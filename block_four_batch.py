@@ -0,0 +1,246 @@
+import numpy as np
+from mittmcts import Draw
+
+from block_four_game import BlockFourGame, BlockFourState
+
+DRAW = 0  # value in winner arrays when nobody wins
+NO_WINNER = 2  # value in winner arrays when the game isn't finished yet
+
+
+class BlockFourBatch:
+    """ Holds many game states in arrays, and plays them all at once.
+
+    Cells are boolean arrays with shape (games, fields, cells per field),
+    and each field's cells are in reading order. The counts of each player's
+    cells in each field have shape (games, fields). Moves are arrays of cell
+    indexes, row * grid_size + column, and a negative index means that game
+    doesn't move.
+    """
+    def __init__(self, game: BlockFourGame, pos_cells, neg_cells, player):
+        self.game = game
+        self.pos_cells = pos_cells
+        self.neg_cells = neg_cells
+        self.player = player
+        self.pos_counts = pos_cells.sum(axis=2, dtype=np.int16)
+        self.neg_counts = neg_cells.sum(axis=2, dtype=np.int16)
+
+        # board cell index for each field and slot
+        self.field_cells = get_field_cells(game)
+        # field and slot for each board cell
+        self.cell_fields = np.array(game.geometry.cell_fields)
+        self.cell_slots = np.argsort(self.field_cells, axis=None) % \
+            self.field_cells.shape[1]
+
+    @classmethod
+    def from_states(cls, game: BlockFourGame, states):
+        cell_count = game.geometry.cell_count
+        byte_count = (cell_count + 7) // 8
+        field_cells = get_field_cells(game)
+
+        def unpack(values):
+            data = b''.join(value.to_bytes(byte_count, 'little')
+                            for value in values)
+            bits = np.unpackbits(np.frombuffer(data, np.uint8),
+                                 bitorder='little')
+            cells = bits.reshape(len(states), -1)[:, :cell_count]
+            return cells[:, field_cells].astype(bool)
+
+        return cls(game,
+                   unpack(state.pos_cells for state in states),
+                   unpack(state.neg_cells for state in states),
+                   np.array([state.player for state in states], np.int8))
+
+    @classmethod
+    def from_packed(cls, game: BlockFourGame, buffer):
+        """ Load states from the records written by game.write_packed().
+
+        The buffer is read in place, so bytes, bytearray, array.array, mmap,
+        and NumPy arrays all work without copying it first.
+        """
+        geometry = game.geometry
+        cell_count = geometry.cell_count
+        records = np.frombuffer(buffer, np.uint8).reshape(
+            -1,
+            geometry.packed_size)
+        bits = np.unpackbits(records, axis=1, bitorder='little').view(bool)
+        field_cells = get_field_cells(game)
+        return cls(game,
+                   bits[:, :cell_count][:, field_cells],
+                   bits[:, cell_count:2*cell_count][:, field_cells],
+                   np.where(bits[:, 2*cell_count], -1, 1).astype(np.int8))
+
+    @classmethod
+    def initial(cls, game: BlockFourGame, size, player=1):
+        geometry = game.geometry
+        shape = (size, len(geometry.field_masks), geometry.field_size ** 2)
+        return cls(game,
+                   np.zeros(shape, bool),
+                   np.zeros(shape, bool),
+                   np.full(size, player, np.int8))
+
+    def __len__(self):
+        return len(self.player)
+
+    def to_states(self):
+        def pack(cells):
+            board = np.zeros((len(self), self.game.geometry.cell_count), bool)
+            board[:, self.field_cells] = cells
+            data = np.packbits(board, axis=1, bitorder='little')
+            return [int.from_bytes(row.tobytes(), 'little') for row in data]
+
+        return [self.game.add_fields(BlockFourState(pos_cells,
+                                                    neg_cells,
+                                                    int(player)))
+                for pos_cells, neg_cells, player in zip(pack(self.pos_cells),
+                                                        pack(self.neg_cells),
+                                                        self.player)]
+
+    def to_packed(self):
+        """ Write the states as records, like game.write_packed().
+
+        :return: a NumPy uint8 array with a row for each game
+        """
+        geometry = self.game.geometry
+        cell_count = geometry.cell_count
+        bits = np.zeros((len(self), geometry.packed_size * 8), bool)
+        bits[:, self.field_cells] = self.pos_cells
+        bits[:, self.field_cells + cell_count] = self.neg_cells
+        bits[:, 2*cell_count] = self.player == -1
+        return np.packbits(bits, axis=1, bitorder='little')
+
+    def get_field_moves(self):
+        """ Find the first empty cell in each field.
+
+        :return: move_cells, has_move, each with shape (games, fields)
+        """
+        empty_cells = ~(self.pos_cells | self.neg_cells)
+        first_empty = empty_cells.argmax(axis=2)
+        move_cells = self.field_cells[np.arange(self.field_cells.shape[0]),
+                                      first_empty]
+        return move_cells, empty_cells.any(axis=2)
+
+    def get_move_mask(self):
+        """ Flag the legal cells to move in, with shape (games, cells). """
+        move_cells, has_move = self.get_field_moves()
+        mask = np.zeros((len(self), self.game.geometry.cell_count), bool)
+        games, fields = np.nonzero(has_move)
+        mask[games, move_cells[games, fields]] = True
+        return mask
+
+    def get_moves(self):
+        """ List the moves for each game, like BlockFourGame.get_moves. """
+        cell_moves = self.game.geometry.cell_moves
+        move_cells, has_move = self.get_field_moves()
+        return [[cell_moves[cell] for cell in cells[is_open]]
+                for cells, is_open in zip(move_cells, has_move)]
+
+    def apply_moves(self, cells):
+        """ Fill in one cell for each game, and capture fields. """
+        cells = np.asarray(cells)
+        games = np.flatnonzero(cells >= 0)
+        cells = cells[games]
+        self.apply_field_moves(games,
+                               self.cell_fields[cells],
+                               self.cell_slots[cells])
+
+    def apply_field_moves(self, games, fields, slots):
+        is_pos = self.player[games] == 1
+        capture_count = self.game.geometry.capture_count
+        field_size = self.pos_cells.shape[2]
+        for (active_cells, active_counts,
+             other_cells, other_counts,
+             is_active) in ((self.pos_cells, self.pos_counts,
+                             self.neg_cells, self.neg_counts,
+                             is_pos),
+                            (self.neg_cells, self.neg_counts,
+                             self.pos_cells, self.pos_counts,
+                             ~is_pos)):
+            active_games = games[is_active]
+            active_fields = fields[is_active]
+            active_cells[active_games, active_fields, slots[is_active]] = True
+            active_counts[active_games, active_fields] += 1
+            is_captured = (active_counts[active_games, active_fields] >=
+                           capture_count)
+            captured_games = active_games[is_captured]
+            captured_fields = active_fields[is_captured]
+            active_cells[captured_games, captured_fields] = \
+                ~other_cells[captured_games, captured_fields]
+            active_counts[captured_games, captured_fields] = \
+                field_size - other_counts[captured_games, captured_fields]
+
+        self.player[games] *= -1
+
+    def get_winners(self, games=slice(None)):
+        """ Find the winner of each game, like BlockFourGame.get_winner.
+
+        :param games: index of the games to check, or all of them
+        :return: an array of 1, -1, DRAW, or NO_WINNER
+        """
+        field_pos = self.pos_counts[games]
+        field_neg = self.neg_counts[games]
+        if self.game.count_cells:
+            pos_counts = field_pos.sum(axis=1, dtype=np.int16)
+            neg_counts = field_neg.sum(axis=1, dtype=np.int16)
+            is_finished = (pos_counts + neg_counts ==
+                           self.game.geometry.cell_count)
+        else:
+            capture_count = self.game.geometry.capture_count
+            open_fields = field_pos + field_neg < self.pos_cells.shape[2]
+            pos_fields = field_pos >= capture_count
+            neg_fields = field_neg >= capture_count
+            pos_counts = np.count_nonzero(pos_fields, axis=1)
+            neg_counts = np.count_nonzero(neg_fields, axis=1)
+            contested_counts = np.count_nonzero(
+                open_fields & ~(pos_fields | neg_fields),
+                axis=1)
+            is_finished = ((contested_counts == 0) |
+                           (pos_counts > neg_counts + contested_counts) |
+                           (neg_counts > pos_counts + contested_counts))
+        winners = np.sign(pos_counts - neg_counts).astype(np.int8)
+        winners[~is_finished] = NO_WINNER
+        return winners
+
+    def simulate(self, rng: np.random.Generator = None):
+        """ Play random moves in all games until they finish.
+
+        This changes the batch to the final positions.
+        :return: the winners, as from get_winners()
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        winners = self.get_winners()
+        games = np.flatnonzero(winners == NO_WINNER)
+        field_size = self.pos_cells.shape[2]
+        while games.size:
+            is_open = (self.pos_counts[games] + self.neg_counts[games] <
+                       field_size)
+            # The highest random score among the open fields is a uniform
+            # choice, because closed fields score zero.
+            scores = rng.random(is_open.shape, np.float32) + 1
+            scores[~is_open] = 0
+            fields = scores.argmax(axis=1)
+            empty_cells = ~(self.pos_cells[games, fields] |
+                            self.neg_cells[games, fields])
+            slots = empty_cells.argmax(axis=1)
+            self.apply_field_moves(games, fields, slots)
+            winners[games] = self.get_winners(games)
+            games = games[winners[games] == NO_WINNER]
+        return winners
+
+
+def get_field_cells(game: BlockFourGame):
+    """ List the board cell indexes in each field. """
+    geometry = game.geometry
+    return np.array([[cell
+                      for cell in range(geometry.cell_count)
+                      if field_mask >> cell & 1]
+                     for field_mask in geometry.field_masks])
+
+
+def winner_value(winner):
+    """ Convert a value from a winner array to a BlockFourGame winner. """
+    if winner == NO_WINNER:
+        return None
+    if winner == DRAW:
+        return Draw
+    return int(winner)
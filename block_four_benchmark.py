@@ -0,0 +1,236 @@
+""" Measure the speed of the game engine and the search.
+
+Each benchmark runs on several board sizes, and on positions filled to
+several levels with random moves. Results are written as JSON, and can be
+compared with a saved baseline to catch regressions:
+
+    python block_four_benchmark.py --output baseline.json
+    python block_four_benchmark.py --compare baseline.json
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+import json
+import platform
+from random import Random
+import sys
+from time import perf_counter
+
+from block_four_game import BlockFourGame
+from block_four_search import SearchTree
+
+GEOMETRIES = ((2, 2), (3, 2), (3, 3))  # (field_size, field_count)
+FILL_LEVELS = (0.0, 0.5, 0.9)  # share of cells filled before measuring
+POSITION_COUNT = 100
+
+
+def make_positions(game: BlockFourGame, fill, count, seed=0):
+    """ Make count positions with random moves, one for each filled cell.
+
+    Moves continue after the game is decided, and captured fields fill up,
+    so a position can end up fuller than the fill level, or full.
+    """
+    random = Random(seed)
+    move_count = int(fill * game.geometry.cell_count)
+    positions = []
+    for _ in range(count):
+        state = game.initial_state(player=random.choice((1, -1)))
+        for _ in range(move_count):
+            _, moves = game.get_moves(state)
+            if not moves:
+                break
+            state = game.apply_move(state, random.choice(moves))
+        positions.append(state)
+    return positions
+
+
+def list_benchmarks(game: BlockFourGame, positions):
+    """ List (name, function) pairs, where function runs over positions.
+
+    :return: each function returns the number of operations it ran
+    """
+    random = Random(0)
+    move_lists = [game.get_moves(state)[1] for state in positions]
+    moved_positions = [(state, moves[0])
+                       for state, moves in zip(positions, move_lists)
+                       if moves]
+    texts = [game.format(state) for state in positions]
+
+    def apply_move():
+        for state, move in moved_positions:
+            game.apply_move(state, move)
+        return len(moved_positions)
+
+    def get_moves():
+        for state in positions:
+            game.get_moves(state)
+        return len(positions)
+
+    def get_winner():
+        for state in positions:
+            game.get_winner(state)
+        return len(positions)
+
+    def format_state():
+        for state in positions:
+            game.format(state)
+        return len(positions)
+
+    def initial_state():
+        for text in texts:
+            game.initial_state(player=1, cells=text)
+        return len(texts)
+
+    def simulate():
+        for state in positions:
+            game.simulate(state, random.random)
+        return len(positions)
+
+    def search():
+        state = positions[0]
+        if game.get_winner(state) is not None:
+            return 0
+        result = SearchTree(game).search(state, iterations=200)
+        return result.root.visits
+
+    return [('apply_move', apply_move),
+            ('get_moves', get_moves),
+            ('get_winner', get_winner),
+            ('format', format_state),
+            ('initial_state', initial_state),
+            ('simulate', simulate),
+            ('search', search)]
+
+
+def measure(function, min_seconds, repeat=3):
+    """ Find the best rate of operations per second over a few runs. """
+    best_rate = 0.0
+    for _ in range(repeat):
+        count = 0
+        start = perf_counter()
+        while True:
+            count += function()
+            duration = perf_counter() - start
+            if duration >= min_seconds:
+                break
+        best_rate = max(best_rate, count / duration)
+    return best_rate
+
+
+def run_benchmarks(geometries=GEOMETRIES,
+                   fill_levels=FILL_LEVELS,
+                   min_seconds=0.2,
+                   names=None,
+                   report=None):
+    """ Run all the benchmarks on each geometry and fill level.
+
+    :param names: the benchmarks to run, or None for all of them
+    :param report: a function to call with each result
+    :return: a list of result dicts
+    """
+    results = []
+    for field_size, field_count in geometries:
+        game = BlockFourGame(field_size, field_count)
+        for fill in fill_levels:
+            positions = make_positions(game, fill, POSITION_COUNT)
+            for name, function in list_benchmarks(game, positions):
+                if names is not None and name not in names:
+                    continue
+                rate = measure(function, min_seconds)
+                if rate == 0:
+                    continue  # Nothing to measure, like searching a win.
+                result = dict(name=name,
+                              field_size=field_size,
+                              field_count=field_count,
+                              fill=fill,
+                              ops_per_second=round(rate, 1))
+                results.append(result)
+                if report is not None:
+                    report(result)
+    return results
+
+
+def get_key(result):
+    return (result['name'],
+            result['field_size'],
+            result['field_count'],
+            result['fill'])
+
+
+def compare_results(results, baseline_results, threshold=0.1):
+    """ Find the benchmarks that got slower than the baseline.
+
+    :param threshold: the share of speed that can be lost before a result
+        counts as a regression
+    :return: a list of (result, baseline_result, ratio), where ratio is
+        the new speed over the old
+    """
+    baseline = {get_key(result): result for result in baseline_results}
+    regressions = []
+    for result in results:
+        baseline_result = baseline.get(get_key(result))
+        if baseline_result is None:
+            continue
+        ratio = result['ops_per_second'] / baseline_result['ops_per_second']
+        if ratio < 1 - threshold:
+            regressions.append((result, baseline_result, ratio))
+    return regressions
+
+
+def format_result(result):
+    return (f'{result["name"]:14} '
+            f'{result["field_size"]}x{result["field_count"]} '
+            f'fill {result["fill"]:.1f}: '
+            f'{result["ops_per_second"]:12.1f}/s')
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Measure the speed of the game engine and search.')
+    parser.add_argument('--output', help='JSON file to write results to')
+    parser.add_argument('--compare',
+                        help='JSON file with baseline results to compare to')
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=0.1,
+                        help='share of speed that can be lost before a '
+                             'regression is reported')
+    parser.add_argument('--seconds',
+                        type=float,
+                        default=0.2,
+                        help='least time to measure each run for')
+    parser.add_argument('--benchmarks',
+                        nargs='+',
+                        help='names of the benchmarks to run')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = run_benchmarks(min_seconds=args.seconds,
+                             names=args.benchmarks,
+                             report=lambda result: print(
+                                 format_result(result)))
+    document = dict(python=platform.python_version(),
+                    platform=platform.platform(),
+                    time=datetime.now(timezone.utc).isoformat(),
+                    results=results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(document, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare_results(results,
+                                      baseline['results'],
+                                      args.threshold)
+        for result, _, ratio in regressions:
+            print(f'Regression: {format_result(result)}, '
+                  f'{ratio:.0%} of baseline speed.')
+        if regressions:
+            sys.exit(1)
+        print('No regressions.')
+
+
+if __name__ == '__main__':
+    main()
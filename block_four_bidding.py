@@ -0,0 +1,221 @@
+""" Blind bidding for tetromino cards, as described in the README.
+
+Each turn, both players secretly choose two cards from their hands. The
+BiddingSolver fills in the shapes for every pair of choices, evaluates the
+boards, and solves the payoff matrix for a mixed strategy. Solutions are
+cached by the two hands and the board, whoever is to move, so a search
+that reaches the same situation again doesn't solve it again.
+"""
+
+from collections import namedtuple
+from itertools import combinations
+
+import numpy as np
+from mittmcts import Draw
+
+from block_four_game import BlockFourState, bit_count
+from block_four_table import TranspositionTable
+from block_four_tetromino import TetrominoGame, SHAPES
+
+ALL_CARDS = ''.join(SHAPES)  # a hand is a string of shapes in this order
+
+BiddingResult = namedtuple('BiddingResult',
+                           'pos_choices pos_strategy '
+                           'neg_choices neg_strategy value')
+
+
+def get_choices(hand: str):
+    """ List the pairs of cards that a player can choose from a hand. """
+    return [''.join(pair) for pair in combinations(hand, 2)]
+
+
+def get_next_hand(hand: str, choice: str):
+    """ Find a player's hand after the turn, once they pick up their cards.
+
+    A player who has one card left picks up all their other cards.
+    """
+    hand = ''.join(shape for shape in hand if shape not in choice)
+    if len(hand) == 1:
+        return ALL_CARDS
+    return hand
+
+
+def resolve_bids(pos_choice: str, neg_choice: str):
+    """ List the shapes that each player fills in, in the order they go.
+
+    :return: a list of (player, shape) pairs
+    """
+    matches = set(pos_choice) & set(neg_choice)
+    if len(matches) == 2:
+        return []
+    if matches:
+        # Two copies of the shape that didn't match.
+        pos_shapes = [shape for shape in pos_choice if shape not in matches]
+        neg_shapes = [shape for shape in neg_choice if shape not in matches]
+        pos_shapes *= 2
+        neg_shapes *= 2
+    else:
+        pos_shapes = list(pos_choice)
+        neg_shapes = list(neg_choice)
+    placements = [(1, shape) for shape in pos_shapes]
+    placements.extend((-1, shape) for shape in neg_shapes)
+    placements.sort(key=lambda placement: ALL_CARDS.index(placement[1]))
+    return placements
+
+
+def solve_matrix(payoffs, iterations=1000, tolerance=0.001):
+    """ Find mixed strategies for a zero-sum matrix game.
+
+    Uses regret matching+, weighting later iterations more in the average
+    strategies.
+    :param payoffs: one row for each of the first player's choices, one
+        column for each of the second player's choices, with values for the
+        first player
+    :param iterations: the most iterations to run
+    :param tolerance: stop when neither player can gain more than this by
+        changing strategy
+    :return: row_strategy, column_strategy, value
+    """
+    payoffs = np.asarray(payoffs, dtype=float)
+    row_count, column_count = payoffs.shape
+    row_regrets = np.zeros(row_count)
+    column_regrets = np.zeros(column_count)
+    row_total = np.zeros(row_count)
+    column_total = np.zeros(column_count)
+    for i in range(1, iterations + 1):
+        row_strategy = get_strategy(row_regrets)
+        column_strategy = get_strategy(column_regrets)
+        row_values = payoffs @ column_strategy
+        column_values = -(row_strategy @ payoffs)
+        row_regrets += row_values - row_strategy @ row_values
+        np.maximum(row_regrets, 0, out=row_regrets)
+        column_regrets += column_values - column_strategy @ column_values
+        np.maximum(column_regrets, 0, out=column_regrets)
+        row_total += i * row_strategy
+        column_total += i * column_strategy
+        if i % 50 == 0:
+            row_average = row_total / row_total.sum()
+            column_average = column_total / column_total.sum()
+            gap = ((payoffs @ column_average).max() -
+                   (row_average @ payoffs).min())
+            if gap <= tolerance:
+                break
+    row_strategy = row_total / row_total.sum()
+    column_strategy = column_total / column_total.sum()
+    value = row_strategy @ payoffs @ column_strategy
+    return row_strategy, column_strategy, float(value)
+
+
+def get_strategy(regrets):
+    total = regrets.sum()
+    if total <= 0:
+        return np.full(len(regrets), 1 / len(regrets))
+    return regrets / total
+
+
+class BiddingSolver:
+    """ Solve the bidding at the start of a turn.
+
+    Each player fills in their shapes greedily, in the cells that can still
+    change which player controls a field. Results are cached in a
+    transposition table, so a board shares its entry with its rotations and
+    reflections.
+    """
+    def __init__(self,
+                 game: TetrominoGame,
+                 evaluate=None,
+                 capacity=100_000,
+                 iterations=1000):
+        """ Initialize.
+
+        :param game: the game to fill in shapes for
+        :param evaluate: a function that gives the value of a state for the
+            positive player, from -1 to 1, or None to count fields
+        :param capacity: the most solutions to cache
+        :param iterations: the most iterations for solve_matrix()
+        """
+        self.game = game
+        self.evaluate = evaluate or self.count_fields
+        self.iterations = iterations
+        self.table = TranspositionTable(game.board, capacity)
+
+    def solve(self, state: BlockFourState, pos_hand: str, neg_hand: str):
+        # fill_shapes() sets the player for each shape, so the player to
+        # move doesn't change the result.
+        board_key = self.table.get_key(state._replace(player=1))
+        key = (pos_hand, neg_hand, board_key)
+        result = self.table.get(key)
+        if result is None:
+            pos_choices = get_choices(pos_hand)
+            neg_choices = get_choices(neg_hand)
+            payoffs = self.get_payoffs(state, pos_choices, neg_choices)
+            pos_strategy, neg_strategy, value = solve_matrix(payoffs,
+                                                             self.iterations)
+            result = BiddingResult(pos_choices,
+                                   pos_strategy,
+                                   neg_choices,
+                                   neg_strategy,
+                                   value)
+            self.table.put(key, result)
+        return result
+
+    def get_payoffs(self, state: BlockFourState, pos_choices, neg_choices):
+        """ Evaluate the board after each pair of choices. """
+        values = {}  # Different choices often fill in the same shapes.
+        payoffs = []
+        for pos_choice in pos_choices:
+            row = []
+            for neg_choice in neg_choices:
+                placements = tuple(resolve_bids(pos_choice, neg_choice))
+                value = values.get(placements)
+                if value is None:
+                    end_state = self.fill_shapes(state, placements)
+                    value = values[placements] = self.evaluate(end_state)
+                row.append(value)
+            payoffs.append(row)
+        return payoffs
+
+    def fill_shapes(self, state: BlockFourState, placements):
+        """ Fill in each shape where it adds the most useful cells. """
+        game = self.game
+        for player, shape in placements:
+            state = state._replace(player=player)
+            moves = game.get_moves(state, shape)
+            if not moves:
+                continue
+            useful_cells = self.find_useful_cells(state)
+            move = max(moves,
+                       key=lambda move: bit_count(move.cells & useful_cells))
+            state = game.apply_move(state, move)
+        return state
+
+    def find_useful_cells(self, state: BlockFourState):
+        """ Find the empty cells in fields that nobody controls yet. """
+        geometry = self.game.geometry
+        controlled_fields = state.pos_fields | state.neg_fields
+        useful_cells = 0
+        for field, field_mask in enumerate(geometry.field_masks):
+            if not controlled_fields & (1 << field):
+                useful_cells |= field_mask
+        return useful_cells & ~(state.pos_cells | state.neg_cells)
+
+    def count_fields(self, state: BlockFourState):
+        """ Score controlled fields, plus a share of contested fields. """
+        winner = self.game.get_winner(state)
+        if winner is Draw:
+            return 0.0
+        if winner is not None:
+            return float(winner)
+        geometry = self.game.geometry
+        capture_count = geometry.capture_count
+        total = 0.0
+        for field_mask in geometry.field_masks:
+            pos_count = bit_count(state.pos_cells & field_mask)
+            neg_count = bit_count(state.neg_cells & field_mask)
+            if pos_count >= capture_count:
+                total += 1
+            elif neg_count >= capture_count:
+                total -= 1
+            else:
+                total += (pos_count - neg_count) / capture_count
+        return total / len(geometry.field_masks)
@@ -0,0 +1,193 @@
+""" An opening book of searched moves, read from a memory-mapped file.
+
+The book holds the best move for every position in the first few plies,
+found by deep searches ahead of time. Positions are stored in canonical
+form, so each one covers all its rotations and reflections. Records are
+sorted by key, and looked up with a binary search on the memory map, so
+opening a book doesn't read it.
+
+Run this module to build a book.
+"""
+
+from argparse import ArgumentParser
+from collections import namedtuple
+from mmap import mmap, ACCESS_READ
+import os
+from struct import Struct
+from time import perf_counter
+
+from block_four_game import BlockFourGame, BlockFourState
+from block_four_search import SearchTree
+
+BookEntry = namedtuple('BookEntry',
+                       'move visits score is_final',
+                       defaults=(True,))
+
+HEADER = Struct('<4sBB2xI')  # magic, field_size, field_count, record count
+MAGIC = b'B4OB'
+# next to this module, so it's found from any working directory
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'block_four_book.bin')
+
+
+def get_record_format(game: BlockFourGame):
+    """ Packed key, then the move's cell index, visits, and score. """
+    key_size = (2 * game.geometry.cell_count + 1 + 7) // 8
+    return Struct(f'>{key_size}sHIf')
+
+
+def pack_key(game: BlockFourGame, key):
+    """ Pack a canonical (pos_cells, neg_cells, player) into bytes.
+
+    Bytes sort in the same order as the numbers they hold, so the file can
+    be sorted and searched by its raw bytes.
+    """
+    pos_cells, neg_cells, player = key
+    cell_count = game.geometry.cell_count
+    number = (pos_cells << (cell_count + 1) |
+              neg_cells << 1 |
+              (player == -1))
+    return number.to_bytes((2 * cell_count + 1 + 7) // 8, 'big')
+
+
+class OpeningBook:
+    """ Looks up moves in a file written by write_book(). """
+    def __init__(self, game: BlockFourGame, path=DEFAULT_BOOK_PATH):
+        self.game = game
+        self.record_format = get_record_format(game)
+        with open(path, 'rb') as file:
+            self.data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        magic, field_size, field_count, self.record_count = \
+            HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an opening book.')
+        if (field_size, field_count) != (game.field_size, game.field_count):
+            raise ValueError(
+                f'{path} is for {field_size}x{field_size} fields, '
+                f'{field_count} to a side.')
+
+    def __len__(self):
+        return self.record_count
+
+    def get_entry(self, state: BlockFourState):
+        """ Look up the book move for a state, or None if it isn't there. """
+        game = self.game
+        key, symmetry = game.get_canonical_form(state)
+        packed_key = pack_key(game, key)
+        record_format = self.record_format
+        key_size = len(packed_key)
+        data = self.data
+        low = 0
+        high = self.record_count
+        while low < high:
+            middle = (low + high) // 2
+            start = HEADER.size + middle * record_format.size
+            middle_key = data[start:start + key_size]
+            if middle_key < packed_key:
+                low = middle + 1
+            elif packed_key < middle_key:
+                high = middle
+            else:
+                _, cell, visits, score = record_format.unpack_from(data,
+                                                                   start)
+                # Images of a state have the same value, but a field's
+                # first free cell can move, so only the field carries over.
+                geometry = game.geometry
+                cell = geometry.symmetries[symmetry][cell]
+                row_field, column_field = divmod(geometry.cell_fields[cell],
+                                                 game.field_count)
+                move = next(game.get_field_moves(state,
+                                                 row_field,
+                                                 column_field))
+                return BookEntry(move, visits, score)
+        return None
+
+    def close(self):
+        self.data.close()
+
+
+def build_book(game: BlockFourGame, plies, iterations, report=None):
+    """ Search every position in the first few plies.
+
+    :param plies: the number of moves played before the last searched
+        positions
+    :param iterations: search iterations for each position
+    :param report: a function to call with the number of positions searched
+        so far
+    :return: {canonical_key: (cell, visits, score)}
+    """
+    grid_size = game.geometry.grid_size
+    entries = {}
+    positions = {game.get_canonical_form(game.initial_state(player))[0]
+                 for player in (1, -1)}
+    for ply in range(plies + 1):
+        next_positions = set()
+        for key in sorted(positions):
+            state = game.add_fields(BlockFourState(*key))
+            if game.get_winner(state) is not None:
+                continue
+            result = SearchTree(game).search(state, iterations)
+            best_child = next(child
+                              for child in result.root.children
+                              if child.move == result.move)
+            entries[key] = (result.move.row * grid_size + result.move.column,
+                            best_child.visits,
+                            best_child.score)
+            if report is not None:
+                report(len(entries))
+            if ply < plies:
+                _, moves = game.get_moves(state)
+                for move in moves:
+                    child = game.apply_move(state, move)
+                    next_positions.add(game.get_canonical_form(child)[0])
+        positions = next_positions
+    return entries
+
+
+def write_book(game: BlockFourGame, entries, path=DEFAULT_BOOK_PATH):
+    record_format = get_record_format(game)
+    records = sorted((pack_key(game, key), cell, visits, score)
+                     for key, (cell, visits, score) in entries.items())
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC,
+                               game.field_size,
+                               game.field_count,
+                               len(records)))
+        for record in records:
+            file.write(record_format.pack(*record))
+
+
+def parse_args():
+    parser = ArgumentParser(description='Build an opening book.')
+    parser.add_argument('path',
+                        nargs='?',
+                        default=DEFAULT_BOOK_PATH,
+                        help='file to write the book to')
+    parser.add_argument('--plies',
+                        type=int,
+                        default=3,
+                        help='moves before the last searched positions')
+    parser.add_argument('--iterations',
+                        type=int,
+                        default=20000,
+                        help='search iterations for each position')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    game = BlockFourGame()
+    start = perf_counter()
+
+    def report(count):
+        print(f'Searched {count} positions.', end='\r')
+
+    entries = build_book(game, args.plies, args.iterations, report)
+    write_book(game, entries, args.path)
+    duration = perf_counter() - start
+    print(f'Wrote {len(entries)} positions to {args.path} '
+          f'in {duration:.0f}s.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+""" Score positions from field features, for a batch of states at once.
+
+Each open field gets a chance that each player captures it, assuming each
+of its empty cells goes to either player with even odds. A player who is
+about to capture a field, and is also the player to move, captures the best
+such field. The chances for all the fields then give a distribution of the
+difference between the players' field counts, and the value is the chance
+that the positive player wins minus the chance that the negative player
+does.
+"""
+
+import numpy as np
+
+from block_four_batch import BlockFourBatch
+from block_four_game import BlockFourGame
+
+
+class Evaluator:
+    def __init__(self, game: BlockFourGame):
+        if game.count_cells:
+            raise ValueError('Evaluator scores games by fields, not '
+                             'count_cells.')
+        self.game = game
+        geometry = game.geometry
+        capture_count = geometry.capture_count
+        field_cell_count = geometry.field_size ** 2
+
+        # Chances that each player captures a field, indexed by counts.
+        shape = (field_cell_count + 1, field_cell_count + 1)
+        self.pos_chances = np.zeros(shape)
+        self.neg_chances = np.zeros(shape)
+        for total in range(field_cell_count, -1, -1):
+            for pos_count in range(total + 1):
+                neg_count = total - pos_count
+                if pos_count >= capture_count:
+                    self.pos_chances[pos_count, neg_count] = 1
+                elif neg_count >= capture_count:
+                    self.neg_chances[pos_count, neg_count] = 1
+                elif total < field_cell_count:
+                    for chances in (self.pos_chances, self.neg_chances):
+                        chances[pos_count, neg_count] = (
+                            chances[pos_count + 1, neg_count] +
+                            chances[pos_count, neg_count + 1]) / 2
+
+    def evaluate(self, states):
+        """ Score a list of states for the positive player, from -1 to 1. """
+        return self.evaluate_batch(BlockFourBatch.from_states(self.game,
+                                                              states))
+
+    def evaluate_batch(self, batch: BlockFourBatch):
+        """ Score each game in a batch for the positive player. """
+        pos_counts = batch.pos_counts.astype(np.intp)
+        neg_counts = batch.neg_counts.astype(np.intp)
+        pos_chances = self.pos_chances[pos_counts, neg_counts]
+        neg_chances = self.neg_chances[pos_counts, neg_counts]
+
+        # The player to move can capture one field that only needs one cell.
+        capture_count = self.game.geometry.capture_count
+        games = np.arange(len(batch))
+        is_pos = batch.player == 1
+        mover_counts = np.where(is_pos[:, None], pos_counts, neg_counts)
+        mover_chances = np.where(is_pos[:, None], pos_chances, neg_chances)
+        field_cell_count = self.game.geometry.field_size ** 2
+        is_ready = ((mover_counts == capture_count - 1) &
+                    (pos_counts + neg_counts < field_cell_count))
+        gains = np.where(is_ready, 1 - mover_chances, 0)
+        best_fields = gains.argmax(axis=1)
+        is_capturing = gains[games, best_fields] > 0
+        capture_games = games[is_capturing]
+        capture_fields = best_fields[is_capturing]
+        capture_is_pos = is_pos[is_capturing]
+        pos_chances[capture_games, capture_fields] = capture_is_pos
+        neg_chances[capture_games, capture_fields] = ~capture_is_pos
+
+        # Distribution of pos_fields - neg_fields, offset by field_count.
+        field_count = pos_counts.shape[1]
+        distribution = np.zeros((len(batch), 2 * field_count + 1))
+        distribution[:, field_count] = 1
+        for field in range(field_count):
+            pos_chance = pos_chances[:, field:field+1]
+            neg_chance = neg_chances[:, field:field+1]
+            next_distribution = distribution * (1 - pos_chance - neg_chance)
+            next_distribution[:, 1:] += distribution[:, :-1] * pos_chance
+            next_distribution[:, :-1] += distribution[:, 1:] * neg_chance
+            distribution = next_distribution
+        return (distribution[:, field_count+1:].sum(axis=1) -
+                distribution[:, :field_count].sum(axis=1))
@@ -1,27 +1,127 @@
 from collections import namedtuple
-from random import choice
+from functools import lru_cache
+from random import choice, random
 
 from mittmcts import Draw
 
 BlockFourState = namedtuple('BlockFourState',
                             ['pos_cells',  # integer of bit flags
                              'neg_cells',  # integer of bit flags
-                             'player'])  # next player to move: -1 or 1
+                             'player',  # next player to move: -1 or 1
+                             # The rest are bit flags of fields, derived from
+                             # the cells, or None to calculate them.
+                             'open_fields',  # fields with empty cells
+                             'pos_fields',  # fields controlled by 1
+                             'neg_fields'],  # fields controlled by -1
+                            defaults=(None, None, None))
 
 
 BlockFourMove = namedtuple('BlockFourMove', 'row column')  # values 0-8
 
+try:
+    bit_count = int.bit_count
+except AttributeError:  # Python 3.9 doesn't have int.bit_count().
+    def bit_count(n):
+        return bin(n).count('1')
+
+CELL_SYMBOLS = str.maketrans('012', '.+-')
+POS_DIGITS = str.maketrans('2', '0')
+NEG_DIGITS = str.maketrans('12', '01')
+
+
+class BlockFourGeometry:
+    """ Bit masks for one board size, shared by all games of that size.
+
+    Cell bits are numbered row * grid_size + column, and fields are numbered
+    row_field * field_count + column_field.
+    """
+    def __init__(self, field_size, field_count):
+        self.field_size = field_size
+        self.field_count = field_count
+        self.grid_size = grid_size = field_size * field_count
+        self.cell_count = grid_size * grid_size
+        self.all_cells = (1 << self.cell_count) - 1
+        self.cell_bits = tuple(1 << i for i in range(self.cell_count))
+        self.cell_moves = tuple(BlockFourMove(*divmod(i, grid_size))
+                                for i in range(self.cell_count))
+
+        field_masks = []
+        for row_field in range(field_count):
+            for column_field in range(field_count):
+                start_row = row_field * field_size
+                start_column = column_field * field_size
+                mask = 0
+                for row in range(start_row, start_row + field_size):
+                    for column in range(start_column,
+                                        start_column + field_size):
+                        mask |= 1 << (row * grid_size + column)
+                field_masks.append(mask)
+        self.field_masks = tuple(field_masks)
+        self.all_fields = (1 << len(field_masks)) - 1
+        self.cell_fields = tuple(
+            (row // field_size) * field_count + column // field_size
+            for row in range(grid_size)
+            for column in range(grid_size))
+
+        # A player captures a field with more than half of its cells.
+        self.capture_count = field_size * field_size // 2 + 1
+
+        # Bytes for a packed state: two bits per cell, plus the player.
+        self.packed_size = (2 * self.cell_count + 8) // 8
+
+        # Rotations and reflections of the board keep each field together.
+        # symmetries[k][i] is the cell that moves to cell i in image k.
+        self.symmetries = tuple(tuple(image)
+                                for image in get_images(range(self.cell_count),
+                                                        grid_size,
+                                                        join_lists))
+
+
+def get_images(cells, grid_size, join=''.join):
+    """ Rotate and reflect a sequence of cells in reading order.
+
+    This uses slices of whole rows and columns, so it works the same way on
+    strings and on lists.
+    :return: a list of all eight images, starting with the original
+    """
+    rows = [cells[start:start + grid_size]
+            for start in range(0, len(cells), grid_size)]
+    flipped = join(rows[::-1])
+    turned = join([cells[column::grid_size] for column in range(grid_size)])
+    turned_rows = [turned[start:start + grid_size]
+                   for start in range(0, len(turned), grid_size)]
+    turned_flipped = join(turned_rows[::-1])
+    return [cells, cells[::-1],
+            flipped, flipped[::-1],
+            turned, turned[::-1],
+            turned_flipped, turned_flipped[::-1]]
+
+
+def join_lists(parts):
+    return [item for part in parts for item in part]
+
+
+@lru_cache(maxsize=None)
+def get_geometry(field_size=3, field_count=3) -> BlockFourGeometry:
+    return BlockFourGeometry(field_size, field_count)
+
 
 class BlockFourGame:
-    """ Creates game states and moves. """
-    def __init__(self, field_size=3, field_count=3):
+    """ Creates game states and moves.
+
+    The winner controls more fields than the other player can reach, or set
+    count_cells to play until the board is full and count filled cells.
+    """
+    def __init__(self, field_size=3, field_count=3, count_cells=False):
         self.field_size = field_size
         self.field_count = field_count
+        self.count_cells = count_cells
+        self.geometry = get_geometry(field_size, field_count)
 
     def initial_state(self, player=None, cells: str=None):
         if player is None:
             player = choice((1, -1))
-        grid_size = self.field_size * self.field_count
+        grid_size = self.get_size()
         pos_cells = 0
         neg_cells = 0
         if cells is not None:
@@ -32,29 +132,217 @@ class BlockFourGame:
                         pos_cells |= bit
                     elif cell == '-':
                         neg_cells |= bit
-        return BlockFourState(pos_cells=pos_cells,
-                              neg_cells=neg_cells,
-                              player=player)
+        state = BlockFourState(pos_cells=pos_cells,
+                               neg_cells=neg_cells,
+                               player=player)
+        return self.add_fields(state)
 
     def format(self, state):
-        size = self.get_size()
-        rows = ((self.get_cell(state, row, column)
-                 for column in range(size))
-                for row in range(size))
-        return '\n'.join(''.join('+' if cell == 1
-                                 else '-' if cell == -1
-                                 else '.'
-                                 for cell in row)
-                         for row in rows)
+        grid_size = self.geometry.grid_size
+        text = self.get_digits(state).translate(CELL_SYMBOLS)
+        return '\n'.join(text[start:start + grid_size]
+                         for start in range(0, len(text), grid_size))
+
+    def get_digits(self, state: BlockFourState):
+        """ Write the cells in reading order as 0 for empty, 1 or 2. """
+        # Spread each bit into its own hex digit, so the two players' cells
+        # add up to 0, 1, or 2 without carrying into the neighbouring cell.
+        digits = (int(format(state.pos_cells, 'b'), 16) +
+                  2 * int(format(state.neg_cells, 'b'), 16))
+        return format(digits, '0{}x'.format(self.geometry.cell_count))[::-1]
+
+    def get_canonical_form(self, state: BlockFourState):
+        """ Choose one of the state's rotations and reflections as its key.
+
+        All eight images of a state have the same value, so searches can
+        share results between them.
+        :return: (pos_cells, neg_cells, player), symmetry where symmetry
+            indexes geometry.symmetries, and maps cells in the key back to
+            cells in state.
+        """
+        images = get_images(self.get_digits(state), self.geometry.grid_size)
+        digits = min(images)
+        symmetry = images.index(digits)
+        return self.parse_digits(digits, state.player)[:3], symmetry
+
+    def transform(self, state: BlockFourState, symmetry):
+        """ Rotate or reflect a state into one of its eight images. """
+        images = get_images(self.get_digits(state), self.geometry.grid_size)
+        return self.add_fields(self.parse_digits(images[symmetry],
+                                                 state.player))
+
+    @staticmethod
+    def parse_digits(digits: str, player):
+        """ Convert the output of get_digits() back to a state. """
+        digits = digits[::-1]
+        return BlockFourState(int(digits.translate(POS_DIGITS), 2),
+                              int(digits.translate(NEG_DIGITS), 2),
+                              player)
+
+    def pack(self, state: BlockFourState) -> int:
+        """ Pack a state into one int: positive cells, negative cells, and
+        then one bit that is set when the negative player moves next.
+
+        Packed states are smaller than states, and faster to hash and
+        compare, so they make good dictionary keys. The methods with packed
+        in their names take them directly.
+        """
+        cell_count = self.geometry.cell_count
+        return (state.pos_cells |
+                state.neg_cells << cell_count |
+                (state.player == -1) << 2*cell_count)
+
+    def check_packed(self, packed):
+        """ Check that packed could have come from pack().
+
+        :raises ValueError: if it isn't a non-negative int, has bits past
+            the player bit, or has a cell for both players
+        """
+        if (not isinstance(packed, int) or isinstance(packed, bool) or
+                packed < 0):
+            raise ValueError('packed must be a non-negative int.')
+        cell_count = self.geometry.cell_count
+        if packed >> 2*cell_count + 1:
+            raise ValueError(
+                f'packed must be less than 2**{2*cell_count + 1}.')
+        if packed & packed >> cell_count & self.geometry.all_cells:
+            raise ValueError('packed has cells for both players.')
+
+    def check_cells(self, cells: str):
+        """ Check that text has the shape and symbols that format() writes.
+
+        :raises ValueError: if it has the wrong number of rows or columns,
+            or other symbols
+        """
+        grid_size = self.geometry.grid_size
+        rows = cells.splitlines()
+        if len(rows) != grid_size or any(len(row) != grid_size or
+                                         row.strip('+-.')
+                                         for row in rows):
+            raise ValueError(f'cells must have {grid_size} rows of '
+                             f'{grid_size} characters from +, -, and .')
+
+    def unpack(self, packed: int) -> BlockFourState:
+        """ Convert the output of pack() back to a state. """
+        geometry = self.geometry
+        cell_count = geometry.cell_count
+        state = BlockFourState(packed & geometry.all_cells,
+                               packed >> cell_count & geometry.all_cells,
+                               -1 if packed >> 2*cell_count & 1 else 1)
+        return self.add_fields(state)
+
+    def apply_packed_move(self, packed: int, move: BlockFourMove) -> int:
+        """ Like apply_move(), but for a packed state. """
+        geometry = self.geometry
+        cell_count = geometry.cell_count
+        all_cells = geometry.all_cells
+        pos_cells = packed & all_cells
+        neg_cells = packed >> cell_count & all_cells
+        is_neg = packed >> 2*cell_count
+        index = move.row * geometry.grid_size + move.column
+        field_mask = geometry.field_masks[geometry.cell_fields[index]]
+        if is_neg:
+            neg_cells |= geometry.cell_bits[index]
+            if bit_count(neg_cells & field_mask) >= geometry.capture_count:
+                neg_cells |= field_mask & ~pos_cells
+        else:
+            pos_cells |= geometry.cell_bits[index]
+            if bit_count(pos_cells & field_mask) >= geometry.capture_count:
+                pos_cells |= field_mask & ~neg_cells
+        return (pos_cells |
+                neg_cells << cell_count |
+                (not is_neg) << 2*cell_count)
+
+    def get_packed_moves(self, packed: int):
+        """ Like get_moves(), but for a packed state.
+
+        :return: a list of moves, with the first empty cell of each field
+        """
+        geometry = self.geometry
+        empty_cells = ~(packed | packed >> geometry.cell_count)
+        cell_moves = geometry.cell_moves
+        moves = []
+        for field_mask in geometry.field_masks:
+            free_cells = field_mask & empty_cells
+            if free_cells:
+                moves.append(
+                    cell_moves[(free_cells & -free_cells).bit_length() - 1])
+        return moves
+
+    def get_packed_winner(self, packed: int):
+        """ Like get_winner(), but for a packed state.
+
+        The fields are counted straight from the cell masks, without
+        building a state.
+        """
+        geometry = self.geometry
+        cell_count = geometry.cell_count
+        all_cells = geometry.all_cells
+        pos_cells = packed & all_cells
+        neg_cells = packed >> cell_count & all_cells
+        if self.count_cells:
+            pos_count = bit_count(pos_cells)
+            neg_count = bit_count(neg_cells)
+            if pos_count + neg_count < cell_count:
+                return None
+            contested_count = 0
+        else:
+            capture_count = geometry.capture_count
+            empty_cells = all_cells & ~(pos_cells | neg_cells)
+            pos_count = neg_count = contested_count = 0
+            for field_mask in geometry.field_masks:
+                if bit_count(field_mask & pos_cells) >= capture_count:
+                    pos_count += 1
+                elif bit_count(field_mask & neg_cells) >= capture_count:
+                    neg_count += 1
+                elif field_mask & empty_cells:
+                    contested_count += 1
+        if pos_count > neg_count + contested_count:
+            return 1
+        if neg_count > pos_count + contested_count:
+            return -1
+        if contested_count:
+            return None
+        return Draw
+
+    def write_packed(self, packed_states, buffer=None):
+        """ Write packed states as fixed-size records, in little-endian order.
+
+        :param packed_states: a sequence of ints from pack()
+        :param buffer: a writable buffer with room for them, like a
+            bytearray or a NumPy uint8 array, or None to make a bytearray
+        :return: the buffer
+        """
+        size = self.geometry.packed_size
+        if buffer is None:
+            buffer = bytearray(size * len(packed_states))
+        view = memoryview(buffer).cast('B')
+        start = 0
+        for packed in packed_states:
+            view[start:start + size] = packed.to_bytes(size, 'little')
+            start += size
+        return buffer
+
+    def read_packed(self, buffer):
+        """ Read packed states from the records that write_packed() wrote.
+
+        :param buffer: any buffer, like bytes, array.array, or a NumPy array
+        :return: a list of ints
+        """
+        size = self.geometry.packed_size
+        view = memoryview(buffer).cast('B')
+        from_bytes = int.from_bytes
+        return [from_bytes(view[start:start + size], 'little')
+                for start in range(0, len(view), size)]
 
     def get_cell(self, state: BlockFourState, row, column):
-        bit = 1 << self.get_size()*row + column
+        bit = self.geometry.cell_bits[self.geometry.grid_size*row + column]
         return (1 if state.pos_cells & bit
                 else -1 if state.neg_cells & bit
                 else None)
 
     def get_size(self):
-        return self.field_size * self.field_count
+        return self.geometry.grid_size
 
     def apply_move(self, state: BlockFourState, move: BlockFourMove):
         player = state.player
@@ -62,37 +350,53 @@ class BlockFourGame:
                                      if player == 1
                                      else (state.neg_cells, state.pos_cells))
 
-        grid_size = self.get_size()
-        bit = 1 << (move.row * grid_size + move.column)
-        active_cells |= bit
-        rows_field = move.row // self.field_size
-        columns_field = move.column // self.field_size
-        start_row = rows_field * self.field_size
-        stop_row = start_row + self.field_size
-        start_column = columns_field * self.field_size
-        stop_column = start_column + self.field_size
-        bit_count = sum(0 != (active_cells & 1 << (row * grid_size + column))
-                        for row in range(start_row, stop_row)
-                        for column in range(start_column, stop_column))
-        if bit_count * 2 > self.field_size * self.field_size:
-            for row in range(start_row, stop_row):
-                for column in range(start_column, stop_column):
-                    bit = 1 << (row * grid_size + column)
-                    if bit & other_cells == 0:
-                        active_cells |= bit
-
-        pos_cells, neg_cells = ((active_cells, other_cells)
-                                if player == 1
-                                else (other_cells, active_cells))
-        player = -player
-        return BlockFourState(pos_cells, neg_cells, player)
+        if state.open_fields is None:
+            state = self.add_fields(state)
+        open_fields = state.open_fields
+        if player == 1:
+            active_fields, other_fields = state.pos_fields, state.neg_fields
+        else:
+            active_fields, other_fields = state.neg_fields, state.pos_fields
+
+        geometry = self.geometry
+        index = move.row * geometry.grid_size + move.column
+        active_cells |= geometry.cell_bits[index]
+        field = geometry.cell_fields[index]
+        field_mask = geometry.field_masks[field]
+        if bit_count(active_cells & field_mask) >= geometry.capture_count:
+            active_cells |= field_mask & ~other_cells
+            active_fields |= 1 << field
+        if not field_mask & ~(active_cells | other_cells):
+            open_fields &= ~(1 << field)
+
+        if player == 1:
+            return BlockFourState(active_cells, other_cells, -player,
+                                  open_fields, active_fields, other_fields)
+        return BlockFourState(other_cells, active_cells, -player,
+                              open_fields, other_fields, active_fields)
 
     def get_winner(self, state: BlockFourState):
-        grid_size = self.get_size()
-        max_count = grid_size * grid_size
-        pos_count = bin(state.pos_cells).count("1")
-        neg_count = bin(state.neg_cells).count("1")
-        if pos_count + neg_count < max_count:
+        if self.count_cells:
+            return self.get_cell_winner(state)
+        if state.open_fields is None:
+            state = self.add_fields(state)
+        pos_count = bit_count(state.pos_fields)
+        neg_count = bit_count(state.neg_fields)
+        contested_count = bit_count(state.open_fields &
+                                    ~(state.pos_fields | state.neg_fields))
+        if pos_count > neg_count + contested_count:
+            return 1
+        if neg_count > pos_count + contested_count:
+            return -1
+        if contested_count:
+            return None
+        return Draw
+
+    def get_cell_winner(self, state: BlockFourState):
+        """ Wait for a full board, then compare the filled cells. """
+        pos_count = bit_count(state.pos_cells)
+        neg_count = bit_count(state.neg_cells)
+        if pos_count + neg_count < self.geometry.cell_count:
             return None
         if pos_count > neg_count:
             return 1
@@ -100,23 +404,121 @@ class BlockFourGame:
             return -1
         return Draw
 
+    def simulate(self, state: BlockFourState, random=random):
+        """ Play random moves until the game ends, and return the winner.
+
+        Each move is chosen the same way as picking one at random from
+        get_moves(), but the whole game is played with local integers, so
+        playouts don't build any states or moves. Pass the random method of a
+        seeded Random object to repeat a playout.
+        """
+        winner = self.get_winner(state)
+        if winner is not None:
+            return winner
+        if state.open_fields is None:
+            state = self.add_fields(state)
+        field_masks = self.geometry.field_masks
+        capture_count = self.geometry.capture_count
+        count_cells = self.count_cells
+        (pos_cells, neg_cells, player,
+         open_fields, pos_fields, neg_fields) = state
+        open_list = [field
+                     for field in range(len(field_masks))
+                     if open_fields >> field & 1]
+        while True:
+            i = int(random() * len(open_list))
+            field = open_list[i]
+            field_mask = field_masks[field]
+            free_cells = field_mask & ~(pos_cells | neg_cells)
+            bit = free_cells & -free_cells
+            if player == 1:
+                pos_cells |= bit
+                if bit_count(pos_cells & field_mask) >= capture_count:
+                    pos_cells |= free_cells
+                    pos_fields |= 1 << field
+                elif free_cells != bit:
+                    player = -1
+                    continue
+            else:
+                neg_cells |= bit
+                if bit_count(neg_cells & field_mask) >= capture_count:
+                    neg_cells |= free_cells
+                    neg_fields |= 1 << field
+                elif free_cells != bit:
+                    player = 1
+                    continue
+            player = -player
+
+            # The field just closed, so the winner might be decided.
+            open_list[i] = open_list[-1]
+            open_list.pop()
+            open_fields &= ~(1 << field)
+            if count_cells:
+                if open_list:
+                    continue
+                pos_count = bit_count(pos_cells)
+                neg_count = bit_count(neg_cells)
+            else:
+                pos_count = bit_count(pos_fields)
+                neg_count = bit_count(neg_fields)
+                contested_count = bit_count(open_fields &
+                                            ~(pos_fields | neg_fields))
+                if pos_count > neg_count + contested_count:
+                    return 1
+                if neg_count > pos_count + contested_count:
+                    return -1
+                if contested_count:
+                    continue
+            if pos_count > neg_count:
+                return 1
+            if pos_count < neg_count:
+                return -1
+            return Draw
+
     @staticmethod
     def current_player(state: BlockFourState):
         return state.player
 
     def get_field_moves(self, state: BlockFourState, row_field, column_field):
-        start_row = row_field * self.field_size
-        for row in range(start_row, start_row + self.field_size):
-            start_column = column_field * self.field_size
-            for column in range(start_column,
-                                start_column + self.field_size):
-                if self.get_cell(state, row, column) is None:
-                    yield BlockFourMove(row, column)
-                    return
+        geometry = self.geometry
+        field_mask = geometry.field_masks[row_field*self.field_count +
+                                          column_field]
+        free_cells = field_mask & ~(state.pos_cells | state.neg_cells)
+        if free_cells:
+            # The lowest free bit is the first free cell in reading order.
+            index = (free_cells & -free_cells).bit_length() - 1
+            yield geometry.cell_moves[index]
 
     def get_moves(self, state: BlockFourState):
+        open_fields = state.open_fields
+        if open_fields is None:
+            open_fields = self.add_fields(state).open_fields
+        geometry = self.geometry
+        field_masks = geometry.field_masks
+        cell_moves = geometry.cell_moves
+        empty_cells = ~(state.pos_cells | state.neg_cells)
         moves = []
-        for row_field in range(self.field_count):
-            for column_field in range(self.field_count):
-                moves.extend(self.get_field_moves(state, row_field, column_field))
+        while open_fields:
+            field_bit = open_fields & -open_fields
+            open_fields ^= field_bit
+            free_cells = field_masks[field_bit.bit_length() - 1] & empty_cells
+            moves.append(
+                cell_moves[(free_cells & -free_cells).bit_length() - 1])
         return False, moves
+
+    def add_fields(self, state: BlockFourState):
+        """ Calculate the field flags from the cells. """
+        capture_count = self.geometry.capture_count
+        empty_cells = ~(state.pos_cells | state.neg_cells)
+        open_fields = pos_fields = neg_fields = 0
+        for field, field_mask in enumerate(self.geometry.field_masks):
+            field_bit = 1 << field
+            if field_mask & empty_cells:
+                open_fields |= field_bit
+            if bit_count(field_mask & state.pos_cells) >= capture_count:
+                pos_fields |= field_bit
+            elif bit_count(field_mask & state.neg_cells) >= capture_count:
+                neg_fields |= field_bit
+        return state._replace(open_fields=open_fields,
+                              pos_fields=pos_fields,
+                              neg_fields=neg_fields)
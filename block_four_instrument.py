@@ -0,0 +1,172 @@
+""" Count and time what a search does, when it's too slow to see why.
+
+InstrumentedSearchTree is a SearchTree that plays through a CountingGame,
+so the plain SearchTree and BlockFourGame don't pay for any counting. Each
+result carries a SearchMetrics, and the metrics are logged as JSON every
+log_seconds during a search, and once at the end. SearchProfiler runs
+searches, or anything else, under cProfile and saves the profile.
+"""
+
+from cProfile import Profile
+import json
+from logging import getLogger, INFO
+from random import random
+from time import perf_counter
+
+from block_four_game import BlockFourGame, BlockFourState, BlockFourMove
+from block_four_search import SearchTree
+
+logger = getLogger(__name__)
+
+
+class SearchMetrics:
+    """ Counts and times for one search. """
+    __slots__ = ('iterations', 'apply_move_calls', 'get_moves_calls',
+                 'get_winner_calls', 'playouts', 'playout_moves',
+                 'max_playout_moves', 'nodes_expanded', 'total_depth',
+                 'max_depth', 'select_seconds', 'playout_seconds',
+                 'update_seconds', 'search_seconds')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def as_dict(self):
+        """ List the metrics, with averages, rounding times to microseconds.
+        """
+        metrics = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name.endswith('_seconds'):
+                value = round(value, 6)
+            metrics[name] = value
+        metrics['mean_playout_moves'] = round(
+            self.playout_moves / self.playouts if self.playouts else 0, 2)
+        metrics['mean_depth'] = round(
+            self.total_depth / self.iterations if self.iterations else 0, 2)
+        return metrics
+
+    def __repr__(self):
+        return f'SearchMetrics({self.as_dict()!r})'
+
+
+class CountingGame(BlockFourGame):
+    """ Plays the same game, but counts calls and playout moves. """
+    def __init__(self, game: BlockFourGame, metrics: SearchMetrics = None):
+        super().__init__(game.field_size, game.field_count, game.count_cells)
+        self.metrics = metrics or SearchMetrics()
+
+    def apply_move(self, state: BlockFourState, move: BlockFourMove):
+        self.metrics.apply_move_calls += 1
+        return super().apply_move(state, move)
+
+    def get_moves(self, state: BlockFourState):
+        self.metrics.get_moves_calls += 1
+        return super().get_moves(state)
+
+    def get_winner(self, state: BlockFourState):
+        self.metrics.get_winner_calls += 1
+        return super().get_winner(state)
+
+    def simulate(self, state: BlockFourState, random=random):
+        # The playout calls random() once for each move.
+        move_count = 0
+
+        def counting_random():
+            nonlocal move_count
+            move_count += 1
+            return random()
+
+        start = perf_counter()
+        winner = super().simulate(state, counting_random)
+        metrics = self.metrics
+        metrics.playout_seconds += perf_counter() - start
+        metrics.playouts += 1
+        metrics.playout_moves += move_count
+        metrics.max_playout_moves = max(metrics.max_playout_moves,
+                                        move_count)
+        return winner
+
+
+class InstrumentedSearchTree(SearchTree):
+    """ A SearchTree that collects SearchMetrics for each search.
+
+    Time to select and expand a leaf, time for playouts, and the rest of
+    each iteration, mostly updating the path's scores, are kept separately.
+    """
+    log_seconds = 1.0  # time between metrics log lines during a search
+
+    def __init__(self, game: BlockFourGame, *args, **kwargs):
+        super().__init__(CountingGame(game), *args, **kwargs)
+        self.metrics = self.game.metrics
+        self.search_start = self.next_log = None
+        self.last_select_seconds = 0.0
+
+    def search(self, state: BlockFourState, *args, **kwargs):
+        self.metrics = self.game.metrics = SearchMetrics()
+        self.search_start = perf_counter()
+        self.next_log = self.search_start + self.log_seconds
+        result = super().search(state, *args, **kwargs)
+        self.metrics.search_seconds = perf_counter() - self.search_start
+        self.log_metrics(is_final=True)
+        return result._replace(metrics=self.metrics)
+
+    def get_result(self, reused_visits, is_final=True):
+        result = super().get_result(reused_visits, is_final)
+        return result._replace(metrics=self.metrics)
+
+    def run_iteration(self):
+        metrics = self.metrics
+        playout_seconds = metrics.playout_seconds
+        start = perf_counter()
+        super().run_iteration()
+        end = perf_counter()
+        metrics.iterations += 1
+        metrics.update_seconds += (end - start - self.last_select_seconds -
+                                   (metrics.playout_seconds -
+                                    playout_seconds))
+        if end >= self.next_log:
+            metrics.search_seconds = end - self.search_start
+            self.log_metrics(is_final=False)
+            self.next_log = end + self.log_seconds
+
+    def select_leaf(self):
+        metrics = self.metrics
+        node_count = self.node_count
+        start = perf_counter()
+        node = super().select_leaf()
+        self.last_select_seconds = perf_counter() - start
+        metrics.select_seconds += self.last_select_seconds
+        metrics.nodes_expanded += self.node_count - node_count
+        depth = 0
+        parent = node.parent
+        while parent is not None:
+            depth += 1
+            parent = parent.parent
+        metrics.total_depth += depth
+        metrics.max_depth = max(metrics.max_depth, depth)
+        return node
+
+    def log_metrics(self, is_final):
+        if logger.isEnabledFor(INFO):
+            metrics = dict(self.metrics.as_dict(), is_final=is_final)
+            logger.info('Search metrics: %s', json.dumps(metrics))
+
+
+class SearchProfiler:
+    """ Profile calls with cProfile, and save all of them to one file.
+
+    The file is rewritten after each call, so it can be loaded with pstats
+    at any time.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.profile = Profile()
+
+    def run(self, function, *args, **kwargs):
+        self.profile.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.profile.disable()
+            self.profile.dump_stats(self.path)
@@ -0,0 +1,219 @@
+""" Search from the same position in several processes, and merge results.
+
+Run this module to measure the speedup for different worker counts.
+"""
+
+from argparse import ArgumentParser
+from collections import namedtuple, defaultdict
+from logging import getLogger
+from multiprocessing import Process, Queue
+import pickle
+from queue import Empty
+import random
+from time import perf_counter
+from traceback import format_exc
+
+from block_four_game import BlockFourGame, BlockFourState
+from block_four_search import SearchTree
+
+logger = getLogger(__name__)
+
+MoveStats = namedtuple('MoveStats', 'move visits score')
+WorkerResult = namedtuple('WorkerResult',
+                          'worker move_stats reused_visits is_final')
+ParallelResult = namedtuple('ParallelResult',
+                            'move move_stats reused_visits is_final',
+                            defaults=(True,))
+# Sent instead of a final WorkerResult when a worker's search raises.
+WorkerFailure = namedtuple('WorkerFailure', 'worker error traceback')
+
+
+class WorkerError(Exception):
+    """ Carries the traceback from a worker process. """
+
+
+class ParallelSearch:
+    """ Root-parallel Monte Carlo tree search in a pool of processes.
+
+    Each worker keeps its own SearchTree with its own random seed, and the
+    workers stay alive between searches, so they also reuse their trees.
+    Call close() to stop the workers.
+    """
+    poll_seconds = 1.0  # time between checks that the workers are alive
+
+    def __init__(self, game: BlockFourGame, worker_count=2, seed=None):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.game = game
+        self.result_queue = Queue()
+        self.request_queues = []
+        self.workers = []
+        for i in range(worker_count):
+            request_queue = Queue()
+            worker = Process(target=run_search_worker,
+                             args=(game,
+                                   request_queue,
+                                   self.result_queue,
+                                   i,
+                                   seed + i),
+                             daemon=True)
+            worker.start()
+            self.request_queues.append(request_queue)
+            self.workers.append(worker)
+
+    def search(self,
+               state: BlockFourState,
+               iterations=None,
+               max_seconds=None,
+               report=None):
+        """ Run the same search in each worker, like SearchTree.search().
+
+        Progress reports merge the latest report from each worker.
+        :raises: the first error from a worker's search, after all the
+            workers have finished, or RuntimeError if a worker stopped
+        """
+        if iterations is None and max_seconds is None:
+            raise ValueError('Search needs iterations or max_seconds.')
+        if self.game.get_winner(state) is not None:
+            raise ValueError('Cannot search a finished game.')
+        for request_queue in self.request_queues:
+            request_queue.put((state,
+                               iterations,
+                               max_seconds,
+                               report is not None))
+        worker_results = {}
+        failure = None
+        final_count = 0
+        while final_count < len(self.workers):
+            worker_result = self.get_worker_result()
+            if isinstance(worker_result, WorkerFailure):
+                failure = failure or worker_result
+                final_count += 1
+                continue
+            worker_results[worker_result.worker] = worker_result
+            if worker_result.is_final:
+                final_count += 1
+            elif report is not None:
+                report(merge_results(worker_results.values(), is_final=False))
+        if failure is not None:
+            raise failure.error from WorkerError(failure.traceback)
+        result = merge_results(worker_results.values())
+        logger.info('Reused %d visits from the last search.',
+                    result.reused_visits)
+        return result
+
+    def get_worker_result(self):
+        """ Wait for the next result, checking that no worker stopped. """
+        while True:
+            try:
+                return self.result_queue.get(timeout=self.poll_seconds)
+            except Empty:
+                for i, worker in enumerate(self.workers):
+                    if not worker.is_alive():
+                        raise RuntimeError(
+                            f'Search worker {i} stopped with exit code '
+                            f'{worker.exitcode}.')
+
+    def close(self):
+        for request_queue in self.request_queues:
+            request_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+
+
+def merge_results(worker_results, is_final=True):
+    visits = defaultdict(int)
+    scores = defaultdict(float)
+    reused_visits = 0
+    for worker_result in worker_results:
+        reused_visits += worker_result.reused_visits
+        for stats in worker_result.move_stats:
+            visits[stats.move] += stats.visits
+            scores[stats.move] += stats.score
+    move_stats = [MoveStats(move, visits[move], scores[move])
+                  for move in visits]
+    move = max(move_stats, key=lambda stats: stats.visits).move
+    return ParallelResult(move=move,
+                          move_stats=move_stats,
+                          reused_visits=reused_visits,
+                          is_final=is_final)
+
+
+def run_search_worker(game: BlockFourGame,
+                      request_queue: Queue,
+                      result_queue: Queue,
+                      worker: int,
+                      seed: int):
+    random.seed(seed)
+    searcher = SearchTree(game)
+
+    def send(result):
+        move_stats = [MoveStats(child.move, child.visits, child.score)
+                      for child in result.root.children]
+        result_queue.put(WorkerResult(worker,
+                                      move_stats,
+                                      result.reused_visits,
+                                      result.is_final))
+
+    while True:
+        request = request_queue.get()
+        if request is None:
+            return
+        state, iterations, max_seconds, is_reporting = request
+        try:
+            result = searcher.search(state,
+                                     iterations,
+                                     max_seconds,
+                                     report=send if is_reporting else None)
+        except Exception as ex:
+            error = ex
+            try:
+                pickle.dumps(error)
+            except Exception:
+                error = WorkerError(f'{type(ex).__name__}: {ex}')
+            result_queue.put(WorkerFailure(worker, error, format_exc()))
+            continue
+        send(result)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Measure search speed for several worker counts.')
+    parser.add_argument('--workers',
+                        type=int,
+                        nargs='+',
+                        default=[1, 2, 4, 8],
+                        help='worker counts to compare')
+    parser.add_argument('--iterations',
+                        type=int,
+                        default=2000,
+                        help='iterations in each worker for each search')
+    parser.add_argument('--searches',
+                        type=int,
+                        default=3,
+                        help='searches to time for each worker count')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    base_rate = None
+    print('workers  iterations/s  speedup')
+    for worker_count in args.workers:
+        searcher = ParallelSearch(game, worker_count)
+        searcher.search(state, 1)  # Wait for the workers to start.
+        start = perf_counter()
+        for _ in range(args.searches):
+            searcher.search(state, args.iterations)
+        duration = perf_counter() - start
+        searcher.close()
+        rate = worker_count * args.iterations * args.searches / duration
+        if base_rate is None:
+            base_rate = rate
+        print(f'{worker_count:7}  {rate:12.0f}  {rate / base_rate:7.2f}')
+
+
+if __name__ == '__main__':
+    main()
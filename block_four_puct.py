@@ -0,0 +1,361 @@
+""" Tree search guided by an Evaluator, instead of random playouts.
+
+Each time a leaf is expanded, all of its children are scored in the same
+batch as the other leaves selected in that round. The children's scores
+become both the priors for choosing between them, PUCT style, and the
+value of the leaf: the best score that its player can reach.
+
+Run this module to compare its strength against SearchTree for the same
+CPU time.
+"""
+
+from argparse import ArgumentParser
+from logging import getLogger
+from math import exp, sqrt
+from time import perf_counter, process_time
+
+from mittmcts import Draw
+
+from block_four_evaluation import Evaluator
+from block_four_game import BlockFourGame, BlockFourState
+from block_four_search import SearchResult, SearchTree
+
+logger = getLogger(__name__)
+
+
+class PuctNode:
+    """ One position in the search tree, reached by move from parent. """
+    __slots__ = ('state', 'move', 'parent', 'children', 'prior', 'winner',
+                 'visits', 'score')
+
+    def __init__(self, game: BlockFourGame, state: BlockFourState,
+                 move=None, parent=None, prior=1.0):
+        self.state = state
+        self.move = move
+        self.parent = parent
+        self.children = ()  # all children are added when it's expanded
+        self.prior = prior
+        self.winner = game.get_winner(state)
+        self.visits = 0
+        self.score = 0.0  # wins plus half of draws for the player who moved
+
+    def get_best_child(self, c):
+        sqrt_visits = sqrt(self.visits)
+        return max(self.children,
+                   key=lambda child: (
+                       (child.score / child.visits if child.visits
+                        else 0.5) +
+                       c * child.prior * sqrt_visits / (1 + child.visits)))
+
+
+class PuctSearch:
+    """ Monte Carlo tree search with evaluated leaves and move priors.
+
+    Leaves are selected batch_size at a time, with a virtual loss on each
+    selected path, so one round spreads out over different leaves.
+    """
+    report_seconds = 0.2  # time between progress reports during a search
+
+    def __init__(self,
+                 game: BlockFourGame,
+                 evaluator: Evaluator = None,
+                 c=1.5,
+                 batch_size=8,
+                 temperature=0.1):
+        """ Initialize.
+
+        :param c: weight of the priors, compared to the average scores
+        :param batch_size: leaves to evaluate together
+        :param temperature: how much the priors favour the best scores
+        """
+        self.game = game
+        self.evaluator = evaluator or Evaluator(game)
+        self.c = c
+        self.batch_size = batch_size
+        self.temperature = temperature
+        self.root = None
+
+    def search(self,
+               state: BlockFourState,
+               iterations=None,
+               max_seconds=None,
+               report=None):
+        """ Search until either the iterations or the time run out.
+
+        :param state: the position to search from
+        :param iterations: the number of leaves to evaluate, or None
+        :param max_seconds: the time to search for, or None
+        :param report: a function to call with a SearchResult for the best
+            move so far, every report_seconds
+        """
+        if iterations is None and max_seconds is None:
+            raise ValueError('Search needs iterations or max_seconds.')
+        if iterations is not None and iterations < 1:
+            raise ValueError('Search needs at least one iteration.')
+        self.root = PuctNode(self.game, state)
+        if self.root.winner is not None:
+            raise ValueError('Cannot search a finished game.')
+        start = perf_counter()
+        next_report = start + self.report_seconds
+        count = 0
+        while True:
+            batch_size = self.batch_size
+            if iterations is not None:
+                batch_size = min(batch_size, iterations - count)
+            count += self.run_batch(batch_size)
+            now = perf_counter()
+            if report is not None and now >= next_report:
+                report(self.get_result(is_final=False))
+                next_report = now + self.report_seconds
+            if iterations is not None and count >= iterations:
+                break
+            if max_seconds is not None and now - start >= max_seconds:
+                break
+        logger.info('Evaluated %d leaves.', count)
+        return self.get_result()
+
+    def get_result(self, is_final=True):
+        root = self.root
+        if not root.children:
+            raise ValueError('Search has no moves yet, so it has no result.')
+        move = max(root.children, key=lambda child: child.visits).move
+        return SearchResult(move=move,
+                            root=root,
+                            reused_visits=0,
+                            is_final=is_final)
+
+    def run_batch(self, batch_size):
+        """ Select leaves, evaluate them together, and update their paths.
+
+        :return: the number of leaves selected
+        """
+        leaves, expanding, child_states = self.select_leaves(batch_size)
+        values = self.evaluator.evaluate(child_states) if child_states else []
+        self.update_leaves(leaves, expanding, values)
+        return len(leaves)
+
+    def select_leaves(self, batch_size):
+        """ Select leaves, and expand the new ones.
+
+        :return: leaves, expanding, child_states where expanding lists the
+            newly expanded leaves, and child_states lists all their
+            children's states, to evaluate.
+        """
+        game = self.game
+        leaves = []
+        for _ in range(batch_size):
+            node = self.root
+            node.visits += 1  # virtual loss, until the score is added
+            while node.children:
+                node = node.get_best_child(self.c)
+                node.visits += 1
+            leaves.append(node)
+
+        expanding = []
+        child_states = []
+        for leaf in leaves:
+            if leaf.winner is None and not leaf.children and \
+                    leaf not in expanding:
+                expanding.append(leaf)
+                _, moves = game.get_moves(leaf.state)
+                leaf.children = [PuctNode(game,
+                                          game.apply_move(leaf.state, move),
+                                          move,
+                                          leaf)
+                                 for move in moves]
+                child_states.extend(child.state for child in leaf.children)
+        return leaves, expanding, child_states
+
+    def update_leaves(self, leaves, expanding, values):
+        """ Set priors from the children's values, and update the paths.
+
+        :param values: the evaluations of the child_states from
+            select_leaves()
+        """
+        leaf_scores = {}
+        start = 0
+        for leaf in expanding:
+            children = leaf.children
+            player = leaf.state.player
+            # Scores from 0 to 1 for the player choosing between children.
+            scores = [(values[i] * player + 1) / 2
+                      for i in range(start, start + len(children))]
+            start += len(children)
+            best_score = max(scores)
+            weights = [exp((score - best_score) / self.temperature)
+                       for score in scores]
+            total_weight = sum(weights)
+            for child, weight in zip(children, weights):
+                child.prior = weight / total_weight
+            leaf_scores[leaf] = 1 - best_score
+
+        for leaf in leaves:
+            if leaf.winner is None:
+                score = leaf_scores[leaf]
+            elif leaf.winner is Draw:
+                score = 0.5
+            elif leaf.winner == -leaf.state.player:
+                score = 1
+            else:
+                score = 0
+            node = leaf
+            while node is not None:
+                node.score += score
+                score = 1 - score
+                node = node.parent
+
+
+def search_together(searches, states, iterations=None, deadlines=None):
+    """ Search several positions at once, evaluating their leaves together.
+
+    Each round selects a batch of leaves from every search that isn't
+    finished, and scores all of their children in one call to the first
+    search's evaluator, so all the searches need the same board geometry.
+    :param searches: a PuctSearch for each position
+    :param states: the positions to search, none of them finished
+    :param iterations: a list of leaves to evaluate for each position, with
+        None for no limit, or None for no limits at all
+    :param deadlines: a list of perf_counter() times for each position to
+        stop at, like iterations
+    :return: a SearchResult for each position
+    """
+    if iterations is None:
+        iterations = [None] * len(searches)
+    if deadlines is None:
+        deadlines = [None] * len(searches)
+    if any(limit is None and deadline is None
+           for limit, deadline in zip(iterations, deadlines)):
+        raise ValueError('Search needs iterations or deadlines.')
+    if any(limit is not None and limit < 1 for limit in iterations):
+        raise ValueError('Search needs at least one iteration.')
+    evaluator = searches[0].evaluator
+    counts = [0] * len(searches)
+    for search, state in zip(searches, states):
+        search.root = PuctNode(search.game, state)
+        if search.root.winner is not None:
+            raise ValueError('Cannot search a finished game.')
+    active = list(range(len(searches)))
+    while active:
+        selections = []
+        all_child_states = []
+        for i in active:
+            batch_size = searches[i].batch_size
+            if iterations[i] is not None:
+                batch_size = min(batch_size, iterations[i] - counts[i])
+            leaves, expanding, child_states = searches[i].select_leaves(
+                batch_size)
+            counts[i] += len(leaves)
+            selections.append((leaves, expanding, len(child_states)))
+            all_child_states.extend(child_states)
+        values = (evaluator.evaluate(all_child_states)
+                  if all_child_states
+                  else [])
+        start = 0
+        for i, (leaves, expanding, child_count) in zip(active, selections):
+            searches[i].update_leaves(leaves,
+                                      expanding,
+                                      values[start:start + child_count])
+            start += child_count
+        now = perf_counter()
+        active = [i
+                  for i in active
+                  if (iterations[i] is None or counts[i] < iterations[i]) and
+                  (deadlines[i] is None or now < deadlines[i])]
+    return [search.get_result() for search in searches]
+
+
+def play_match(game: BlockFourGame,
+               make_engines,
+               game_count,
+               first_limits,
+               second_limits):
+    """ Play two engines against each other, taking turns to start.
+
+    :param make_engines: a function that returns a new pair of engines
+    :param first_limits: search() arguments for the first engine, like
+        dict(max_seconds=0.1)
+    :param second_limits: search() arguments for the second engine
+    :return: wins, draws, and losses for the first engine
+    """
+    wins = draws = losses = 0
+    for i in range(game_count):
+        first_player = 1 if i % 2 == 0 else -1
+        first_engine, second_engine = make_engines()
+        engines = {first_player: (first_engine, first_limits),
+                   -first_player: (second_engine, second_limits)}
+        state = game.initial_state(player=1)
+        winner = game.get_winner(state)
+        while winner is None:
+            engine, limits = engines[state.player]
+            result = engine.search(state, **limits)
+            state = game.apply_move(state, result.move)
+            winner = game.get_winner(state)
+        if winner == first_player:
+            wins += 1
+        elif winner == -first_player:
+            losses += 1
+        else:
+            draws += 1
+    return wins, draws, losses
+
+
+def measure_speed(game: BlockFourGame, engine, seconds=1.0):
+    """ Count root visits for each CPU second, from the start position. """
+    start = process_time()
+    result = engine.search(game.initial_state(player=1), max_seconds=seconds)
+    return result.root.visits / (process_time() - start)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Compare PuctSearch with SearchTree.')
+    parser.add_argument('--seconds',
+                        type=float,
+                        nargs='+',
+                        default=[0.02, 0.1],
+                        help='time for each move, the same for both')
+    parser.add_argument('--iterations',
+                        type=int,
+                        default=100,
+                        help='PuctSearch leaves for each move')
+    parser.add_argument('--mcts-iterations',
+                        type=int,
+                        default=1000,
+                        help='SearchTree playouts for each move')
+    parser.add_argument('--games', type=int, default=20)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    game = BlockFourGame()
+    puct_speed = measure_speed(game, PuctSearch(game))
+    mcts_speed = measure_speed(game, SearchTree(game))
+    print(f'PuctSearch: {puct_speed:.0f} leaves per CPU second.')
+    print(f'SearchTree: {mcts_speed:.0f} playouts per CPU second.')
+
+    def make_engines():
+        return PuctSearch(game), SearchTree(game)
+
+    print('limits for each move          wins  draws  losses  (PuctSearch)')
+    for seconds in args.seconds:
+        limits = dict(max_seconds=seconds)
+        wins, draws, losses = play_match(game,
+                                         make_engines,
+                                         args.games,
+                                         limits,
+                                         limits)
+        label = f'{seconds}s each'
+        print(f'{label:28}  {wins:4}  {draws:5}  {losses:6}')
+    wins, draws, losses = play_match(
+        game,
+        make_engines,
+        args.games,
+        dict(iterations=args.iterations),
+        dict(iterations=args.mcts_iterations))
+    label = f'{args.iterations} vs {args.mcts_iterations} iterations'
+    print(f'{label:28}  {wins:4}  {draws:5}  {losses:6}')
+
+
+if __name__ == '__main__':
+    main()
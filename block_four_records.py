@@ -0,0 +1,183 @@
+""" A compact binary format for game records.
+
+A file starts with a short header, then holds one record after another.
+Each record has a header with the board geometry, the starting player, the
+random seed, and the number of moves, followed by one byte for each move:
+the index of the cell that was filled, row * grid_size + column. That
+limits records to boards with up to 256 cells.
+
+Records are read from a memory map, one at a time or all at once into
+arrays, and a position is rebuilt by replaying the moves.
+"""
+
+from collections import namedtuple
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+
+import numpy as np
+
+from block_four_game import BlockFourGame
+
+FILE_HEADER = Struct('<4sB3x')  # magic, version
+MAGIC = b'B4GR'
+VERSION = 1
+# field_size, field_count, starting player, seed, move count
+RECORD_HEADER = Struct('<BBbIH')
+MAX_CELL_COUNT = 256  # each move is one byte
+
+GameRecord = namedtuple('GameRecord',
+                        'field_size field_count player seed cells')
+
+
+class GameRecordWriter:
+    """ Adds game records to a file, one at a time. """
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, game: BlockFourGame, player, moves, seed=0):
+        """ Write one game.
+
+        :param player: the player who moved first
+        :param moves: the BlockFourMove for each turn
+        :param seed: the random seed that the game was played with
+        :raises ValueError: if the board has too many cells to store a move
+            in one byte
+        """
+        cell_count = game.geometry.cell_count
+        if cell_count > MAX_CELL_COUNT:
+            raise ValueError(
+                f'Game records hold boards with up to {MAX_CELL_COUNT} '
+                f'cells, not {cell_count}.')
+        grid_size = game.geometry.grid_size
+        cells = bytes(move.row * grid_size + move.column for move in moves)
+        self.file.write(RECORD_HEADER.pack(game.field_size,
+                                           game.field_count,
+                                           player,
+                                           seed,
+                                           len(cells)))
+        self.file.write(cells)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class GameRecordReader:
+    """ Reads game records from a memory-mapped file. """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a game record file.')
+        if version != VERSION:
+            raise ValueError(f'{path} has unknown version {version}.')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        """ Generate a GameRecord for each game in the file. """
+        data = self.data
+        start = FILE_HEADER.size
+        end = len(data)
+        while start < end:
+            (field_size,
+             field_count,
+             player,
+             seed,
+             move_count) = RECORD_HEADER.unpack_from(data, start)
+            start += RECORD_HEADER.size
+            cells = data[start:start + move_count]
+            start += move_count
+            yield GameRecord(field_size, field_count, player, seed, cells)
+
+    def read_arrays(self):
+        """ Decode all the records into arrays.
+
+        :return: a dict of arrays with one entry per game, field_sizes,
+            field_counts, players, seeds, move_counts, and move_starts, plus
+            cells with all the moves of all the games, where each game's
+            moves start at its move_starts entry
+        """
+        headers = []
+        move_starts = []
+        start = FILE_HEADER.size
+        end = len(self.data)
+        while start < end:
+            header = RECORD_HEADER.unpack_from(self.data, start)
+            headers.append(header)
+            start += RECORD_HEADER.size
+            move_starts.append(start)
+            start += header[-1]
+        header_dtype = np.dtype([('field_size', np.uint8),
+                                 ('field_count', np.uint8),
+                                 ('player', np.int8),
+                                 ('seed', np.uint32),
+                                 ('move_count', np.uint16)])
+        headers = np.array(headers, header_dtype)
+        move_starts = np.array(move_starts, np.int64)
+
+        # Copy the moves out of the file, skipping the record headers.
+        all_bytes = np.frombuffer(self.data, np.uint8)
+        is_move = np.zeros(len(all_bytes) + 1, np.int8)
+        np.add.at(is_move, move_starts, 1)
+        np.add.at(is_move, move_starts + headers['move_count'], -1)
+        cells = all_bytes[np.cumsum(is_move[:-1]) > 0]
+        offsets = np.zeros(len(headers), np.int64)
+        offsets[1:] = np.cumsum(headers['move_count'])[:-1]
+        return dict(field_sizes=headers['field_size'],
+                    field_counts=headers['field_count'],
+                    players=headers['player'],
+                    seeds=headers['seed'],
+                    move_counts=headers['move_count'],
+                    move_starts=offsets,
+                    cells=cells)
+
+    def close(self):
+        self.data.close()
+
+
+def replay(record: GameRecord, game: BlockFourGame = None):
+    """ Generate each position in a game, starting before the first move.
+
+    Only the current position is kept, so replaying a long game doesn't
+    hold all of its states.
+    """
+    if game is None:
+        game = BlockFourGame(record.field_size, record.field_count)
+    cell_moves = game.geometry.cell_moves
+    state = game.initial_state(player=record.player)
+    yield state
+    for cell in record.cells:
+        state = game.apply_move(state, cell_moves[cell])
+        yield state
+
+
+def get_position(record: GameRecord, move_count, game: BlockFourGame = None):
+    """ Rebuild the position after the first move_count moves. """
+    for i, state in enumerate(replay(record, game)):
+        if i == move_count:
+            return state
+    raise IndexError(f'Game only has {len(record.cells)} moves.')
+
+
+def get_moves(record: GameRecord, game: BlockFourGame = None):
+    """ List the moves in a record as BlockFourMove values. """
+    if game is None:
+        game = BlockFourGame(record.field_size, record.field_count)
+    cell_moves = game.geometry.cell_moves
+    return [cell_moves[cell] for cell in record.cells]
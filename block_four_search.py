@@ -0,0 +1,278 @@
+from collections import namedtuple
+from logging import getLogger
+from math import inf, log, sqrt
+from random import shuffle
+from time import perf_counter
+
+from mittmcts import Draw
+
+from block_four_game import BlockFourGame, BlockFourState
+from block_four_table import TranspositionTable
+
+logger = getLogger(__name__)
+
+# metrics is a SearchMetrics from block_four_instrument, or None.
+SearchResult = namedtuple('SearchResult',
+                          'move root reused_visits is_final metrics',
+                          defaults=(True, None))
+
+
+class SearchStats:
+    """ Visits and score for a position, shared through a table. """
+    __slots__ = ('visits', 'score')
+
+    def __init__(self):
+        self.visits = 0
+        self.score = 0.0
+
+
+class SearchNode:
+    """ One position in the search tree, reached by move from parent. """
+    __slots__ = ('state', 'move', 'parent', 'children', 'untried_moves',
+                 'winner', 'visits', 'score', 'stats')
+
+    def __init__(self, game: BlockFourGame, state: BlockFourState,
+                 move=None, parent=None):
+        self.state = state
+        self.move = move
+        self.parent = parent
+        self.children = ()  # becomes a list when the first child is added
+        self.untried_moves = None  # listed when the node is first selected
+        self.winner = game.get_winner(state)
+        self.visits = 0
+        self.score = 0.0  # wins plus half of draws for the player who moved
+        self.stats = None  # SearchStats shared with the same positions
+
+    def get_best_child(self, c):
+        log_visits = log(self.visits)
+        return max(self.children,
+                   key=lambda child: (child.score / child.visits +
+                                      c * sqrt(log_visits / child.visits)))
+
+    def find(self, state: BlockFourState, depth):
+        """ Find a node with the same position, up to depth moves away. """
+        if self.state[:3] == state[:3]:
+            return self
+        if depth > 0:
+            for child in self.children:
+                node = child.find(state, depth - 1)
+                if node is not None:
+                    return node
+        return None
+
+
+class SearchTree:
+    """ Monte Carlo tree search with random playouts.
+
+    The tree is kept between searches, so the next search can start from the
+    statistics of the position that was actually reached. With a
+    transposition table, each new node starts with the statistics that other
+    nodes collected for the same position or its rotations and reflections.
+    With max_nodes, the least visited subtrees are pruned whenever the tree
+    reaches that size, and their moves can be expanded again later. With a
+    tablebase, playouts look up the exact winner when the tablebase has it,
+    instead of playing random moves.
+    """
+    report_seconds = 0.2  # time between progress reports during a search
+    prune_fraction = 0.75  # share of max_nodes left after pruning
+
+    def __init__(self,
+                 game: BlockFourGame,
+                 c=sqrt(2),
+                 table: TranspositionTable = None,
+                 max_nodes: int = None,
+                 tablebase=None):
+        """ Initialize.
+
+        :param tablebase: an object with a get_winner(state) method that
+            returns the winner with best play, or None if it doesn't know,
+            like Tablebase or EndgameSolver
+        :raises ValueError: if max_nodes is less than 2, because pruning
+            always keeps the root and at least one child
+        """
+        if max_nodes is not None and max_nodes < 2:
+            raise ValueError('max_nodes must be at least 2.')
+        self.game = game
+        self.c = c
+        self.table = table
+        self.max_nodes = max_nodes
+        self.tablebase = tablebase
+        self.root = None
+        self.node_count = 0
+
+    def move_root(self, state: BlockFourState):
+        """ Reuse a node for state within two moves, or start a new tree. """
+        node = None
+        if self.root is not None:
+            node = self.root.find(state, depth=2)
+        if node is None:
+            node = SearchNode(self.game, state)
+        node.parent = None
+        self.root = node
+        self.node_count = len(self.list_nodes())
+        return node
+
+    def list_nodes(self):
+        nodes = [self.root]
+        for node in nodes:
+            nodes.extend(node.children)
+        return nodes
+
+    def prune(self):
+        """ Remove the least visited subtrees, and put their moves back. """
+        target_count = max(1, int(self.max_nodes * self.prune_fraction))
+        while self.node_count > target_count:
+            nodes = self.list_nodes()[1:]
+            nodes.sort(key=lambda node: node.visits)
+            for node in nodes:
+                if self.node_count <= target_count:
+                    break
+                if node.children:
+                    # Only remove leaves, so subtrees go from the bottom up.
+                    continue
+                parent = node.parent
+                parent.children.remove(node)
+                parent.untried_moves.append(node.move)
+                node.parent = None
+                self.node_count -= 1
+
+    def search(self,
+               state: BlockFourState,
+               iterations=None,
+               max_seconds=None,
+               report=None):
+        """ Search until either the iterations or the time run out.
+
+        The search also stops when the most visited move can't be overtaken
+        in the iterations that are left.
+        :param state: the position to search from
+        :param iterations: the number of iterations to run, or None
+        :param max_seconds: the time to search for, or None
+        :param report: a function to call with a SearchResult for the best
+            move so far, every report_seconds
+        """
+        if iterations is None and max_seconds is None:
+            raise ValueError('Search needs iterations or max_seconds.')
+        root = self.move_root(state)
+        if root.winner is not None:
+            raise ValueError('Cannot search a finished game.')
+        reused_visits = root.visits
+        logger.info('Reused %d visits from the last search.', reused_visits)
+        start = perf_counter()
+        next_report = start + self.report_seconds
+        count = 0
+        while True:
+            self.run_iteration()
+            count += 1
+            now = perf_counter()
+            if report is not None and now >= next_report:
+                report(self.get_result(reused_visits, is_final=False))
+                next_report = now + self.report_seconds
+            remaining = inf
+            if iterations is not None:
+                remaining = iterations - count
+            if max_seconds is not None:
+                elapsed = now - start
+                if elapsed >= max_seconds:
+                    remaining = 0
+                elif elapsed > 0:  # The clock can be too coarse to move.
+                    remaining = min(remaining,
+                                    count * (max_seconds - elapsed) / elapsed)
+            if remaining <= 0 or self.is_decided(remaining):
+                break
+        if self.table is not None:
+            logger.info('Transposition table: %r', self.table.get_stats())
+        return self.get_result(reused_visits)
+
+    def is_decided(self, remaining):
+        """ Check if the most visited move can't be overtaken. """
+        best_visits = second_visits = 0
+        for child in self.root.children:
+            if child.visits > best_visits:
+                best_visits, second_visits = child.visits, best_visits
+            elif child.visits > second_visits:
+                second_visits = child.visits
+        return best_visits - second_visits > remaining
+
+    def get_result(self, reused_visits, is_final=True):
+        root = self.root
+        if not root.children:
+            raise ValueError('Search has no moves yet, so it has no result.')
+        move = max(root.children, key=lambda child: child.visits).move
+        return SearchResult(move=move,
+                            root=root,
+                            reused_visits=reused_visits,
+                            is_final=is_final)
+
+    def run_iteration(self):
+        if self.max_nodes is not None and self.node_count >= self.max_nodes:
+            self.prune()
+        node = self.select_leaf()
+        winner = node.winner
+        if winner is None and self.tablebase is not None:
+            winner = self.tablebase.get_winner(node.state)
+        if winner is None:
+            winner = self.game.simulate(node.state)
+        while node is not None:
+            if winner is Draw:
+                score = 0.5
+            elif winner == -node.state.player:
+                score = 1
+            else:
+                score = 0
+            node.visits += 1
+            node.score += score
+            stats = node.stats
+            if stats is not None:
+                stats.visits += 1
+                stats.score += score
+            node = node.parent
+
+    def select_leaf(self):
+        """ Follow the best children down, and expand one untried move. """
+        game = self.game
+        node = self.root
+        while node.winner is None:
+            if node.untried_moves is None:
+                node.untried_moves = game.get_moves(node.state)[1]
+                shuffle(node.untried_moves)
+            if node.untried_moves:
+                move = node.untried_moves.pop()
+                child = SearchNode(game,
+                                   game.apply_move(node.state, move),
+                                   move,
+                                   node)
+                if node.children:
+                    node.children.append(child)
+                else:
+                    node.children = [child]
+                self.node_count += 1
+                if self.table is not None:
+                    self.share_stats(child)
+                return child
+            node = node.get_best_child(self.c)
+        return node
+
+    def share_stats(self, node: SearchNode):
+        """ Link a new node to its position's stats in the table.
+
+        If other nodes have visited the position, their average score
+        counts as one extra visit to the new node. That visit is added to
+        each node on the path up to the root, like a playout, so no child
+        ever has more visits than its parent. The shared stats only count
+        real playouts.
+        """
+        key = self.table.get_key(node.state)
+        stats = self.table.get(key)
+        if stats is None:
+            stats = SearchStats()
+            self.table.put(key, stats)
+        elif stats.visits:
+            score = stats.score / stats.visits
+            path_node = node
+            while path_node is not None:
+                path_node.visits += 1
+                path_node.score += score
+                score = 1 - score  # for the player who moved into parent
+                path_node = path_node.parent
+        node.stats = stats
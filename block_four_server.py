@@ -0,0 +1,354 @@
+""" Serve moves for many games at once over a local socket.
+
+Clients send one JSON request per line, and get one JSON response per line,
+with the same id. Responses can come back in a different order from the
+requests. A request gives the position either as the text from format()
+with the player to move, or as the int from pack():
+
+    {"id": 1, "cells": "+........\\n...", "player": -1}
+    {"id": 2, "packed": 12345, "engine": "mcts", "iterations": 2000}
+
+Optional settings are field_size and field_count (3 by default), engine
+(puct by default, or mcts), iterations, and seconds, the time limit for the
+response. The response has the move, and statistics from the search:
+
+    {"id": 1, "move": [4, 4], "stats": {"engine": "puct", ...}}
+
+or else an error message:
+
+    {"id": 1, "error": "The game is over."}
+
+Searches run in a pool of worker processes. PUCT requests that arrive
+together go to a worker as one batch, and the worker evaluates the leaves
+from all of its searches in the same call to the Evaluator.
+"""
+
+from argparse import ArgumentParser
+import asyncio
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import json
+from logging import basicConfig, getLogger, INFO
+import os
+from time import perf_counter, time
+
+from block_four_evaluation import Evaluator
+from block_four_game import BlockFourGame
+from block_four_puct import PuctSearch, search_together
+from block_four_search import SearchTree
+
+logger = getLogger(__name__)
+
+ENGINES = ('puct', 'mcts')
+DEFAULT_ITERATIONS = 1000
+DEADLINE_MARGIN = 0.02  # seconds to stop searching before a deadline
+
+SearchJob = namedtuple('SearchJob',
+                       'request_id field_size field_count packed engine '
+                       'iterations deadline')
+
+
+def is_int(value):
+    """ Check for a JSON integer, which excludes true and false. """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_request(request, now=None) -> SearchJob:
+    """ Check a request, and convert it to a SearchJob.
+
+    :param request: the decoded JSON request
+    :param now: the time() when it arrived, to find the deadline
+    :raises ValueError: if the request isn't valid, or the game is over
+    """
+    if not isinstance(request, dict):
+        raise ValueError('Request must be a JSON object.')
+    field_size = request.get('field_size', 3)
+    field_count = request.get('field_count', 3)
+    if not (is_int(field_size) and is_int(field_count) and
+            2 <= field_size <= 5 and 1 <= field_count <= 5):
+        raise ValueError('field_size must be 2 to 5, and field_count 1 to 5.')
+    game = BlockFourGame(field_size, field_count)
+    if 'packed' in request:
+        packed = request['packed']
+        game.check_packed(packed)
+        state = game.unpack(packed)
+    elif 'cells' in request:
+        cells = request['cells']
+        player = request.get('player')
+        if not isinstance(cells, str):
+            raise ValueError('cells must be a string.')
+        if player not in (1, -1) or isinstance(player, bool):
+            raise ValueError('player must be 1 or -1.')
+        game.check_cells(cells)
+        state = game.initial_state(player, cells)
+    else:
+        raise ValueError('Request needs cells or packed.')
+    if game.get_winner(state) is not None:
+        raise ValueError('The game is over.')
+    engine = request.get('engine', 'puct')
+    if engine not in ENGINES:
+        raise ValueError(f'engine must be one of {", ".join(ENGINES)}.')
+    iterations = request.get('iterations')
+    seconds = request.get('seconds')
+    if iterations is not None and (not is_int(iterations) or
+                                   iterations < 1):
+        raise ValueError('iterations must be a positive int.')
+    if seconds is not None and (not isinstance(seconds, (int, float)) or
+                                isinstance(seconds, bool) or
+                                seconds <= 0):
+        raise ValueError('seconds must be a positive number.')
+    if iterations is None and seconds is None:
+        iterations = DEFAULT_ITERATIONS
+    deadline = None
+    if seconds is not None:
+        deadline = (time() if now is None else now) + seconds
+    return SearchJob(request.get('id'),
+                     field_size,
+                     field_count,
+                     game.pack(state),
+                     engine,
+                     iterations,
+                     deadline)
+
+
+@lru_cache(maxsize=None)
+def get_evaluator(field_size, field_count):
+    return Evaluator(BlockFourGame(field_size, field_count))
+
+
+def get_search_deadline(job: SearchJob):
+    """ Convert a job's time() deadline to perf_counter() in this process.
+    """
+    if job.deadline is None:
+        return None
+    return perf_counter() + job.deadline - time() - DEADLINE_MARGIN
+
+
+def format_response(job: SearchJob, result, stats):
+    root = result.root
+    if not root.children:
+        raise ValueError('Search has no moves yet, so it has no result.')
+    child = max(root.children, key=lambda child: child.visits)
+    stats.update(visits=root.visits,
+                 value=round(child.score / child.visits, 4))
+    return dict(id=job.request_id,
+                move=[result.move.row, result.move.column],
+                stats=stats)
+
+
+def run_puct_jobs(jobs):
+    """ Search for all the jobs together, in a worker process.
+
+    All the jobs must have the same board geometry.
+    :return: a response dict for each job
+    """
+    start = perf_counter()
+    game = BlockFourGame(jobs[0].field_size, jobs[0].field_count)
+    evaluator = get_evaluator(jobs[0].field_size, jobs[0].field_count)
+    responses = [dict(id=job.request_id, error='Deadline passed.')
+                 for job in jobs]
+    live = [i
+            for i, job in enumerate(jobs)
+            if job.deadline is None or get_search_deadline(job) > start]
+    if live:
+        results = search_together(
+            [PuctSearch(game, evaluator) for _ in live],
+            [game.unpack(jobs[i].packed) for i in live],
+            [jobs[i].iterations for i in live],
+            [get_search_deadline(jobs[i]) for i in live])
+        seconds = round(perf_counter() - start, 4)
+        for i, result in zip(live, results):
+            stats = dict(engine='puct', batch_size=len(live), seconds=seconds)
+            responses[i] = format_response(jobs[i], result, stats)
+    return responses
+
+
+def run_mcts_job(job: SearchJob):
+    """ Search for one job, in a worker process. """
+    start = perf_counter()
+    deadline = get_search_deadline(job)
+    max_seconds = None
+    if deadline is not None:
+        max_seconds = deadline - start
+        if max_seconds <= 0:
+            return dict(id=job.request_id, error='Deadline passed.')
+    game = BlockFourGame(job.field_size, job.field_count)
+    result = SearchTree(game).search(game.unpack(job.packed),
+                                     job.iterations,
+                                     max_seconds)
+    stats = dict(engine='mcts', seconds=round(perf_counter() - start, 4))
+    return format_response(job, result, stats)
+
+
+class EngineServer:
+    """ Answers requests from many connections with a pool of processes.
+
+    PUCT requests wait in a queue until a worker is free, and then all the
+    waiting requests go to that worker as a batch, up to max_batch.
+    """
+    def __init__(self, process_count=None, max_batch=32):
+        self.process_count = process_count or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.pool = ProcessPoolExecutor(self.process_count)
+        self.pending = None  # queue of (job, future) for PUCT searches
+        self.free_workers = None
+        self.batch_task = None
+        self.server = None
+        self.handlers = set()  # a task for each open connection
+        self.writers = set()
+
+    async def start(self, host='localhost', port=0, path=None):
+        """ Start listening on a TCP port, or a Unix socket if path is set.
+
+        :return: the asyncio server
+        """
+        self.pending = asyncio.Queue()
+        self.free_workers = asyncio.Semaphore(self.process_count)
+        self.batch_task = asyncio.create_task(self.run_batches())
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_client,
+                                                          path)
+        else:
+            self.server = await asyncio.start_server(self.handle_client,
+                                                     host,
+                                                     port)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        for writer in self.writers:
+            writer.close()  # The clients' handlers then read the end.
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+        self.batch_task.cancel()
+        self.pool.shutdown(cancel_futures=True)
+
+    async def handle_client(self, reader, writer):
+        tasks = set()
+        handler = asyncio.current_task()
+        self.handlers.add(handler)
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            self.handlers.discard(handler)
+            self.writers.discard(writer)
+            writer.close()
+
+    async def answer(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if isinstance(request, dict):
+                request_id = request.get('id')
+            job = parse_request(request)
+            response = await self.search(job)
+        except ValueError as ex:
+            response = dict(id=request_id, error=str(ex))
+        except Exception:
+            logger.exception('Search failed for request %r.', request_id)
+            response = dict(id=request_id, error='Search failed.')
+        writer.write(json.dumps(response).encode() + b'\n')
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def search(self, job: SearchJob):
+        loop = asyncio.get_running_loop()
+        if job.engine == 'puct':
+            future = loop.create_future()
+            await self.pending.put((job, future))
+        else:
+            future = loop.run_in_executor(self.pool, run_mcts_job, job)
+        timeout = None if job.deadline is None else job.deadline - time()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return dict(id=job.request_id, error='Deadline passed.')
+
+    async def run_batches(self):
+        """ Send waiting PUCT requests to free workers, in batches. """
+        while True:
+            await self.free_workers.acquire()
+            batch = [await self.pending.get()]
+            while len(batch) < self.max_batch and not self.pending.empty():
+                batch.append(self.pending.get_nowait())
+            groups = defaultdict(list)
+            for job, future in batch:
+                if not future.done():  # Skip the ones that timed out.
+                    groups[job.field_size, job.field_count].append(
+                        (job, future))
+            if not groups:
+                self.free_workers.release()
+            for i, group in enumerate(groups.values()):
+                if i > 0:
+                    await self.free_workers.acquire()
+                asyncio.create_task(self.run_batch(group))
+
+    async def run_batch(self, group):
+        loop = asyncio.get_running_loop()
+        jobs = [job for job, _ in group]
+        try:
+            responses = await loop.run_in_executor(self.pool,
+                                                   run_puct_jobs,
+                                                   jobs)
+        except Exception:
+            logger.exception('Batch of %d searches failed.', len(jobs))
+            responses = [dict(id=job.request_id, error='Search failed.')
+                         for job in jobs]
+        finally:
+            self.free_workers.release()
+        for (job, future), response in zip(group, responses):
+            if not future.done():
+                future.set_result(response)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Serve moves for many games over a local socket.')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=7654)
+    parser.add_argument('--unix', help='Unix socket path to use instead')
+    parser.add_argument('--processes',
+                        type=int,
+                        help='worker processes, or one for each CPU')
+    parser.add_argument('--max-batch',
+                        type=int,
+                        default=32,
+                        help='most PUCT searches to run together')
+    return parser.parse_args()
+
+
+async def serve(args):
+    engine_server = EngineServer(args.processes, args.max_batch)
+    server = await engine_server.start(args.host, args.port, args.unix)
+    for socket in server.sockets:
+        logger.info('Listening on %s.', socket.getsockname())
+    try:
+        await server.serve_forever()
+    finally:
+        await engine_server.close()
+
+
+def main():
+    basicConfig(format='%(asctime)s %(message)s', level=INFO)
+    args = parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
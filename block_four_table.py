@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+from block_four_game import BlockFourGame, BlockFourState
+
+
+class TranspositionTable:
+    """ A bounded cache of search results for positions.
+
+    Keys are canonical forms, packed into ints, so a position shares its
+    entry with all its rotations and reflections. When the table is full,
+    the least recently used entry is dropped.
+
+    AlphaBetaSearch and EndgameSolver use their own keys, from the sorted
+    field states in a PositionIndex, which also cover every order of the
+    fields. They can share a table with each other, but not with a
+    SearchTree.
+    """
+    def __init__(self, game: BlockFourGame, capacity=1_000_000):
+        self.game = game
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_key(self, state: BlockFourState):
+        key, _ = self.game.get_canonical_form(state)
+        return self.game.pack(BlockFourState(*key))
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_stats(self):
+        return dict(size=len(self.entries),
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    hit_rate=self.hit_rate)
@@ -0,0 +1,378 @@
+""" Exact game values for small boards, solved ahead of time.
+
+A move always fills the first empty cell of a field, so the value of a
+position only depends on how many cells each player has in each field, and
+on the player to move. Each field has a few states, and each position gets a
+unique index from its field states. The values are packed into two bits per
+position and written to a file that is read as a memory map, so only the
+pages that get used are loaded.
+
+Run this module to build a table, and to check how often searches choose
+the best moves.
+"""
+
+from argparse import ArgumentParser
+from mmap import mmap, ACCESS_READ
+from random import Random
+from struct import Struct
+from time import perf_counter
+
+import numpy as np
+from mittmcts import Draw
+
+from block_four_game import BlockFourGame, BlockFourState, bit_count
+from block_four_search import SearchTree
+from block_four_table import TranspositionTable
+
+# Values in the table. 0 means the position wasn't solved.
+POS_WIN = 1
+NEG_WIN = 2
+DRAW = 3
+WINNERS = {POS_WIN: 1, NEG_WIN: -1, DRAW: Draw}
+VALUES = {1: POS_WIN, -1: NEG_WIN, Draw: DRAW}
+
+# Preferences of each player, from worst to best.
+RANKS = {1: {NEG_WIN: 0, DRAW: 1, POS_WIN: 2},
+         -1: {POS_WIN: 0, DRAW: 1, NEG_WIN: 2}}
+
+HEADER = Struct('<4sBB2x')  # magic, field_size, field_count
+MAGIC = b'B4TB'
+MAX_TABLE_POSITIONS = 1 << 26  # larger boards take too long to solve
+
+
+def check_scoring(game: BlockFourGame):
+    """ Reject games scored by counting cells.
+
+    Positions are only numbered by the state of each field, so they can't
+    tell who has more cells.
+    """
+    if game.count_cells:
+        raise ValueError('Positions are only indexed for games scored by '
+                         'fields, not count_cells.')
+
+
+class PositionIndex:
+    """ Numbers the positions on one size of board.
+
+    Each field is in one of the open states, (pos_count, neg_count), or
+    controlled by one player, or full with neither player in control.
+    """
+    def __init__(self, game: BlockFourGame):
+        geometry = self.geometry = game.geometry
+        capture_count = geometry.capture_count
+        field_cell_count = geometry.field_size ** 2
+        self.open_states = [(pos_count, neg_count)
+                            for pos_count in range(capture_count)
+                            for neg_count in range(capture_count)
+                            if pos_count + neg_count < field_cell_count]
+        self.state_numbers = {counts: i
+                              for i, counts in enumerate(self.open_states)}
+        self.pos_state = len(self.open_states)
+        self.neg_state = self.pos_state + 1
+        self.full_state = self.pos_state + 2
+        self.state_count = self.full_state + 1
+        field_count = len(geometry.field_masks)
+        self.position_count = 2 * self.state_count ** field_count
+        self.empty_fields = (self.state_numbers[0, 0], ) * field_count
+
+        # next_states[player][field_state] after a move in that field
+        self.next_states = {}
+        for player in (1, -1):
+            next_states = [None] * self.state_count  # closed fields
+            for i, (pos_count, neg_count) in enumerate(self.open_states):
+                if player == 1:
+                    pos_count += 1
+                else:
+                    neg_count += 1
+                if pos_count >= capture_count:
+                    next_states[i] = self.pos_state
+                elif neg_count >= capture_count:
+                    next_states[i] = self.neg_state
+                elif pos_count + neg_count == field_cell_count:
+                    next_states[i] = self.full_state
+                else:
+                    next_states[i] = self.state_numbers[pos_count, neg_count]
+            self.next_states[player] = next_states
+
+    def get_fields(self, state: BlockFourState):
+        """ Find the state of each field. """
+        fields = []
+        for field, field_mask in enumerate(self.geometry.field_masks):
+            field_bit = 1 << field
+            if state.pos_fields & field_bit:
+                fields.append(self.pos_state)
+            elif state.neg_fields & field_bit:
+                fields.append(self.neg_state)
+            elif not state.open_fields & field_bit:
+                fields.append(self.full_state)
+            else:
+                fields.append(self.state_numbers[
+                    bit_count(state.pos_cells & field_mask),
+                    bit_count(state.neg_cells & field_mask)])
+        return tuple(fields)
+
+    def get_index(self, fields, player):
+        index = 0
+        for field_state in reversed(fields):
+            index = index * self.state_count + field_state
+        return 2 * index + (player == -1)
+
+    def get_position(self, index):
+        """ Find the fields and player for an index. """
+        player = -1 if index & 1 else 1
+        index >>= 1
+        fields = []
+        for _ in self.empty_fields:
+            index, field_state = divmod(index, self.state_count)
+            fields.append(field_state)
+        return tuple(fields), player
+
+    def get_value(self, fields):
+        """ Find the value if the game is over, like get_winner(). """
+        pos_count = fields.count(self.pos_state)
+        neg_count = fields.count(self.neg_state)
+        contested_count = (len(fields) - pos_count - neg_count -
+                           fields.count(self.full_state))
+        if pos_count > neg_count + contested_count:
+            return POS_WIN
+        if neg_count > pos_count + contested_count:
+            return NEG_WIN
+        if contested_count:
+            return 0
+        return DRAW
+
+
+class EndgameSolver:
+    """ Solves positions exactly with memoized negamax.
+
+    Use it as the tablebase for a SearchTree on larger boards: positions
+    with up to max_empty_cells open cells are solved, and earlier positions
+    are left to the search.
+    """
+    def __init__(self,
+                 game: BlockFourGame,
+                 max_empty_cells=12,
+                 table: TranspositionTable = None):
+        """ Initialize.
+
+        :param table: where to keep the values on boards with too many
+            positions for an array, or None to make a new table. An
+            AlphaBetaSearch for the same game can share it, and use the
+            exact values.
+        """
+        check_scoring(game)
+        self.game = game
+        self.index = PositionIndex(game)
+        self.max_empty_cells = max_empty_cells
+        self.values = self.table = None
+        if self.index.position_count <= MAX_TABLE_POSITIONS:
+            self.values = bytearray(self.index.position_count)
+        elif table is None:
+            self.table = TranspositionTable(game)
+        else:
+            self.table = table
+
+    def get_winner(self, state: BlockFourState):
+        """ Solve the position, or return None if it has too many moves. """
+        if state.open_fields is None:
+            state = self.game.add_fields(state)
+        geometry = self.game.geometry
+        contested_fields = state.open_fields & ~(state.pos_fields |
+                                                 state.neg_fields)
+        open_cells = 0
+        for field, field_mask in enumerate(geometry.field_masks):
+            if contested_fields >> field & 1:
+                open_cells |= field_mask
+        open_cells &= ~(state.pos_cells | state.neg_cells)
+        if bit_count(open_cells) > self.max_empty_cells:
+            return None
+        return WINNERS[self.solve(self.index.get_fields(state),
+                                  state.player)]
+
+    def solve(self, fields, player):
+        """ Find the value of a position, and all positions after it.
+
+        Fields don't affect each other, so the value only depends on how
+        many fields are in each state. Sorting the field states gives one
+        key for every order of them, including all the rotations and
+        reflections of a board.
+        """
+        fields = tuple(sorted(fields))
+        values = self.values
+        table = self.table
+        position_index = self.index
+        index = position_index.get_index(fields, player)
+        if table is None:
+            value = values[index]
+        else:
+            value = table.get(index)
+            if not isinstance(value, int):
+                value = 0  # not solved, or an entry from a search
+        if value:
+            return value
+        value = position_index.get_value(fields)
+        if not value:
+            ranks = RANKS[player]
+            next_states = position_index.next_states[player]
+            best_rank = -1
+            for field, field_state in enumerate(fields):
+                next_state = next_states[field_state]
+                if next_state is None:
+                    continue
+                child_value = self.solve(
+                    fields[:field] + (next_state,) + fields[field+1:],
+                    -player)
+                rank = ranks[child_value]
+                if rank > best_rank:
+                    value = child_value
+                    best_rank = rank
+                    if rank == 2:
+                        break
+        if table is None:
+            values[index] = value
+        else:
+            table.put(index, value)
+        return value
+
+    def solve_all(self):
+        """ Solve every position on the board. """
+        position_index = self.index
+        values = self.values
+        if values is None:
+            raise ValueError('Board is too big to solve every position.')
+        for index in range(position_index.position_count):
+            if not values[index]:
+                # solve() stores the value under the sorted fields.
+                values[index] = self.solve(
+                    *position_index.get_position(index))
+
+
+class Tablebase:
+    """ Looks up values in a file written by write_tablebase(). """
+    def __init__(self, game: BlockFourGame, path):
+        check_scoring(game)
+        self.game = game
+        self.index = PositionIndex(game)
+        with open(path, 'rb') as file:
+            self.data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        magic, field_size, field_count = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a tablebase.')
+        if (field_size, field_count) != (game.field_size, game.field_count):
+            raise ValueError(
+                f'{path} is for {field_size}x{field_size} fields, '
+                f'{field_count} to a side.')
+
+    def get_winner(self, state: BlockFourState):
+        """ Look up the winner with best play, or None if not solved. """
+        if state.open_fields is None:
+            state = self.game.add_fields(state)
+        index = self.index.get_index(self.index.get_fields(state),
+                                     state.player)
+        byte_index, slot = divmod(index, 4)
+        value = self.data[HEADER.size + byte_index] >> (2 * slot) & 3
+        return WINNERS.get(value)
+
+    def close(self):
+        self.data.close()
+
+
+def write_tablebase(solver: EndgameSolver, path):
+    """ Solve every position, and write two bits for each one to a file. """
+    game = solver.game
+    if solver.index.position_count > MAX_TABLE_POSITIONS:
+        raise ValueError('Board is too big for a tablebase.')
+    solver.solve_all()
+    values = np.frombuffer(solver.values, np.uint8)
+    values = np.concatenate([values, np.zeros(-len(values) % 4, np.uint8)])
+    packed = (values[0::4] |
+              values[1::4] << 2 |
+              values[2::4] << 4 |
+              values[3::4] << 6)
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, game.field_size, game.field_count))
+        file.write(packed.tobytes())
+
+
+def get_best_moves(game: BlockFourGame, tablebase, state: BlockFourState):
+    """ List the moves that keep the best value for the player to move. """
+    player = state.player
+    ranks = RANKS[player]
+    _, moves = game.get_moves(state)
+    move_ranks = [ranks[VALUES[tablebase.get_winner(game.apply_move(state,
+                                                                    move))]]
+                  for move in moves]
+    best_rank = max(move_ranks)
+    return [move
+            for move, rank in zip(moves, move_ranks)
+            if rank == best_rank]
+
+
+def check_search(game: BlockFourGame,
+                 tablebase,
+                 position_count,
+                 iterations,
+                 seed=None):
+    """ Count how often a search chooses one of the best moves.
+
+    Positions come from random playouts, and only positions where some
+    moves are worse than others are checked.
+    """
+    random = Random(seed)
+    checked_count = correct_count = 0
+    while checked_count < position_count:
+        state = game.initial_state(player=random.choice((1, -1)))
+        while game.get_winner(state) is None:
+            _, moves = game.get_moves(state)
+            best_moves = get_best_moves(game, tablebase, state)
+            if len(best_moves) < len(moves):
+                result = SearchTree(game).search(state, iterations)
+                checked_count += 1
+                correct_count += result.move in best_moves
+                if checked_count == position_count:
+                    break
+            state = game.apply_move(state, random.choice(moves))
+    return correct_count, checked_count
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Solve a small board, and write its tablebase.')
+    parser.add_argument('path', help='file to write the tablebase to')
+    parser.add_argument('--field-size', type=int, default=2)
+    parser.add_argument('--field-count', type=int, default=2)
+    parser.add_argument('--check',
+                        type=int,
+                        default=100,
+                        help='positions to check searches on')
+    parser.add_argument('--iterations',
+                        type=int,
+                        default=1000,
+                        help='search iterations for each checked position')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    game = BlockFourGame(args.field_size, args.field_count)
+    solver = EndgameSolver(game)
+    start = perf_counter()
+    write_tablebase(solver, args.path)
+    duration = perf_counter() - start
+    print(f'Solved {solver.index.position_count} positions '
+          f'in {duration:.1f}s.')
+    winner = WINNERS[solver.solve(solver.index.empty_fields, 1)]
+    print('Winner when the positive player starts:',
+          'draw' if winner is Draw else winner)
+    if args.check:
+        tablebase = Tablebase(game, args.path)
+        correct_count, checked_count = check_search(game,
+                                                    tablebase,
+                                                    args.check,
+                                                    args.iterations)
+        print(f'Search chose a best move in {correct_count} of '
+              f'{checked_count} positions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+""" Tetromino placements for the full game described in the README.
+
+Each shape can be placed in any rotation, or in its mirror image. Every
+placement on the board is precomputed as a bit mask, so a placement is legal
+when it doesn't overlap the occupied cells.
+"""
+
+from collections import namedtuple
+
+from mittmcts import Draw
+
+from block_four_game import BlockFourGame, BlockFourState, bit_count
+
+# Shapes in the order that players fill them in.
+SHAPES = dict(I=('****',),
+              L=('***',
+                 '*'),
+              O=('**',
+                 '**'),
+              T=('***',
+                 ' *'),
+              Z=('**',
+                 ' **'))
+MAX_GAP_SIZE = 3  # gaps this size or smaller are filled by the other player
+
+TetrominoMove = namedtuple('TetrominoMove', 'shape cells')  # cells is a mask
+
+
+def get_orientations(rows):
+    """ List each distinct rotation and reflection of a shape.
+
+    :param rows: strings with '*' for the shape's cells
+    :return: a list of orientations, each a sorted tuple of (row, column)
+    """
+    cells = [(i, j)
+             for i, row in enumerate(rows)
+             for j, cell in enumerate(row)
+             if cell == '*']
+    orientations = set()
+    for _ in range(4):
+        cells = [(j, -i) for i, j in cells]  # rotate a quarter turn
+        for image in (cells, [(i, -j) for i, j in cells]):
+            min_row = min(i for i, j in image)
+            min_column = min(j for i, j in image)
+            orientations.add(tuple(sorted((i - min_row, j - min_column)
+                                          for i, j in image)))
+    return sorted(orientations)
+
+
+class TetrominoGame:
+    """ Places tetrominoes on a Block Four board, and fills gaps.
+
+    States are BlockFourState values, but unlike BlockFourGame, a
+    controlled field is not filled in. A player controls a field with more
+    than half of its cells, and wins with more than half of the fields.
+    """
+    def __init__(self, field_size=3, field_count=3):
+        self.board = BlockFourGame(field_size, field_count)
+        geometry = self.geometry = self.board.geometry
+        grid_size = geometry.grid_size
+        self.placements = {}
+        for shape, rows in SHAPES.items():
+            masks = []
+            for cells in get_orientations(rows):
+                height = max(i for i, j in cells) + 1
+                width = max(j for i, j in cells) + 1
+                for row in range(grid_size - height + 1):
+                    for column in range(grid_size - width + 1):
+                        mask = 0
+                        for i, j in cells:
+                            mask |= 1 << ((row + i) * grid_size + column + j)
+                        masks.append(mask)
+            self.placements[shape] = tuple(masks)
+
+        first_column = sum(1 << (row * grid_size)
+                           for row in range(grid_size))
+        self.not_first_column = geometry.all_cells & ~first_column
+        self.not_last_column = geometry.all_cells & ~(first_column <<
+                                                      (grid_size - 1))
+
+    def initial_state(self, player=None, cells: str = None):
+        return self.board.initial_state(player, cells)
+
+    def format(self, state: BlockFourState):
+        return self.board.format(state)
+
+    def get_moves(self, state: BlockFourState, shape):
+        """ List the legal placements of a shape, or [] to skip it. """
+        occupied = state.pos_cells | state.neg_cells
+        return [TetrominoMove(shape, mask)
+                for mask in self.placements[shape]
+                if not mask & occupied]
+
+    def can_place(self, state: BlockFourState, shape):
+        occupied = state.pos_cells | state.neg_cells
+        return any(not mask & occupied for mask in self.placements[shape])
+
+    def apply_move(self, state: BlockFourState, move: TetrominoMove):
+        """ Fill in a shape for the player to move, then fill gaps.
+
+        Gaps of MAX_GAP_SIZE or fewer empty cells next to the shape go to the
+        other player.
+        """
+        player = state.player
+        active_cells, other_cells = ((state.pos_cells, state.neg_cells)
+                                     if player == 1
+                                     else (state.neg_cells, state.pos_cells))
+        active_cells |= move.cells
+        empty_cells = self.geometry.all_cells & ~(active_cells | other_cells)
+        other_cells |= self.find_gaps(empty_cells, move.cells)
+        if player == 1:
+            state = BlockFourState(active_cells, other_cells, -player)
+        else:
+            state = BlockFourState(other_cells, active_cells, -player)
+        return self.board.add_fields(state)
+
+    def get_neighbours(self, cells):
+        """ Find the cells next to any of the given cells. """
+        grid_size = self.geometry.grid_size
+        neighbours = ((cells << 1 & self.not_first_column) |
+                      (cells >> 1 & self.not_last_column) |
+                      cells << grid_size |
+                      cells >> grid_size)
+        return neighbours & self.geometry.all_cells & ~cells
+
+    def flood_fill(self, seed, empty_cells, limit=None):
+        """ Grow seed into the empty region that contains it.
+
+        :param limit: stop early when the region grows past this size
+        :return: the region's mask, or None if it grew past limit
+        """
+        region = seed
+        while True:
+            grown = (region | self.get_neighbours(region)) & empty_cells
+            if grown == region:
+                return region
+            if limit is not None and bit_count(grown) > limit:
+                return None
+            region = grown
+
+    def find_gaps(self, empty_cells, cells):
+        """ Find small empty regions next to the given cells. """
+        seeds = self.get_neighbours(cells) & empty_cells
+        gaps = 0
+        while seeds:
+            seed = seeds & -seeds
+            region = self.flood_fill(seed, empty_cells, MAX_GAP_SIZE)
+            if region is None:
+                seeds ^= seed
+            else:
+                gaps |= region
+                seeds &= ~region
+        return gaps
+
+    def get_winner(self, state: BlockFourState):
+        """ Find the winner, or None if the result can still change. """
+        geometry = self.geometry
+        capture_count = geometry.capture_count
+        pos_count = neg_count = contested_count = 0
+        empty_cells = ~(state.pos_cells | state.neg_cells)
+        for field_mask in geometry.field_masks:
+            field_pos = bit_count(state.pos_cells & field_mask)
+            field_neg = bit_count(state.neg_cells & field_mask)
+            field_empty = bit_count(empty_cells & field_mask)
+            if field_pos >= capture_count:
+                pos_count += 1
+            elif field_neg >= capture_count:
+                neg_count += 1
+            elif (field_pos + field_empty >= capture_count or
+                  field_neg + field_empty >= capture_count):
+                contested_count += 1
+        if pos_count > neg_count + contested_count:
+            return 1
+        if neg_count > pos_count + contested_count:
+            return -1
+        if contested_count and any(self.can_place(state, shape)
+                                   for shape in SHAPES):
+            return None
+        if pos_count > neg_count:
+            return 1
+        if pos_count < neg_count:
+            return -1
+        return Draw
@@ -0,0 +1,276 @@
+""" Play engines against each other without a window, and rate them.
+
+Each game's result is added to a JSON lines file as soon as it finishes, so
+an interrupted tournament keeps its results, and running it again with the
+same file only plays the missing games.
+
+Engines are written as a name with optional search limits, like
+mcts:iterations=1000 or alphabeta:seconds=0.1. Example:
+
+    python block_four_tournament.py mcts:iterations=1000 puct:iterations=100
+"""
+
+from argparse import ArgumentParser
+from collections import namedtuple, defaultdict
+from itertools import combinations
+import json
+from math import log10, sqrt
+from multiprocessing import Pool
+import os
+import random
+from time import perf_counter
+
+from mittmcts import Draw
+
+from block_four_alphabeta import AlphaBetaSearch
+from block_four_game import BlockFourGame
+from block_four_puct import PuctSearch
+from block_four_records import GameRecordWriter
+from block_four_search import SearchTree
+
+ENGINES = dict(mcts=SearchTree, alphabeta=AlphaBetaSearch, puct=PuctSearch)
+
+EngineSpec = namedtuple('EngineSpec', 'text name iterations seconds')
+GameJob = namedtuple('GameJob',
+                     'game_id pos_spec neg_spec field_size field_count seed')
+PairStats = namedtuple('PairStats', 'wins draws losses')
+
+
+def parse_engine(text: str) -> EngineSpec:
+    """ Parse an engine like mcts:iterations=1000,seconds=0.5. """
+    name, _, settings = text.partition(':')
+    if name not in ENGINES:
+        raise ValueError(f'Unknown engine {name!r}, expected one of '
+                         f'{", ".join(ENGINES)}.')
+    limits = dict(iterations=None, seconds=None)
+    for setting in filter(None, settings.split(',')):
+        key, _, value = setting.partition('=')
+        if key == 'iterations':
+            limits[key] = int(value)
+        elif key == 'seconds':
+            limits[key] = float(value)
+        else:
+            raise ValueError(f'Unknown setting {key!r} in {text!r}.')
+    if limits['iterations'] is None and limits['seconds'] is None:
+        limits['iterations'] = 1000
+    return EngineSpec(text, name, **limits)
+
+
+def list_jobs(specs, game_count, field_size, field_count, seed):
+    """ List game_count games for each pair of engines.
+
+    Each engine plays the positive player, who moves first, in half of the
+    games.
+    :raises ValueError: if two engines have the same text, because results
+        name the engines by their text
+    """
+    texts = set()
+    for spec in specs:
+        if spec.text in texts:
+            raise ValueError(
+                f'Engine {spec.text!r} is listed twice. To play an engine '
+                f'against itself, write its limits differently, like '
+                f'mcts and mcts:iterations=1000.')
+        texts.add(spec.text)
+    jobs = []
+    for spec1, spec2 in combinations(specs, 2):
+        for i in range(game_count):
+            pos_spec, neg_spec = (spec1, spec2) if i % 2 == 0 else (spec2,
+                                                                    spec1)
+            game_id = f'{spec1.text} {spec2.text} {i}'
+            jobs.append(GameJob(game_id,
+                                pos_spec,
+                                neg_spec,
+                                field_size,
+                                field_count,
+                                seed + len(jobs)))
+    return jobs
+
+
+def play_game(job: GameJob):
+    random.seed(job.seed)
+    game = BlockFourGame(job.field_size, job.field_count)
+    specs = {1: job.pos_spec, -1: job.neg_spec}
+    engines = {player: ENGINES[spec.name](game)
+               for player, spec in specs.items()}
+    start = perf_counter()
+    state = game.initial_state(player=1)
+    winner = game.get_winner(state)
+    moves = []
+    while winner is None:
+        spec = specs[state.player]
+        search_result = engines[state.player].search(state,
+                                                     spec.iterations,
+                                                     spec.seconds)
+        state = game.apply_move(state, search_result.move)
+        winner = game.get_winner(state)
+        moves.append(search_result.move)
+    summary = dict(game_id=job.game_id,
+                   pos_engine=job.pos_spec.text,
+                   neg_engine=job.neg_spec.text,
+                   winner=None if winner is Draw else specs[winner].text,
+                   moves=len(moves),
+                   seconds=round(perf_counter() - start, 3),
+                   field_size=job.field_size,
+                   field_count=job.field_count,
+                   seed=job.seed)
+    return moves, summary
+
+
+def read_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def run_tournament(specs,
+                   game_count,
+                   output_path,
+                   process_count=None,
+                   field_size=3,
+                   field_count=3,
+                   seed=0,
+                   report=None,
+                   records_path=None):
+    """ Play the games that aren't in the output file yet.
+
+    :param report: a function to call with each new result
+    :param records_path: a file to add the moves of each new game to, in
+        the format from block_four_records
+    :return: all the results in the output file for these jobs
+    """
+    jobs = list_jobs(specs, game_count, field_size, field_count, seed)
+    job_ids = {job.game_id for job in jobs}
+    results = [result
+               for result in read_results(output_path)
+               if result['game_id'] in job_ids]
+    finished_ids = {result['game_id'] for result in results}
+    jobs = [job for job in jobs if job.game_id not in finished_ids]
+    records = None
+    if records_path is not None:
+        records = GameRecordWriter(records_path)
+    with open(output_path, 'a') as file:
+        if process_count == 1:
+            new_results = map(play_game, jobs)
+            pool = None
+        else:
+            pool = Pool(process_count)
+            new_results = pool.imap_unordered(play_game, jobs)
+        try:
+            for moves, result in new_results:
+                if records is not None:
+                    game = BlockFourGame(field_size, field_count)
+                    records.write(game, 1, moves, result['seed'])
+                    records.flush()
+                file.write(json.dumps(result) + '\n')
+                file.flush()
+                results.append(result)
+                if report is not None:
+                    report(result)
+        finally:
+            if pool is not None:
+                pool.terminate()
+            if records is not None:
+                records.close()
+    return results
+
+
+def count_pairs(results):
+    """ Count wins, draws, and losses for each pair of engines.
+
+    :return: {(engine1, engine2): PairStats for engine1}, with each pair in
+        both orders
+    """
+    counts = defaultdict(lambda: [0, 0, 0])
+    for result in results:
+        engines = result['pos_engine'], result['neg_engine']
+        for engine, other in (engines, engines[::-1]):
+            winner = result['winner']
+            outcome = 1 if winner is None else 0 if winner == engine else 2
+            counts[engine, other][outcome] += 1
+    return {pair: PairStats(*stats) for pair, stats in counts.items()}
+
+
+def get_score_interval(stats: PairStats, z=1.96):
+    """ Find the score, with draws as half a win, and its Wilson interval.
+
+    :return: score, low, high
+    """
+    count = sum(stats)
+    if count == 0:
+        return 0.5, 0.0, 1.0
+    score = (stats.wins + stats.draws / 2) / count
+    centre = (score + z*z / (2*count)) / (1 + z*z / count)
+    spread = (z * sqrt(score * (1 - score) / count + z*z / (4*count*count)) /
+              (1 + z*z / count))
+    return score, max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+def get_elo(score):
+    """ Convert a score to an Elo difference, limited to about +/-800. """
+    score = min(max(score, 0.01), 0.99)
+    return -400 * log10(1 / score - 1)
+
+
+def format_summary(results):
+    lines = ['engine                    opponent                  '
+             'games  wins draws losses  score (95% CI)      Elo (95% CI)']
+    for (engine, other), stats in sorted(count_pairs(results).items()):
+        score, low, high = get_score_interval(stats)
+        lines.append(f'{engine:24}  {other:24}  {sum(stats):5}  '
+                     f'{stats.wins:4} {stats.draws:5} {stats.losses:6}  '
+                     f'{score:.3f} ({low:.3f}-{high:.3f})  '
+                     f'{get_elo(score):+4.0f} '
+                     f'({get_elo(low):+.0f} to {get_elo(high):+.0f})')
+    return '\n'.join(lines)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Play a round robin tournament between engines.')
+    parser.add_argument('engines',
+                        nargs='+',
+                        help='engines like mcts:iterations=1000 or '
+                             'alphabeta:seconds=0.1, using the names ' +
+                             ', '.join(ENGINES))
+    parser.add_argument('--games',
+                        type=int,
+                        default=100,
+                        help='games for each pair of engines')
+    parser.add_argument('--output',
+                        default='tournament.jsonl',
+                        help='JSON lines file to add results to')
+    parser.add_argument('--processes',
+                        type=int,
+                        help='worker processes, or one for each CPU')
+    parser.add_argument('--field-size', type=int, default=3)
+    parser.add_argument('--field-count', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--records',
+                        help='binary file to add the moves of each game to')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    specs = [parse_engine(text) for text in args.engines]
+
+    def report(result):
+        print(f'{result["pos_engine"]} vs {result["neg_engine"]}: '
+              f'{result["winner"] or "draw"} won in {result["moves"]} moves.')
+
+    results = run_tournament(specs,
+                             args.games,
+                             args.output,
+                             args.processes,
+                             args.field_size,
+                             args.field_count,
+                             args.seed,
+                             report,
+                             args.records)
+    print(format_summary(results))
+
+
+if __name__ == '__main__':
+    main()
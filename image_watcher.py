@@ -1,18 +1,183 @@
 """ I use this to watch an image for changes while doing live coding.
 
 If I tell the window to always stay on top, I can see it while I edit my code
-in live coding mode.
+in live coding mode. Give it several images to show them side by side.
+
+On Linux, it sleeps until inotify reports that a file was closed after
+writing, or moved into place, so it never loads a half-written image.
+Elsewhere, it falls back to checking the modification times.
 """
 
 from argparse import ArgumentParser
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+import os
 from pathlib import Path
+from select import select
+from struct import Struct
+from threading import Thread
+from time import monotonic, sleep
 
 import pygame
 
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = Struct('iIII')  # wd, mask, cookie, len, then the name
+CHANGE_EVENT = pygame.event.custom_type()  # has paths that changed
+
+
+class InotifyWatcher:
+    """ Waits for inotify events about a set of files.
+
+    Each file's folder is watched, because editors and image libraries
+    often write a new file and move it over the old one.
+    """
+    def __init__(self, paths, debounce=0.05):
+        """ Initialize.
+
+        :param paths: the files to watch
+        :param debounce: time to wait for more writes after one arrives
+        :raises OSError: if inotify isn't available
+        """
+        libc = CDLL(find_library('c'), use_errno=True)
+        try:
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except AttributeError as ex:
+            raise OSError('inotify is not available.') from ex
+        self.debounce = debounce
+        self.fd = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(get_errno(), 'inotify_init1 failed.')
+        self.paths = {}  # {(wd, file name): path}
+        for path in paths:
+            folder = os.fsencode(Path(path).absolute().parent)
+            wd = inotify_add_watch(self.fd,
+                                   folder,
+                                   IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                error = get_errno()
+                self.close()
+                raise OSError(error, f'Cannot watch {path}.')
+            self.paths[wd, os.fsencode(Path(path).name)] = path
+
+    def read_paths(self):
+        """ Read the waiting events, and find the paths they're about. """
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return set()
+        paths = set()
+        start = 0
+        while start < len(data):
+            wd, _, _, name_length = INOTIFY_EVENT.unpack_from(data, start)
+            start += INOTIFY_EVENT.size
+            name = data[start:start + name_length].rstrip(b'\0')
+            start += name_length
+            path = self.paths.get((wd, name))
+            if path is not None:
+                paths.add(path)
+        return paths
+
+    def wait(self, timeout=None):
+        """ Wait for files to change.
+
+        :param timeout: seconds to wait, or None to wait forever
+        :return: a set of the paths that changed, empty after a timeout
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        changed = set()
+        while not changed:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - monotonic())
+            if not select([self.fd], [], [], remaining)[0]:
+                return changed
+            changed |= self.read_paths()
+        while select([self.fd], [], [], self.debounce)[0]:
+            changed |= self.read_paths()
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """ Checks the files' modification times and sizes. """
+    def __init__(self, paths, interval=0.1, debounce=0.05):
+        """ Initialize.
+
+        :param paths: the files to watch
+        :param interval: time between checks
+        :param debounce: time that a change has to stay the same
+        """
+        self.interval = interval
+        self.debounce = debounce
+        self.stamps = {path: self.get_stamp(path) for path in paths}
+
+    @staticmethod
+    def get_stamp(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def wait(self, timeout=None):
+        """ Wait for files to change.
+
+        :param timeout: seconds to wait, or None to wait forever
+        :return: a set of the paths that changed, empty after a timeout
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            stamps = {path: self.get_stamp(path) for path in self.stamps}
+            changed = {path
+                       for path, stamp in stamps.items()
+                       if stamp != self.stamps[path]}
+            if changed:
+                # Wait until the writes stop.
+                while True:
+                    sleep(self.debounce)
+                    new_stamps = {path: self.get_stamp(path)
+                                  for path in self.stamps}
+                    if new_stamps == stamps:
+                        break
+                    stamps = new_stamps
+                changed = {path
+                           for path, stamp in stamps.items()
+                           if stamp != self.stamps[path]}
+                self.stamps = stamps
+                if changed:
+                    return changed
+            if deadline is not None and monotonic() >= deadline:
+                return set()
+            sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def create_watcher(paths):
+    """ Watch with inotify, if possible, or else with polling. """
+    try:
+        return InotifyWatcher(paths)
+    except OSError:
+        return PollingWatcher(paths)
+
+
+def watch(watcher):
+    """ Post a CHANGE_EVENT whenever the watcher finds changes. """
+    while True:
+        paths = watcher.wait()
+        pygame.event.post(pygame.event.Event(CHANGE_EVENT, paths=paths))
+
 
 def parse_args():
-    parser = ArgumentParser(description='Displays a changing image file.')
-    parser.add_argument('image', type=Path)
+    parser = ArgumentParser(description='Displays changing image files.')
+    parser.add_argument('images', type=Path, nargs='+')
     return parser.parse_args()
 
 
@@ -32,32 +197,55 @@ def create_icon():
     return surface
 
 
+def load_image(path):
+    try:
+        # noinspection PyUnresolvedReferences
+        return pygame.image.load(str(path))
+    except (pygame.error, OSError):
+        return None
+
+
+def show(images, surface=None):
+    """ Draw the images side by side, resizing the window if needed.
+
+    :param images: a list of surfaces, or None for images that haven't
+        loaded yet
+    :return: the display surface
+    """
+    images = [image for image in images if image is not None]
+    size = (sum(image.get_width() for image in images) or 50,
+            max((image.get_height() for image in images), default=50))
+    if surface is None or surface.get_size() != size:
+        surface = pygame.display.set_mode(size)
+    surface.fill((0, 0, 0))
+    x = 0
+    for image in images:
+        surface.blit(image, (x, 0))
+        x += image.get_width()
+    pygame.display.flip()
+    return surface
+
+
 def main():
-    size = 50, 50
     args = parse_args()
     pygame.init()
     pygame.mixer.quit()  # Avoids high CPU.
     pygame.display.set_icon(create_icon())
-    timestamp = None
+    watcher = create_watcher(args.images)
+    images = {path: load_image(path) for path in args.images}
+    surface = show(images.values())
+    Thread(target=watch, args=(watcher,), daemon=True).start()
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return
-
-        new_timestamp = args.image.stat().st_mtime
-        if new_timestamp != timestamp:
-            try:
-                # noinspection PyUnresolvedReferences
-                image = pygame.image.load(str(args.image))
-                size = image.get_rect().size
-                surface = pygame.display.set_mode(size)
-                surface.blit(image, image.get_rect())
-                timestamp = new_timestamp
-            except pygame.error:
-                surface = pygame.display.set_mode(size)
-                surface.fill((0, 0, 0))
-            pygame.display.flip()
-        pygame.time.wait(100)
-
-
-main()
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            return
+        if event.type == CHANGE_EVENT:
+            for path in event.paths:
+                image = load_image(path)
+                if image is not None:  # Keep the old image after errors.
+                    images[path] = image
+            surface = show(images.values(), surface)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+from queue import Queue
+from random import Random
+from threading import Thread
+
+from mittmcts import Draw
+import pytest
+
+from block_four import run_opponent
+from block_four_alphabeta import AlphaBetaSearch, WIN_SCORE
+from block_four_game import BlockFourGame, BlockFourMove
+from block_four_table import TranspositionTable
+from block_four_tablebase import EndgameSolver
+
+
+def test_search():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++++
+....
+----
+--+.
+""")
+    expected_move = BlockFourMove(3, 3)
+    searcher = AlphaBetaSearch(game)
+
+    result = searcher.search(state, max_seconds=1)
+
+    assert result.move == expected_move
+    assert result.score == WIN_SCORE
+    assert result.is_final
+
+
+def test_matches_solver():
+    game = BlockFourGame(field_size=2, field_count=2)
+    solver = EndgameSolver(game, max_empty_cells=16)
+    searcher = AlphaBetaSearch(game)
+    random = Random(0)
+    for _ in range(20):
+        state = game.initial_state(player=random.choice((1, -1)))
+        for _ in range(random.randrange(10)):
+            _, moves = game.get_moves(state)
+            state = game.apply_move(state, random.choice(moves))
+            if game.get_winner(state) is not None:
+                break
+        if game.get_winner(state) is not None:
+            continue
+        winner = solver.get_winner(state)
+        expected_score = (0 if winner is Draw
+                          else WIN_SCORE * winner * state.player)
+
+        result = searcher.search(state, max_seconds=5)
+        next_state = game.apply_move(state, result.move)
+
+        assert solver.get_winner(next_state) == winner
+        if result.score in (WIN_SCORE, -WIN_SCORE):
+            assert result.score == expected_score
+
+
+def test_share_table_with_solver():
+    game = BlockFourGame()
+    state = game.initial_state(player=1, cells="""\
++++------
++++------
++++------
+------+++
+------+++
+------+++
++++-+-...
+++++-+...
+++-......
+""")
+    table = TranspositionTable(game)
+    solver = EndgameSolver(game, table=table)
+    winner = solver.get_winner(state)
+    searcher = AlphaBetaSearch(game, table=table)
+    solved_hits = table.hits
+
+    result = searcher.search(state, iterations=1000)
+
+    assert table.hits > solved_hits
+    assert result.score == WIN_SCORE * winner
+    assert solver.get_winner(game.apply_move(state, result.move)) == winner
+
+
+def test_node_limit():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    searcher = AlphaBetaSearch(game)
+    reports = []
+
+    result = searcher.search(state, iterations=500, report=reports.append)
+
+    assert searcher.node_count == 501
+    assert [report.depth for report in reports] == list(range(1, 7))
+    assert not reports[0].is_final
+    assert result.depth == 6
+    assert result.is_final
+
+
+def test_finished_game():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++
+-+
+""")
+    searcher = AlphaBetaSearch(game)
+
+    with pytest.raises(ValueError, match='The game is over.'):
+        searcher.search(state, iterations=10)
+
+
+def test_count_cells():
+    game = BlockFourGame(field_size=2, field_count=2, count_cells=True)
+
+    with pytest.raises(ValueError, match='not count_cells'):
+        AlphaBetaSearch(game)
+
+
+def test_opponent_engine():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state_queue = Queue()
+    result_queue = Queue()
+    Thread(target=run_opponent,
+           args=(game, state_queue, result_queue, 100),
+           kwargs=dict(opponent_engine='alphabeta'),
+           daemon=True).start()
+
+    state_queue.put(game.initial_state(player=-1))
+    result = result_queue.get(timeout=5)
+    while not result.is_final:
+        result = result_queue.get(timeout=5)
+
+    assert result.node_count > 0
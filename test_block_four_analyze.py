@@ -0,0 +1,79 @@
+import pytest
+
+from block_four_analyze import Analyzer, analyze_all, read_positions
+from block_four_game import BlockFourGame
+
+CELLS = """\
+++++
+....
+----
+--+.
+"""
+
+
+def test_read_positions():
+    game = BlockFourGame(2, 2)
+    state1 = game.initial_state(player=1, cells=CELLS)
+    state2 = game.initial_state(player=-1, cells=CELLS)
+    state3 = game.initial_state(player=-1)
+    lines = (CELLS + '\n-\n' + CELLS + str(game.pack(state3)) + '\n')
+
+    states = list(read_positions(lines.splitlines(), game))
+
+    assert states == [state1, state2, state3]
+
+
+def test_read_partial_position():
+    game = BlockFourGame(2, 2)
+
+    with pytest.raises(ValueError,
+                       match='Line 2: position has 2 rows, not 4.'):
+        list(read_positions(['', '....', '....'], game))
+
+
+@pytest.mark.parametrize('lines, message', [
+    (['-1'], 'Line 1: packed must be a non-negative int.'),
+    (['0', str(2**33)], r'Line 2: packed must be less than 2\*\*33.'),
+    (['', str(1 | 1 << 16)], 'Line 2: packed has cells for both players.'),
+    (['-', '....', '..x.', '....', '....'],
+     'Line 1: cells must have 4 rows of 4 characters'),
+    (['....', '.....', '....', '....'],
+     'Line 1: cells must have 4 rows of 4 characters')])
+def test_read_bad_positions(lines, message):
+    game = BlockFourGame(2, 2)
+
+    with pytest.raises(ValueError, match=message):
+        list(read_positions(lines, game))
+
+
+@pytest.mark.parametrize('engine', ['mcts', 'puct', 'eval'])
+def test_analyze(engine):
+    game = BlockFourGame(2, 2)
+    state = game.initial_state(player=1, cells=CELLS)
+    analyzer = Analyzer(game, engine, iterations=200)
+
+    result = analyzer.analyze(state)
+
+    assert result['player'] == 1
+    assert result['move'] == [3, 3]
+    assert result['value'] > 0
+
+
+def test_analyze_finished():
+    game = BlockFourGame(2, 1)
+    state = game.initial_state(player=1, cells='++\n+-\n')
+
+    result = Analyzer(game).analyze(state)
+
+    assert result == dict(player=1, winner=1)
+
+
+def test_analyze_all_processes():
+    game = BlockFourGame(2, 2)
+    states = [game.initial_state(player=1, cells=CELLS),
+              game.initial_state(player=-1, cells=CELLS)] * 3
+
+    results = list(analyze_all(states, (2, 2, 'eval', None, None), 2))
+
+    assert [result['player'] for result in results] == [1, -1] * 3
+    assert results[0]['move'] == [3, 3]
@@ -0,0 +1,163 @@
+from random import Random
+
+import numpy as np
+from mittmcts import Draw
+
+from block_four_batch import BlockFourBatch, NO_WINNER, DRAW, winner_value
+from block_four_game import BlockFourGame, BlockFourMove
+
+
+def test_round_trip():
+    game = BlockFourGame(field_size=2, field_count=2)
+    states = [game.initial_state(player=1, cells="""\
++..+
+.--.
+....
+-++-
+"""),
+              game.initial_state(player=-1)]
+
+    batch = BlockFourBatch.from_states(game, states)
+
+    assert batch.to_states() == states
+
+
+def test_packed_round_trip():
+    game = BlockFourGame(field_size=2, field_count=2)
+    states = [game.initial_state(player=1, cells="""\
++..+
+.--.
+....
+-++-
+"""),
+              game.initial_state(player=-1)]
+    records = game.write_packed([game.pack(state) for state in states])
+
+    batch = BlockFourBatch.from_packed(game, records)
+
+    assert batch.to_states() == states
+    assert batch.to_packed().tobytes() == records
+
+
+def test_write_packed_to_array():
+    game = BlockFourGame(field_size=2, field_count=2)
+    packed_states = [game.pack(game.initial_state(player=-1)),
+                     game.pack(game.initial_state(player=1))]
+    buffer = np.zeros(2 * game.geometry.packed_size, np.uint8)
+
+    game.write_packed(packed_states, buffer)
+
+    assert buffer.tobytes() == game.write_packed(packed_states)
+    assert game.read_packed(buffer) == packed_states
+
+
+def test_moves():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(cells="""\
++...
+....
+.-..
+....
+""")
+    batch = BlockFourBatch.from_states(game, [state])
+
+    mask = batch.get_move_mask()
+    moves = batch.get_moves()
+
+    assert np.flatnonzero(mask[0]).tolist() == [1, 2, 8, 10]
+    assert moves == [game.get_moves(state)[1]]
+
+
+def test_apply_moves():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++..
+....
+....
+..--
+""")
+    batch = BlockFourBatch.from_states(game, [state, state])
+    expected_states = [game.apply_move(state, BlockFourMove(1, 0)), state]
+
+    batch.apply_moves([4, -1])
+
+    assert batch.to_states() == expected_states
+
+
+def test_winners():
+    game = BlockFourGame(field_size=1, field_count=2)
+    states = [game.initial_state(cells=cells)
+              for cells in ('+.\n.-', '++\n+.', '++\n--', '-.\n--')]
+    batch = BlockFourBatch.from_states(game, states)
+
+    winners = batch.get_winners()
+
+    assert winners.tolist() == [NO_WINNER, 1, DRAW, -1]
+    assert [winner_value(winner) for winner in winners] == [None, 1, Draw, -1]
+
+
+def test_simulate():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = game.initial_state(player=-1, cells="""\
++.
+..
+""")
+    batch = BlockFourBatch.from_states(game, [state] * 10)
+
+    winners = batch.simulate()
+
+    assert winners.tolist() == [DRAW] * 10
+
+
+def test_large_board():
+    rng = np.random.default_rng(0)
+    for count_cells in (False, True):
+        game = BlockFourGame(field_size=5, field_count=5,
+                             count_cells=count_cells)
+        states = [game.initial_state(player=1),
+                  game.initial_state(player=-1)]
+        batch = BlockFourBatch.from_states(game, states)
+
+        winners = batch.simulate(rng)
+
+        assert [winner_value(winner) for winner in winners] == [
+            game.get_winner(state) for state in batch.to_states()]
+        if count_cells:
+            assert ((batch.pos_counts.sum(axis=1) +
+                     batch.neg_counts.sum(axis=1)) == 625).all()
+
+
+def test_matches_game():
+    """ Play random games with both engines, and compare every step. """
+    random = Random(0)
+    rng = np.random.default_rng(0)
+    for field_size, field_count in [(1, 2), (2, 2), (3, 3), (2, 3), (4, 3)]:
+        for count_cells in (False, True):
+            game = BlockFourGame(field_size, field_count, count_cells)
+            states = [game.initial_state(player=random.choice((1, -1)))
+                      for _ in range(20)]
+            batch = BlockFourBatch.from_states(game, states)
+            while True:
+                winners = batch.get_winners()
+                assert batch.to_states() == states
+                assert [winner_value(winner) for winner in winners] == [
+                    game.get_winner(state) for state in states]
+                assert batch.get_moves() == [game.get_moves(state)[1]
+                                             for state in states]
+                if (winners != NO_WINNER).all():
+                    break
+                cells = []
+                for i, state in enumerate(states):
+                    if winners[i] != NO_WINNER:
+                        cells.append(-1)
+                        continue
+                    move = random.choice(game.get_moves(state)[1])
+                    states[i] = game.apply_move(state, move)
+                    cells.append(move.row * game.get_size() + move.column)
+                batch.apply_moves(cells)
+
+            batch = BlockFourBatch.initial(game, 200)
+            winners = batch.simulate(rng)
+            assert (winners != NO_WINNER).all()
+            for state, winner in zip(batch.to_states(), winners):
+                assert game.get_winner(state) == winner_value(winner)
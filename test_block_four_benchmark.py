@@ -0,0 +1,52 @@
+from block_four_benchmark import (compare_results, make_positions,
+                                  run_benchmarks)
+from block_four_game import BlockFourGame
+
+
+def test_make_positions():
+    game = BlockFourGame(2, 2)
+
+    positions = make_positions(game, fill=0.5, count=3)
+
+    assert len(positions) == 3
+    for state in positions:
+        digits = game.get_digits(state)
+        assert len(digits) - digits.count('0') >= 8
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(geometries=[(2, 2)],
+                             fill_levels=[0.0],
+                             min_seconds=0.001)
+
+    names = [result['name'] for result in results]
+    assert names == ['apply_move',
+                     'get_moves',
+                     'get_winner',
+                     'format',
+                     'initial_state',
+                     'simulate',
+                     'search']
+    assert results[0]['field_size'] == 2
+    assert results[0]['fill'] == 0.0
+    assert results[0]['ops_per_second'] > 0
+
+
+def test_compare_results():
+    baseline = [dict(name='get_moves',
+                     field_size=3,
+                     field_count=3,
+                     fill=0.5,
+                     ops_per_second=1000.0),
+                dict(name='apply_move',
+                     field_size=3,
+                     field_count=3,
+                     fill=0.5,
+                     ops_per_second=1000.0)]
+    results = [dict(baseline[0], ops_per_second=950.0),
+               dict(baseline[1], ops_per_second=800.0),
+               dict(baseline[1], fill=0.9, ops_per_second=1.0)]
+
+    regressions = compare_results(results, baseline, threshold=0.1)
+
+    assert regressions == [(results[1], baseline[1], 0.8)]
@@ -0,0 +1,95 @@
+from pytest import approx
+
+from block_four_bidding import (BiddingSolver, get_choices, get_next_hand,
+                                resolve_bids, solve_matrix)
+from block_four_tetromino import TetrominoGame
+
+
+def test_choices():
+    assert len(get_choices('ILOTZ')) == 10
+    assert get_choices('LTZ') == ['LT', 'LZ', 'TZ']
+
+
+def test_next_hand():
+    assert get_next_hand('ILOTZ', 'LT') == 'IOZ'
+    assert get_next_hand('IOZ', 'IZ') == 'ILOTZ'
+
+
+def test_no_matches():
+    expected_placements = [(-1, 'I'), (1, 'L'), (1, 'T'), (-1, 'Z')]
+
+    assert resolve_bids('TL', 'ZI') == expected_placements
+
+
+def test_one_match():
+    expected_placements = [(1, 'I'), (1, 'I'), (-1, 'O'), (-1, 'O')]
+
+    assert resolve_bids('IT', 'TO') == expected_placements
+
+
+def test_two_matches():
+    assert resolve_bids('IT', 'TI') == []
+
+
+def test_solve_rock_paper_scissors():
+    payoffs = [[0, -1, 1],
+               [1, 0, -1],
+               [-1, 1, 0]]
+
+    row_strategy, column_strategy, value = solve_matrix(payoffs)
+
+    assert row_strategy == approx([1/3, 1/3, 1/3], abs=0.01)
+    assert column_strategy == approx([1/3, 1/3, 1/3], abs=0.01)
+    assert value == approx(0, abs=0.01)
+
+
+def test_solve_dominated_choice():
+    payoffs = [[1, 3],
+               [0, 2]]
+
+    row_strategy, column_strategy, value = solve_matrix(payoffs)
+
+    assert row_strategy == approx([1, 0], abs=0.01)
+    assert column_strategy == approx([1, 0], abs=0.01)
+    assert value == approx(1, abs=0.01)
+
+
+def test_solve_bidding():
+    game = TetrominoGame(field_size=2, field_count=2)
+    state = game.initial_state(cells="""\
++...
++...
+....
+...-
+""")
+    solver = BiddingSolver(game)
+
+    result = solver.solve(state, 'LTZ', 'ILOTZ')
+
+    assert result.pos_choices == ['LT', 'LZ', 'TZ']
+    assert len(result.neg_strategy) == 10
+    assert sum(result.pos_strategy) == approx(1)
+    assert -1 <= result.value <= 1
+
+
+def test_cache_symmetric_boards():
+    game = TetrominoGame(field_size=2, field_count=2)
+    state = game.initial_state(cells="""\
++...
++...
+....
+...-
+""")
+    image = game.board.transform(state, symmetry=3)
+    solver = BiddingSolver(game)
+    result1 = solver.solve(state, 'LTZ', 'ILOTZ')
+
+    result2 = solver.solve(image, 'LTZ', 'ILOTZ')
+    result3 = solver.solve(image, 'ILOTZ', 'LTZ')
+    result4 = solver.solve(state._replace(player=-1), 'LTZ', 'ILOTZ')
+
+    assert result2 is result1
+    assert result3 is not result1
+    assert result4 is result1
+    assert solver.table.hits == 2
+    assert len(solver.table) == 2
@@ -0,0 +1,100 @@
+from queue import Queue
+from threading import Thread
+
+import pytest
+
+from block_four import run_opponent
+from block_four_book import (BookEntry, OpeningBook, build_book, pack_key,
+                             write_book)
+from block_four_game import BlockFourGame
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    game = BlockFourGame(field_size=2, field_count=2)
+    path = tmp_path / 'book.bin'
+    write_book(game, build_book(game, plies=2, iterations=50), path)
+    return path
+
+
+def test_keys_sort_like_numbers():
+    game = BlockFourGame(field_size=2, field_count=2)
+    keys = [(0, 0, 1), (0, 0, -1), (0, 1, 1), (1, 0, 1), (2, 1, -1)]
+
+    packed_keys = [pack_key(game, key) for key in keys]
+
+    assert packed_keys == sorted(packed_keys)
+
+
+def test_look_up_all_positions(book_path):
+    game = BlockFourGame(field_size=2, field_count=2)
+    book = OpeningBook(game, book_path)
+    state = game.initial_state(player=1)
+    _, moves = game.get_moves(state)
+    state2 = game.apply_move(state, moves[0])
+
+    entry1 = book.get_entry(state)
+    entry2 = book.get_entry(state2)
+
+    assert len(book) == 28
+    assert entry1.move in moves
+    assert entry1.is_final
+    assert entry1.visits > 0
+    assert entry2.move in game.get_moves(state2)[1]
+
+
+def test_transformed_move(book_path):
+    game = BlockFourGame(field_size=2, field_count=2)
+    book = OpeningBook(game, book_path)
+    state = game.initial_state(player=-1, cells="""\
+.+..
+....
+....
+....
+""")
+    image = game.transform(state, symmetry=6)
+    entry = book.get_entry(state)
+
+    image_entry = book.get_entry(image)
+
+    assert entry.visits == image_entry.visits
+    assert image_entry.move in game.get_moves(image)[1]
+    geometry = game.geometry
+    cell = geometry.grid_size*image_entry.move.row + image_entry.move.column
+    original_cell = geometry.symmetries[6][cell]
+    expected_cell = geometry.grid_size*entry.move.row + entry.move.column
+    assert (geometry.cell_fields[original_cell] ==
+            geometry.cell_fields[expected_cell])
+
+
+def test_missing_position(book_path):
+    game = BlockFourGame(field_size=2, field_count=2)
+    book = OpeningBook(game, book_path)
+    state = game.initial_state(player=1, cells="""\
+++..
+--..
+....
+....
+""")
+
+    assert book.get_entry(state) is None
+
+
+def test_wrong_board_size(book_path):
+    with pytest.raises(ValueError, match='for 2x2 fields, 2 to a side'):
+        OpeningBook(BlockFourGame(), book_path)
+
+
+def test_opponent_uses_book(book_path):
+    game = BlockFourGame(field_size=2, field_count=2)
+    state_queue = Queue()
+    result_queue = Queue()
+    Thread(target=run_opponent,
+           args=(game, state_queue, result_queue, 10),
+           kwargs=dict(opening_book_path=book_path),
+           daemon=True).start()
+
+    state_queue.put(game.initial_state(player=-1))
+    result = result_queue.get(timeout=5)
+
+    assert isinstance(result, BookEntry)
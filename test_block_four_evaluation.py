@@ -0,0 +1,87 @@
+from pytest import approx, raises
+
+from block_four_evaluation import Evaluator
+from block_four_game import BlockFourGame
+
+
+def test_finished_games():
+    game = BlockFourGame(field_size=2, field_count=2)
+    states = [game.initial_state(player=1, cells="""\
+++++
+++++
+++..
+++..
+"""), game.initial_state(player=1, cells="""\
+----
+----
+--..
+--..
+"""), game.initial_state(player=1, cells="""\
+++--
+++--
+--++
+--++
+""")]
+    evaluator = Evaluator(game)
+
+    values = evaluator.evaluate(states)
+
+    assert values.tolist() == approx([1, -1, 0])
+
+
+def test_even_start():
+    game = BlockFourGame()
+    evaluator = Evaluator(game)
+
+    values = evaluator.evaluate([game.initial_state(player=1),
+                                 game.initial_state(player=-1)])
+
+    assert values.tolist() == approx([0, 0])
+
+
+def test_opposite_positions():
+    game = BlockFourGame()
+    evaluator = Evaluator(game)
+    state = game.initial_state(player=1, cells="""\
+++-
++..
+""")
+    opposite = game.initial_state(player=-1, cells="""\
+--+
+-..
+""")
+
+    value, opposite_value = evaluator.evaluate([state, opposite])
+
+    assert 0 < value < 1
+    assert opposite_value == approx(-value)
+
+
+def test_player_to_move_captures():
+    game = BlockFourGame()
+    evaluator = Evaluator(game)
+    cells = """\
++++
++..
+.-.
+"""
+
+    pos_value, neg_value = evaluator.evaluate(
+        [game.initial_state(player=1, cells=cells),
+         game.initial_state(player=-1, cells=cells)])
+    captured_value, = evaluator.evaluate([game.initial_state(player=-1,
+                                                             cells="""\
++++
+++.
+.-.
+""")])
+
+    assert pos_value == approx(captured_value)
+    assert 0 < neg_value < pos_value
+
+
+def test_count_cells():
+    game = BlockFourGame(field_size=2, field_count=2, count_cells=True)
+
+    with raises(ValueError, match='not count_cells'):
+        Evaluator(game)
@@ -1,6 +1,10 @@
+from array import array
+from random import Random
+
 from mittmcts import Draw
+import pytest
 
-from block_four_game import BlockFourGame, BlockFourMove
+from block_four_game import BlockFourGame, BlockFourMove, BlockFourState
 
 
 def test_initial_state():
@@ -50,6 +54,98 @@ def test_format():
     assert expected_text == text
 
 
+def test_pack():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=-1, cells="""\
++..+
+.--.
+....
+-++-
+""")
+
+    packed = game.pack(state)
+    state2 = game.unpack(packed)
+
+    assert packed == (0b0110000000001001 |
+                      0b1001000001100000 << 16 |
+                      1 << 32)
+    assert state2 == state
+
+
+def test_check_packed():
+    game = BlockFourGame(field_size=2, field_count=2)
+    game.check_packed(game.pack(game.initial_state(player=-1, cells="""\
++..+
+.--.
+....
+-++-
+""")))
+
+    for packed in (-1, True, '0'):
+        with pytest.raises(ValueError, match='non-negative int'):
+            game.check_packed(packed)
+    with pytest.raises(ValueError, match=r'less than 2\*\*33'):
+        game.check_packed(1 << 33)
+    with pytest.raises(ValueError, match='cells for both players'):
+        game.check_packed(1 << 3 | 1 << 19)
+
+
+def test_packed_moves():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
++..+
+.--.
+....
+-++-
+""")
+    packed = game.pack(state)
+    for _ in range(6):
+        _, moves = game.get_moves(state)
+        assert game.get_packed_moves(packed) == moves
+        assert game.get_packed_winner(packed) == game.get_winner(state)
+        state = game.apply_move(state, moves[-1])
+        packed = game.apply_packed_move(packed, moves[-1])
+
+        assert game.unpack(packed) == state
+
+
+def test_packed_winner():
+    random = Random(0)
+    for count_cells in (False, True):
+        game = BlockFourGame(field_size=2, field_count=2,
+                             count_cells=count_cells)
+        for _ in range(10):
+            state = game.initial_state(player=1)
+            while True:
+                packed = game.pack(state)
+                winner = game.get_winner(state)
+                assert game.get_packed_winner(packed) == winner
+                if winner is not None:
+                    break
+                _, moves = game.get_moves(state)
+                state = game.apply_move(state, random.choice(moves))
+
+
+def test_write_packed():
+    game = BlockFourGame(field_size=2, field_count=2)
+    packed_states = [game.pack(game.initial_state(player=-1)),
+                     game.pack(game.initial_state(player=1, cells="""\
++..+
+.--.
+....
+-++-
+"""))]
+    buffer = array('B', bytes(2 * game.geometry.packed_size))
+
+    records = game.write_packed(packed_states)
+    game.write_packed(packed_states, buffer)
+
+    assert len(records) == 10
+    assert records[:5] == b'\0\0\0\0\x01'
+    assert game.read_packed(records) == packed_states
+    assert game.read_packed(buffer) == packed_states
+
+
 def test_move():
     game = BlockFourGame()
     state1 = game.initial_state(player=1)
@@ -147,6 +243,17 @@ def test():
 def test_no_winner():
     game = BlockFourGame(field_size=1, field_count=2)
     state = game.initial_state(cells="""\
++.
+.-
+""")
+    winner = game.get_winner(state)
+
+    assert winner is None
+
+
+def test_no_winner_counting_cells():
+    game = BlockFourGame(field_size=1, field_count=2, count_cells=True)
+    state = game.initial_state(cells="""\
 ++
 +.
 """)
@@ -155,6 +262,35 @@ def test_no_winner():
     assert winner is None
 
 
+def test_early_winner():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = game.initial_state(cells="""\
+++
++.
+""")
+    winner = game.get_winner(state)
+
+    assert winner == 1
+
+
+def test_winner_by_fields():
+    game = BlockFourGame(field_size=3, field_count=3)
+    state = game.initial_state(cells="""\
+---------
+---------
+---------
+---+++...
+---+++...
+---+++...
+-.......+
+--.....++
+--.....++
+""")
+    winner = game.get_winner(state)
+
+    assert winner == -1
+
+
 def test_winner():
     game = BlockFourGame(field_size=1, field_count=2)
     state = game.initial_state(cells="""\
@@ -175,3 +311,146 @@ def test_winner_draw():
     winner = game.get_winner(state)
 
     assert winner is Draw
+
+
+def test_geometry():
+    game = BlockFourGame(field_size=2, field_count=2)
+    expected_mask = game.initial_state(cells="""\
+....
+....
+..++
+..++
+""").pos_cells
+
+    geometry = game.geometry
+
+    assert geometry.field_masks[3] == expected_mask
+    assert geometry.cell_fields[:8] == (0, 0, 1, 1, 0, 0, 1, 1)
+    assert geometry.capture_count == 3
+
+
+def test_open_fields():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state1 = game.initial_state(player=1, cells="""\
+++..
+....
+....
+..--
+""")
+
+    state2 = game.apply_move(state1, BlockFourMove(1, 0))
+
+    assert state1.open_fields == 0b1111
+    assert state2.open_fields == 0b1110
+    assert state2.pos_fields == 0b0001
+    assert state2.neg_fields == 0b0000
+    assert state2 == game.add_fields(state2)
+
+
+def test_get_moves_without_open_fields():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = BlockFourState(pos_cells=0b0001, neg_cells=0b1000, player=1)
+    expected_moves = [BlockFourMove(0, 1),
+                      BlockFourMove(1, 0)]
+
+    _, moves = game.get_moves(state)
+
+    assert expected_moves == moves
+
+
+def test_simulate_finished_game():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = game.initial_state(cells="""\
+++
++-
+""")
+    winner = game.simulate(state)
+
+    assert winner == 1
+
+
+def test_simulate():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = game.initial_state(player=-1, cells="""\
++.
+..
+""")
+    winner = game.simulate(state)
+
+    assert winner is Draw
+
+
+def test_simulate_counting_cells():
+    game = BlockFourGame(field_size=2, field_count=2, count_cells=True)
+    state = game.initial_state(player=1, cells="""\
+++--
+++--
+++-.
+++--
+""")
+    winner = game.simulate(state)
+
+    assert winner == 1
+
+
+def test_simulate_repeats_with_seed():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+
+    winners1 = [game.simulate(state, Random(seed).random)
+                for seed in range(20)]
+    winners2 = [game.simulate(state, Random(seed).random)
+                for seed in range(20)]
+
+    assert winners1 == winners2
+
+
+def test_transform():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
++..+
+.--.
+....
+-++-
+""")
+    expected_text = """\
++..-
+.-.+
+.-.+
++..-"""
+
+    state2 = game.transform(state, symmetry=4)
+
+    assert expected_text == game.format(state2)
+    assert state2.player == 1
+
+
+def test_symmetries_match_transform():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    for i in range(30):
+        _, moves = game.get_moves(state)
+        state = game.apply_move(state, moves[i % len(moves)])
+    digits = game.get_digits(state)
+
+    for symmetry, cells in enumerate(game.geometry.symmetries):
+        image_digits = game.get_digits(game.transform(state, symmetry))
+        assert image_digits == ''.join(digits[cell] for cell in cells)
+
+
+def test_canonical_form():
+    game = BlockFourGame()
+    state = game.initial_state(player=-1, cells="""\
+++-
++
+""")
+    keys = set()
+
+    for symmetry in range(8):
+        image = game.transform(state, symmetry)
+        key, image_symmetry = game.get_canonical_form(image)
+        keys.add(key)
+        canonical_state = game.transform(image, image_symmetry)
+        assert canonical_state[:3] == key
+
+    assert len(keys) == 1
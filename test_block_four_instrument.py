@@ -0,0 +1,85 @@
+from logging import INFO
+from pstats import Stats
+
+from block_four_game import BlockFourGame
+from block_four_instrument import (CountingGame, InstrumentedSearchTree,
+                                   SearchMetrics, SearchProfiler)
+from block_four_search import SearchTree
+
+
+def test_counting_game():
+    game = CountingGame(BlockFourGame(2, 2))
+    state = game.initial_state(player=1, cells="""\
+++++
+....
+----
+--+.
+""")
+
+    _, moves = game.get_moves(state)
+    state2 = game.apply_move(state, moves[0])
+    game.get_winner(state2)
+
+    metrics = game.metrics
+    assert metrics.get_moves_calls == 1
+    assert metrics.apply_move_calls == 1
+    assert metrics.get_winner_calls == 1
+
+
+def test_playout_moves():
+    game = CountingGame(BlockFourGame(2, 2))
+    state = game.initial_state(player=1)
+    values = iter([0.0] * 100)
+
+    game.simulate(state, lambda: next(values))
+
+    metrics = game.metrics
+    assert metrics.playouts == 1
+    assert metrics.playout_moves == 100 - len(list(values))
+    assert metrics.max_playout_moves == metrics.playout_moves > 0
+
+
+def test_search_metrics(caplog):
+    game = BlockFourGame()
+    searcher = InstrumentedSearchTree(game)
+
+    with caplog.at_level(INFO, logger='block_four_instrument'):
+        result = searcher.search(game.initial_state(player=1),
+                                 iterations=100)
+
+    metrics = result.metrics
+    assert isinstance(metrics, SearchMetrics)
+    assert 0 < metrics.iterations <= 100
+    assert metrics.iterations == result.root.visits
+    assert metrics.nodes_expanded == metrics.iterations
+    assert metrics.playouts == metrics.iterations
+    assert metrics.apply_move_calls == metrics.iterations
+    assert metrics.max_depth >= 1
+    assert 0 < metrics.select_seconds < metrics.search_seconds
+    assert 0 < metrics.playout_seconds < metrics.search_seconds
+    assert metrics.as_dict()['mean_playout_moves'] > 0
+    assert '"is_final": true' in caplog.records[-1].getMessage()
+
+
+def test_no_metrics_by_default():
+    game = BlockFourGame()
+
+    result = SearchTree(game).search(game.initial_state(player=1),
+                                     iterations=10)
+
+    assert result.metrics is None
+
+
+def test_profiler(tmp_path):
+    path = tmp_path / 'search.prof'
+    game = BlockFourGame()
+    profiler = SearchProfiler(str(path))
+
+    result = profiler.run(SearchTree(game).search,
+                          game.initial_state(player=1),
+                          iterations=10)
+
+    assert result.move is not None
+    stats = Stats(str(path))
+    function_names = {name for _, _, name in stats.stats}
+    assert 'simulate' in function_names
@@ -0,0 +1,90 @@
+import pytest
+
+from block_four_game import BlockFourGame, BlockFourMove
+from block_four_parallel import ParallelSearch, WorkerError
+
+
+class BrokenGame(BlockFourGame):
+    def get_moves(self, state):
+        raise ValueError('No moves today.')
+
+
+def test_search():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++++
+....
+----
+--+.
+""")
+    expected_move = BlockFourMove(3, 3)
+    searcher = ParallelSearch(game, worker_count=2, seed=0)
+    try:
+        result = searcher.search(state, iterations=200)
+        result2 = searcher.search(state, iterations=100)
+    finally:
+        searcher.close()
+
+    assert result.move == expected_move
+    assert 0 < sum(stats.visits for stats in result.move_stats) <= 400
+    assert result2.reused_visits > 0
+
+
+def test_time_limit_and_report():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    reports = []
+    searcher = ParallelSearch(game, worker_count=2)
+    try:
+        result = searcher.search(state, max_seconds=0.5, report=reports.append)
+    finally:
+        searcher.close()
+
+    assert reports
+    assert not reports[0].is_final
+    assert result.is_final
+
+
+def test_worker_error():
+    game = BrokenGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1)
+    searcher = ParallelSearch(game, worker_count=2)
+    try:
+        with pytest.raises(ValueError, match='No moves today.') as info:
+            searcher.search(state, iterations=10)
+        with pytest.raises(ValueError, match='No moves today.'):
+            searcher.search(state, iterations=10)
+    finally:
+        searcher.close()
+
+    assert isinstance(info.value.__cause__, WorkerError)
+    assert 'get_moves' in str(info.value.__cause__)
+
+
+def test_finished_game():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++
+-+
+""")
+    searcher = ParallelSearch(game, worker_count=2)
+    try:
+        with pytest.raises(ValueError,
+                           match='Cannot search a finished game.'):
+            searcher.search(state, iterations=10)
+    finally:
+        searcher.close()
+
+
+def test_stopped_worker():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1)
+    searcher = ParallelSearch(game, worker_count=2)
+    searcher.poll_seconds = 0.05
+    searcher.workers[1].kill()
+    searcher.workers[1].join()
+    try:
+        with pytest.raises(RuntimeError, match='Search worker 1 stopped'):
+            searcher.search(state, iterations=10)
+    finally:
+        searcher.close()
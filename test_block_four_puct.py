@@ -0,0 +1,90 @@
+from pytest import approx, raises
+
+from block_four_game import BlockFourGame, BlockFourMove
+from block_four_puct import PuctSearch, search_together
+
+
+def test_search():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++++
+....
+----
+--+.
+""")
+    expected_move = BlockFourMove(3, 3)
+    searcher = PuctSearch(game)
+
+    result = searcher.search(state, iterations=20)
+
+    assert result.move == expected_move
+    assert result.root.visits == 20
+
+
+def test_priors():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=-1, cells="""\
+++..
+-...
+....
+....
+""")
+    searcher = PuctSearch(game)
+
+    result = searcher.search(state, iterations=1)
+
+    priors = {child.move: child.prior for child in result.root.children}
+    assert sum(priors.values()) == approx(1)
+    assert max(priors, key=priors.get) == BlockFourMove(1, 1)
+
+
+def test_report():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    searcher = PuctSearch(game, batch_size=4)
+    searcher.report_seconds = 0
+    reports = []
+
+    result = searcher.search(state, iterations=20, report=reports.append)
+
+    assert len(reports) == 5
+    assert not reports[0].is_final
+    assert result.is_final
+    assert result.root.visits == 20
+
+
+def test_search_together():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state1 = game.initial_state(player=1, cells="""\
+++++
+....
+----
+--+.
+""")
+    state2 = game.initial_state(player=-1)
+    searches = [PuctSearch(game), PuctSearch(game)]
+
+    results = search_together(searches, [state1, state2], iterations=[20, 40])
+
+    assert results[0].move == BlockFourMove(3, 3)
+    assert results[0].root.visits == 20
+    assert results[1].root.visits == 40
+
+
+def test_no_result():
+    game = BlockFourGame(field_size=1, field_count=2)
+    finished_state = game.initial_state(player=1, cells="""\
+++
+-+
+""")
+    state = game.initial_state(player=1)
+    searcher = PuctSearch(game)
+
+    with raises(ValueError, match='Cannot search a finished game.'):
+        searcher.search(finished_state, iterations=10)
+    with raises(ValueError, match='Search needs at least one iteration.'):
+        searcher.search(state, iterations=0)
+    with raises(ValueError, match='Cannot search a finished game.'):
+        search_together([searcher], [finished_state], iterations=[10])
+    with raises(ValueError, match='Search has no moves yet'):
+        searcher.get_result()
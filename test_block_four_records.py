@@ -0,0 +1,100 @@
+from random import Random
+
+import pytest
+
+from block_four_game import BlockFourGame
+from block_four_records import (GameRecordReader, GameRecordWriter,
+                                get_moves, get_position, replay)
+
+
+def play_random_game(game, player, seed):
+    random = Random(seed)
+    state = game.initial_state(player=player)
+    states = [state]
+    moves = []
+    while game.get_winner(state) is None:
+        _, legal_moves = game.get_moves(state)
+        move = random.choice(legal_moves)
+        state = game.apply_move(state, move)
+        moves.append(move)
+        states.append(state)
+    return moves, states
+
+
+def test_write_and_read(tmp_path):
+    path = tmp_path / 'games.b4r'
+    game1 = BlockFourGame()
+    game2 = BlockFourGame(field_size=2, field_count=2)
+    moves1, states1 = play_random_game(game1, 1, seed=1)
+    moves2, states2 = play_random_game(game2, -1, seed=2)
+    with GameRecordWriter(path) as writer:
+        writer.write(game1, 1, moves1, seed=1)
+    with GameRecordWriter(path) as writer:
+        writer.write(game2, -1, moves2, seed=2)
+
+    with GameRecordReader(path) as reader:
+        record1, record2 = reader
+        assert (record1.field_size, record1.player, record1.seed) == (3, 1, 1)
+        assert (record2.field_size, record2.player, record2.seed) == (2, -1, 2)
+        assert get_moves(record1) == moves1
+        assert get_moves(record2) == moves2
+        assert list(replay(record2)) == states2
+        assert get_position(record1, 5) == states1[5]
+
+    assert path.stat().st_size == 8 + 9 + len(moves1) + 9 + len(moves2)
+
+
+def test_position_past_end(tmp_path):
+    path = tmp_path / 'games.b4r'
+    game = BlockFourGame()
+    moves, _ = play_random_game(game, 1, seed=3)
+    with GameRecordWriter(path) as writer:
+        writer.write(game, 1, moves)
+
+    with GameRecordReader(path) as reader:
+        record, = reader
+        with pytest.raises(IndexError):
+            get_position(record, len(moves) + 1)
+
+
+def test_read_arrays(tmp_path):
+    path = tmp_path / 'games.b4r'
+    game = BlockFourGame()
+    all_moves = []
+    with GameRecordWriter(path) as writer:
+        for seed in range(5):
+            moves, _ = play_random_game(game, 1 - 2*(seed % 2), seed)
+            writer.write(game, 1 - 2*(seed % 2), moves, seed)
+            all_moves.append(moves)
+        writer.write(game, 1, [], seed=99)
+        all_moves.append([])
+
+    with GameRecordReader(path) as reader:
+        arrays = reader.read_arrays()
+        records = list(reader)
+
+    assert arrays['seeds'].tolist() == [0, 1, 2, 3, 4, 99]
+    assert arrays['players'].tolist() == [1, -1, 1, -1, 1, 1]
+    assert arrays['move_counts'].tolist() == [len(moves)
+                                              for moves in all_moves]
+    for record, start, count in zip(records,
+                                    arrays['move_starts'],
+                                    arrays['move_counts']):
+        assert arrays['cells'][start:start + count].tobytes() == record.cells
+
+
+def test_board_too_big(tmp_path):
+    game = BlockFourGame(field_size=5, field_count=5)
+    moves, _ = play_random_game(BlockFourGame(), 1, seed=1)
+
+    with GameRecordWriter(tmp_path / 'games.b4r') as writer:
+        with pytest.raises(ValueError, match='up to 256 cells, not 625.'):
+            writer.write(game, 1, moves[:1])
+
+
+def test_not_a_record_file(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a record file')
+
+    with pytest.raises(ValueError, match='not a game record file'):
+        GameRecordReader(path)
@@ -0,0 +1,197 @@
+from time import perf_counter
+
+import pytest
+
+from block_four_game import BlockFourGame, BlockFourMove
+from block_four_search import SearchTree
+from block_four_table import TranspositionTable
+
+
+def test_search():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++++
+....
+----
+--+.
+""")
+    expected_move = BlockFourMove(3, 3)
+    searcher = SearchTree(game)
+
+    result = searcher.search(state, iterations=200)
+
+    assert result.move == expected_move
+    assert 0 < result.root.visits <= 200
+    assert result.reused_visits == 0
+
+
+def test_reuse_grandchild():
+    game = BlockFourGame()
+    state1 = game.initial_state(player=-1)
+    searcher = SearchTree(game)
+    result1 = searcher.search(state1, iterations=200)
+    state2 = game.apply_move(state1, result1.move)
+    _, moves = game.get_moves(state2)
+    state3 = game.apply_move(state2, moves[0])
+    child = next(child
+                 for child in result1.root.children
+                 if child.move == result1.move)
+    grandchild = next(grandchild
+                      for grandchild in child.children
+                      if grandchild.move == moves[0])
+    expected_visits = grandchild.visits
+
+    result2 = searcher.search(state3, iterations=100)
+
+    assert result2.root is grandchild
+    assert result2.root.parent is None
+    assert result2.reused_visits == expected_visits
+    assert expected_visits < result2.root.visits <= expected_visits + 100
+
+
+def test_new_tree():
+    game = BlockFourGame()
+    searcher = SearchTree(game)
+    searcher.search(game.initial_state(player=1), iterations=50)
+    state = game.initial_state(player=1, cells="""\
++
+""")
+
+    result = searcher.search(state, iterations=50)
+
+    assert result.reused_visits == 0
+    assert 0 < result.root.visits <= 50
+
+
+def test_stop_when_decided():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++
+-.
+""")
+    searcher = SearchTree(game)
+
+    result = searcher.search(state, iterations=200)
+
+    assert result.move == BlockFourMove(1, 1)
+    assert result.root.visits == 101
+
+
+def test_time_limit():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    searcher = SearchTree(game)
+    start = perf_counter()
+
+    result = searcher.search(state, max_seconds=0.1)
+
+    duration = perf_counter() - start
+    assert result.root.visits > 0
+    assert duration < 0.5
+
+
+def test_time_limit_coarse_clock(monkeypatch):
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    searcher = SearchTree(game)
+    monkeypatch.setattr('block_four_search.perf_counter', lambda: 1.0)
+
+    result = searcher.search(state, iterations=20, max_seconds=0.1)
+
+    assert 0 < result.root.visits <= 20
+
+
+def test_report():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    searcher = SearchTree(game)
+    searcher.report_seconds = 0
+    reports = []
+
+    result = searcher.search(state, iterations=20, report=reports.append)
+
+    # One report per iteration, though the search can stop early when the
+    # best move can't be overtaken.
+    assert len(reports) == result.root.visits
+    assert 10 <= len(reports) <= 20
+    assert not reports[0].is_final
+    assert result.is_final
+
+
+def test_transposition_table():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++++
+....
+----
+--+.
+""")
+    expected_move = BlockFourMove(3, 3)
+    table = TranspositionTable(game)
+    searcher = SearchTree(game, table=table)
+
+    result = searcher.search(state, iterations=200)
+
+    assert result.move == expected_move
+    assert table.hits > 0
+
+
+def test_shared_stats_keep_visits_consistent():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1)
+    table = TranspositionTable(game)
+    searcher = SearchTree(game, table=table)
+
+    searcher.search(state, iterations=500)
+
+    assert table.hits > 0
+    for node in searcher.list_nodes():
+        assert node.visits >= sum(child.visits for child in node.children)
+        assert 0 <= node.score <= node.visits
+
+
+def test_max_nodes():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    searcher = SearchTree(game, max_nodes=50)
+
+    result = searcher.search(state, iterations=500)
+
+    assert searcher.node_count <= 50
+    assert searcher.node_count == len(searcher.list_nodes())
+    assert result.root.visits > 100
+    for node in searcher.list_nodes():
+        moves = [child.move for child in node.children]
+        moves.extend(node.untried_moves or [])
+        if node.untried_moves is not None:
+            assert sorted(moves) == sorted(game.get_moves(node.state)[1])
+
+
+def test_tiny_max_nodes():
+    game = BlockFourGame()
+    state = game.initial_state(player=1)
+    searcher = SearchTree(game, max_nodes=2)
+
+    result = searcher.search(state, iterations=20)
+
+    assert searcher.node_count <= 2
+    assert 0 < result.root.visits <= 20
+
+
+def test_max_nodes_too_small():
+    with pytest.raises(ValueError, match='max_nodes must be at least 2.'):
+        SearchTree(BlockFourGame(), max_nodes=1)
+
+
+def test_finished_game():
+    game = BlockFourGame(field_size=1, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++
+-+
+""")
+    searcher = SearchTree(game)
+
+    with pytest.raises(ValueError, match='Cannot search a finished game.'):
+        searcher.search(state, iterations=10)
+    with pytest.raises(ValueError, match='Search has no moves yet'):
+        searcher.get_result(reused_visits=0)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+
+from block_four_game import BlockFourGame
+from block_four_server import (EngineServer, parse_request, run_mcts_job,
+                               run_puct_jobs)
+
+CELLS = """\
+++++
+....
+----
+--+.
+"""
+
+
+def test_parse_cells():
+    game = BlockFourGame(2, 2)
+    state = game.initial_state(player=1, cells=CELLS)
+
+    job = parse_request(dict(id=7,
+                             cells=CELLS,
+                             player=1,
+                             field_size=2,
+                             field_count=2,
+                             seconds=0.5),
+                        now=100.0)
+
+    assert job.request_id == 7
+    assert game.unpack(job.packed) == state
+    assert job.engine == 'puct'
+    assert job.iterations is None
+    assert job.deadline == 100.5
+
+
+def test_parse_packed():
+    game = BlockFourGame()
+    state = game.initial_state(player=-1)
+
+    job = parse_request(dict(packed=game.pack(state), engine='mcts'))
+
+    assert game.unpack(job.packed) == state
+    assert job.iterations == 1000
+    assert job.deadline is None
+
+
+@pytest.mark.parametrize('request_, message', [
+    ([], 'Request must be a JSON object.'),
+    (dict(player=1), 'Request needs cells or packed.'),
+    (dict(cells='', player=0), 'player must be 1 or -1.'),
+    (dict(packed=0, engine='random'), 'engine must be one of puct, mcts.'),
+    (dict(packed=0, iterations=0), 'iterations must be a positive int.'),
+    (dict(cells='++\n++', player=1, field_size=2, field_count=1),
+     'The game is over.'),
+    (dict(packed=2**200), r'packed must be less than 2\*\*163.'),
+    (dict(packed=1 | 1 << 81), 'packed has cells for both players.'),
+    (dict(packed=True), 'packed must be a non-negative int.'),
+    (dict(cells='x', player=1),
+     r'cells must have 9 rows of 9 characters from \+, -, and \.'),
+    (dict(cells='+.\n.', player=1, field_size=2, field_count=1),
+     'cells must have 2 rows'),
+    (dict(cells='x.\n..', player=1, field_size=2, field_count=1),
+     'cells must have 2 rows'),
+    (dict(cells='', player=True), 'player must be 1 or -1.'),
+    (dict(packed=0, iterations=True), 'iterations must be a positive int.'),
+    (dict(packed=0, seconds=True), 'seconds must be a positive number.'),
+    (dict(packed=0, field_size=True),
+     'field_size must be 2 to 5, and field_count 1 to 5.'),
+    (dict(packed=0, field_count=True),
+     'field_size must be 2 to 5, and field_count 1 to 5.')])
+def test_parse_errors(request_, message):
+    with pytest.raises(ValueError, match=message):
+        parse_request(request_)
+
+
+def test_run_puct_jobs():
+    jobs = [parse_request(dict(id=i,
+                               cells=CELLS,
+                               player=1,
+                               field_size=2,
+                               field_count=2,
+                               iterations=50))
+            for i in range(3)]
+
+    responses = run_puct_jobs(jobs)
+
+    assert [response['id'] for response in responses] == [0, 1, 2]
+    for response in responses:
+        assert response['move'] == [3, 3]
+        assert response['stats']['batch_size'] == 3
+        assert response['stats']['visits'] == 50
+
+
+def test_expired_job():
+    job = parse_request(dict(id=1, packed=0, seconds=0.01), now=0)
+
+    assert run_puct_jobs([job]) == [dict(id=1, error='Deadline passed.')]
+    assert run_mcts_job(job) == dict(id=1, error='Deadline passed.')
+
+
+def test_server():
+    game = BlockFourGame(2, 2)
+    state = game.initial_state(player=1, cells=CELLS)
+    requests = [dict(id=1, packed=game.pack(state), field_size=2,
+                     field_count=2, iterations=50),
+                dict(id=2, cells=CELLS, player=1, field_size=2,
+                     field_count=2, engine='mcts', iterations=200),
+                dict(id=3, cells=CELLS, player=1, field_size=2,
+                     field_count=2, seconds=0.5)]
+
+    async def run():
+        engine_server = EngineServer(process_count=1)
+        server = await engine_server.start()
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('localhost', port)
+            for request in requests:
+                writer.write(json.dumps(request).encode() + b'\n')
+            writer.write(b'not json\n')
+            await writer.drain()
+            responses = [json.loads(await reader.readline())
+                         for _ in range(len(requests) + 1)]
+            writer.close()
+            return responses
+        finally:
+            await engine_server.close()
+
+    responses = asyncio.run(run())
+
+    responses_by_id = {response['id']: response for response in responses}
+    assert responses_by_id[None]['error'].startswith('Expecting value')
+    for request_id in (1, 2, 3):
+        assert responses_by_id[request_id]['move'] == [3, 3]
+    assert responses_by_id[2]['stats']['engine'] == 'mcts'
+    assert responses_by_id[3]['stats']['seconds'] < 0.5
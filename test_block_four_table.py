@@ -0,0 +1,65 @@
+from queue import Queue
+from threading import Thread
+
+from block_four import run_opponent
+from block_four_game import BlockFourGame
+from block_four_table import TranspositionTable
+
+
+def test_symmetric_states_share_key():
+    game = BlockFourGame()
+    state = game.initial_state(player=1, cells="""\
++-
+""")
+    table = TranspositionTable(game)
+    table.put(table.get_key(state), 'found')
+    image = game.transform(state, symmetry=5)
+
+    value = table.get(table.get_key(image))
+
+    assert value == 'found'
+    assert table.hits == 1
+
+
+def test_miss():
+    game = BlockFourGame()
+    table = TranspositionTable(game)
+    state = game.initial_state(player=1)
+
+    value = table.get(table.get_key(state), 'default')
+
+    assert value == 'default'
+    assert table.misses == 1
+    assert table.hit_rate == 0
+
+
+def test_evict_least_recently_used():
+    game = BlockFourGame()
+    table = TranspositionTable(game, capacity=2)
+    table.put('a', 1)
+    table.put('b', 2)
+    table.get('a')
+
+    table.put('c', 3)
+
+    assert table.get('b') is None
+    assert table.get('a') == 1
+    assert len(table) == 2
+    assert table.evictions == 1
+
+
+def test_opponent_uses_table():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state_queue = Queue()
+    result_queue = Queue()
+    Thread(target=run_opponent,
+           args=(game, state_queue, result_queue, 50),
+           kwargs=dict(opponent_table=True),
+           daemon=True).start()
+
+    state_queue.put(game.initial_state(player=1))
+    result = result_queue.get(timeout=5)
+    while not result.is_final:
+        result = result_queue.get(timeout=5)
+
+    assert all(child.stats is not None for child in result.root.children)
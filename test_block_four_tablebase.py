@@ -0,0 +1,164 @@
+from random import Random
+
+from mittmcts import Draw
+import pytest
+
+from block_four_game import BlockFourGame, BlockFourMove
+from block_four_search import SearchTree
+from block_four_tablebase import (EndgameSolver, PositionIndex, Tablebase,
+                                  get_best_moves, write_tablebase)
+
+
+def find_winner(game, state):
+    """ Plain minimax over game states, to check the solver. """
+    winner = game.get_winner(state)
+    if winner is not None:
+        return winner
+    _, moves = game.get_moves(state)
+    winners = [find_winner(game, game.apply_move(state, move))
+               for move in moves]
+    if state.player in winners:
+        return state.player
+    if Draw in winners:
+        return Draw
+    return -state.player
+
+
+def test_index_round_trip():
+    game = BlockFourGame(field_size=2, field_count=2)
+    index = PositionIndex(game)
+    state = game.initial_state(player=-1, cells="""\
++++.
+-...
+--..
+-+..
+""")
+
+    fields = index.get_fields(state)
+    position_index = index.get_index(fields, state.player)
+
+    assert index.state_count == 11
+    assert index.position_count == 2 * 11 ** 4
+    assert fields == (index.state_numbers[2, 1],
+                      index.state_numbers[1, 0],
+                      index.neg_state,
+                      index.state_numbers[0, 0])
+    assert index.get_position(position_index) == (fields, -1)
+
+
+def test_solver_matches_minimax():
+    game = BlockFourGame(field_size=2, field_count=2)
+    solver = EndgameSolver(game, max_empty_cells=16)
+    random = Random(0)
+    for _ in range(20):
+        state = game.initial_state(player=random.choice((1, -1)))
+        for _ in range(random.randrange(6, 12)):
+            if game.get_winner(state) is not None:
+                break
+            _, moves = game.get_moves(state)
+            state = game.apply_move(state, random.choice(moves))
+
+        assert solver.get_winner(state) == find_winner(game, state)
+
+
+def test_solver_shares_field_orders():
+    game = BlockFourGame(field_size=2, field_count=2)
+    solver = EndgameSolver(game, max_empty_cells=16)
+    state = game.initial_state(player=1, cells="""\
++...
+-...
+....
+....
+""")
+    mirrored_state = game.initial_state(player=1, cells="""\
+....
+....
++...
+-...
+""")
+
+    winner = solver.get_winner(state)
+    solved_count = sum(1 for value in solver.values if value)
+
+    assert solver.get_winner(mirrored_state) == winner
+    assert sum(1 for value in solver.values if value) == solved_count
+
+
+def test_count_cells(tmp_path):
+    game = BlockFourGame(field_size=2, field_count=2, count_cells=True)
+
+    with pytest.raises(ValueError, match='not count_cells'):
+        EndgameSolver(game)
+    with pytest.raises(ValueError, match='not count_cells'):
+        Tablebase(game, tmp_path / 'block_four_2x2.tb')
+
+
+def test_too_many_empty_cells():
+    game = BlockFourGame()
+    solver = EndgameSolver(game)
+    state = game.initial_state(player=1)
+
+    assert solver.get_winner(state) is None
+
+
+def test_endgame():
+    game = BlockFourGame()
+    state = game.initial_state(player=1, cells="""\
++++------
++++------
++++------
+------+++
+------+++
+------+++
++++-+-...
+++++-+...
+++-......
+""")
+    solver = EndgameSolver(game)
+
+    assert solver.get_winner(state) == find_winner(game, state)
+
+
+def test_write_and_read(tmp_path):
+    game = BlockFourGame(field_size=2, field_count=2)
+    path = tmp_path / 'block_four_2x2.tb'
+    solver = EndgameSolver(game, max_empty_cells=16)
+    write_tablebase(solver, path)
+    tablebase = Tablebase(game, path)
+    random = Random(1)
+    for _ in range(20):
+        state = game.initial_state(player=random.choice((1, -1)))
+        for _ in range(random.randrange(12)):
+            if game.get_winner(state) is not None:
+                break
+            _, moves = game.get_moves(state)
+            state = game.apply_move(state, random.choice(moves))
+
+        assert tablebase.get_winner(state) == solver.get_winner(state)
+    tablebase.close()
+
+
+def test_wrong_board_size(tmp_path):
+    path = tmp_path / 'block_four_1x2.tb'
+    write_tablebase(EndgameSolver(BlockFourGame(1, 2)), path)
+
+    with pytest.raises(ValueError, match='for 1x1 fields, 2 to a side'):
+        Tablebase(BlockFourGame(2, 2), path)
+
+
+def test_search_with_tablebase():
+    game = BlockFourGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+++++
+....
+----
+--+.
+""")
+    expected_move = BlockFourMove(3, 3)
+    solver = EndgameSolver(game, max_empty_cells=16)
+    searcher = SearchTree(game, tablebase=solver)
+
+    result = searcher.search(state, iterations=200)
+
+    assert get_best_moves(game, solver, state) == [expected_move]
+    assert result.move == expected_move
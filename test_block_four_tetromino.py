@@ -0,0 +1,144 @@
+from mittmcts import Draw
+
+from block_four_tetromino import (TetrominoGame, TetrominoMove,
+                                  get_orientations, SHAPES)
+
+
+def test_orientations():
+    counts = {shape: len(get_orientations(rows))
+              for shape, rows in SHAPES.items()}
+
+    assert counts == dict(I=2, L=8, O=1, T=4, Z=4)
+
+
+def test_placement_counts():
+    game = TetrominoGame()
+    state = game.initial_state(player=1)
+
+    counts = {shape: len(game.get_moves(state, shape)) for shape in SHAPES}
+
+    assert counts == dict(I=108, L=448, O=64, T=224, Z=224)
+
+
+def test_blocked_placements():
+    game = TetrominoGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+.+..
+.+..
+.+..
+.+..
+""")
+    expected_cells = game.initial_state(cells="""\
+..++
+..++
+""").pos_cells
+
+    moves = game.get_moves(state, 'O')
+
+    assert len(moves) == 3
+    assert moves[0] == TetrominoMove('O', expected_cells)
+
+
+def test_no_room():
+    game = TetrominoGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
++.+.
+.+.+
++.+.
+.+.+
+""")
+
+    assert not any(game.can_place(state, shape) for shape in SHAPES)
+
+
+def test_fill_gap():
+    game = TetrominoGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+-...
+....
+....
+....
+""")
+    move = TetrominoMove('L', game.initial_state(cells="""\
+.+..
+.+..
+++..
+""").pos_cells)
+    expected_text = """\
+-+..
+-+..
+++..
+...."""
+
+    state2 = game.apply_move(state, move)
+
+    assert expected_text == game.format(state2)
+    assert state2.player == -1
+
+
+def test_no_gap_across_rows():
+    game = TetrominoGame(field_size=2, field_count=2)
+    state = game.initial_state(player=1, cells="""\
+....
++...
+....
+....
+""")
+    move = TetrominoMove('I', game.initial_state(cells="""\
+....
+....
+....
+++++
+""").pos_cells)
+    expected_text = """\
+....
++...
+....
+++++"""
+
+    state2 = game.apply_move(state, move)
+
+    assert expected_text == game.format(state2)
+
+
+def test_flood_fill_limit():
+    game = TetrominoGame(field_size=2, field_count=2)
+    empty_cells = game.geometry.all_cells
+
+    assert game.flood_fill(1, empty_cells) == empty_cells
+    assert game.flood_fill(1, empty_cells, limit=3) is None
+
+
+def test_winner():
+    game = TetrominoGame(field_size=3, field_count=1)
+    state = game.initial_state(cells="""\
++++
+++.
+---
+""")
+
+    assert game.get_winner(state) == 1
+
+
+def test_no_winner():
+    game = TetrominoGame(field_size=2, field_count=2)
+    state = game.initial_state(cells="""\
++++.
+....
+....
+....
+""")
+
+    assert game.get_winner(state) is None
+
+
+def test_draw():
+    game = TetrominoGame(field_size=2, field_count=2)
+    state = game.initial_state(cells="""\
+++--
+++--
+.+-.
+.+-.
+""")
+
+    assert game.get_winner(state) is Draw
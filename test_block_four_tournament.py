@@ -0,0 +1,92 @@
+import json
+
+from pytest import approx, raises
+
+from block_four_tournament import (EngineSpec, PairStats, count_pairs,
+                                   format_summary, get_elo,
+                                   get_score_interval, parse_engine,
+                                   run_tournament)
+
+
+def test_parse_engine():
+    spec = parse_engine('alphabeta:iterations=500,seconds=0.5')
+
+    assert spec == EngineSpec('alphabeta:iterations=500,seconds=0.5',
+                              'alphabeta',
+                              500,
+                              0.5)
+
+
+def test_parse_default_limit():
+    assert parse_engine('puct').iterations == 1000
+
+
+def test_parse_unknown_engine():
+    with raises(ValueError, match="Unknown engine 'chess'"):
+        parse_engine('chess:iterations=10')
+
+
+def test_duplicate_engines(tmp_path):
+    specs = [parse_engine('mcts'), parse_engine('mcts')]
+
+    with raises(ValueError, match="Engine 'mcts' is listed twice."):
+        run_tournament(specs, 2, tmp_path / 'results.jsonl', 1)
+
+
+def test_score_interval():
+    score, low, high = get_score_interval(PairStats(wins=60,
+                                                    draws=20,
+                                                    losses=20))
+
+    assert score == approx(0.7)
+    assert low == approx(0.604, abs=0.001)
+    assert high == approx(0.781, abs=0.001)
+
+
+def test_elo():
+    assert get_elo(0.5) == approx(0)
+    assert get_elo(0.75) == approx(190.8, abs=0.1)
+    assert get_elo(0.25) == approx(-190.8, abs=0.1)
+
+
+def test_count_pairs():
+    results = [dict(pos_engine='a', neg_engine='b', winner='a'),
+               dict(pos_engine='b', neg_engine='a', winner=None),
+               dict(pos_engine='b', neg_engine='a', winner='a')]
+
+    counts = count_pairs(results)
+
+    assert counts['a', 'b'] == PairStats(wins=2, draws=1, losses=0)
+    assert counts['b', 'a'] == PairStats(wins=0, draws=1, losses=2)
+
+
+def test_tournament_resumes(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    specs = [parse_engine('mcts:iterations=10'),
+             parse_engine('alphabeta:iterations=50')]
+    reports = []
+
+    results1 = run_tournament(specs,
+                              game_count=2,
+                              output_path=path,
+                              process_count=1,
+                              field_size=2,
+                              field_count=2,
+                              report=reports.append)
+    results2 = run_tournament(specs,
+                              game_count=3,
+                              output_path=path,
+                              process_count=1,
+                              field_size=2,
+                              field_count=2,
+                              report=reports.append)
+
+    lines = path.read_text().splitlines()
+    assert len(results1) == 2
+    assert len(results2) == 3
+    assert len(reports) == 3
+    assert [json.loads(line) for line in lines] == results2
+    assert {result['pos_engine'] for result in results1} == {
+        'mcts:iterations=10',
+        'alphabeta:iterations=50'}
+    assert 'alphabeta:iterations=50' in format_summary(results2)
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+from image_watcher import InotifyWatcher, PollingWatcher
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def make_watcher(request):
+    watchers = []
+
+    def make(paths):
+        if request.param == 'polling':
+            watcher = PollingWatcher(paths, interval=0.01, debounce=0.01)
+        elif sys.platform.startswith('linux'):
+            watcher = InotifyWatcher(paths, debounce=0.01)
+        else:
+            pytest.skip('inotify needs Linux.')
+        watchers.append(watcher)
+        return watcher
+
+    yield make
+    for watcher in watchers:
+        watcher.close()
+
+
+def test_timeout(tmp_path, make_watcher):
+    path = tmp_path / 'a.png'
+    path.write_bytes(b'old')
+    watcher = make_watcher([path])
+
+    assert watcher.wait(timeout=0.05) == set()
+
+
+def test_write(tmp_path, make_watcher):
+    path1 = tmp_path / 'a.png'
+    path2 = tmp_path / 'b.png'
+    path1.write_bytes(b'old')
+    path2.write_bytes(b'old')
+    (tmp_path / 'other.png').write_bytes(b'old')
+    watcher = make_watcher([path1, path2])
+
+    path2.write_bytes(b'new contents')
+    (tmp_path / 'other.png').write_bytes(b'new contents')
+
+    assert watcher.wait(timeout=1) == {path2}
+
+
+def test_move(tmp_path, make_watcher):
+    path = tmp_path / 'a.png'
+    new_path = tmp_path / 'a.png.tmp'
+    path.write_bytes(b'old')
+    watcher = make_watcher([path])
+    new_path.write_bytes(b'new contents')
+
+    os.replace(new_path, path)
+
+    assert watcher.wait(timeout=1) == {path}
+
+
+def test_burst(tmp_path, make_watcher):
+    path = tmp_path / 'a.png'
+    path.write_bytes(b'old')
+    watcher = make_watcher([path])
+
+    for i in range(5):
+        path.write_bytes(b'new contents %d' % i)
+
+    assert watcher.wait(timeout=1) == {path}
+    assert watcher.wait(timeout=0.05) == set()